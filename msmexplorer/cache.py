@@ -0,0 +1,168 @@
+"""
+Caching of computed plot data.
+
+Computing a free energy surface can take much longer than drawing it, so
+plots that only differ in style can reuse a cached surface. Entries are keyed
+by a fingerprint of the inputs that determine the computation.
+"""
+import os
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from .utils import take_columns, ConcatenatedArray, StateWeights
+
+__all__ = ['SurfaceCache', 'fingerprint', 'array_fingerprint', 'get_cache']
+
+# Number of evenly spaced rows hashed by ``array_fingerprint``.
+FINGERPRINT_ROWS = 4096
+
+
+def array_fingerprint(data, columns=None, n_rows=FINGERPRINT_ROWS):
+    """
+    Cheap fingerprint of a (possibly memory-mapped) array.
+
+    Only the shape, the dtype and ``n_rows`` evenly spaced rows (including
+    the first and last) are hashed, so the cost does not depend on the size
+    of the array. Changes to rows that are not sampled go unnoticed.
+
+    Parameters
+    ----------
+    data : array-like (nsamples,) or (nsamples, nfeatures), or list thereof
+        The array to fingerprint. ``StateWeights`` are fingerprinted by
+        their assignments and state weights.
+    columns : int or sequence of int, optional
+        Columns to hash. Defaults to all columns.
+    n_rows : int, optional
+        Number of rows to hash.
+
+    Returns
+    -------
+    digest : str
+        Hexadecimal digest.
+    """
+    if isinstance(data, StateWeights):
+        return fingerprint(array_fingerprint(data.assignments, n_rows=n_rows),
+                           array_fingerprint(data.state_weights))
+    if isinstance(data, list) and np.ndim(data[0]) == 2:
+        data = ConcatenatedArray(data)
+    if isinstance(data, ConcatenatedArray):
+        shape = data.shape
+        lengths = tuple(data.lengths)
+    else:
+        data = np.asanyarray(data)
+        shape = data.shape
+        lengths = None
+
+    rows = np.unique(np.linspace(0, shape[0] - 1,
+                                 min(n_rows, shape[0])).astype(int))
+    if len(shape) == 1:
+        sample = np.asarray(data[rows])
+    else:
+        sample = take_columns(data, columns, rows=rows)
+
+    h = hashlib.sha1()
+    h.update(repr((shape, lengths, columns, str(sample.dtype))).encode())
+    h.update(np.ascontiguousarray(sample).tobytes())
+    return h.hexdigest()
+
+
+def fingerprint(*items):
+    """Hexadecimal digest of the ``repr`` of some (small) items."""
+    return hashlib.sha1(repr(items).encode()).hexdigest()
+
+
+class SurfaceCache(object):
+    """
+    Least-recently-used cache of lists of arrays, optionally backed by disk.
+
+    Parameters
+    ----------
+    maxsize : int, optional (default: 32)
+        Number of entries kept in memory.
+    cachedir : str, optional
+        Directory in which entries are also saved as ``.npz`` files, so that
+        they persist across sessions. Entries on disk are never evicted.
+    """
+
+    def __init__(self, maxsize=32, cachedir=None):
+        self.maxsize = maxsize
+        self.cachedir = cachedir
+        self._entries = OrderedDict()
+        if cachedir is not None and not os.path.isdir(cachedir):
+            os.makedirs(cachedir)
+
+    def _path(self, key):
+        return os.path.join(self.cachedir, key + '.npz')
+
+    def __contains__(self, key):
+        return key in self._entries or (
+            self.cachedir is not None and os.path.exists(self._path(key)))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the arrays stored under ``key``, or None."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        if self.cachedir is not None and os.path.exists(self._path(key)):
+            with np.load(self._path(key)) as f:
+                value = [f['arr_%d' % i] for i in range(len(f.files))]
+            self._remember(key, value)
+            return value
+        return None
+
+    def set(self, key, value):
+        """Store a list of arrays under ``key``."""
+        value = [np.asarray(v) for v in value]
+        self._remember(key, value)
+        if self.cachedir is not None:
+            tmp = self._path(key) + '.%d.tmp' % os.getpid()
+            with open(tmp, 'wb') as f:
+                np.savez(f, *value)
+            os.replace(tmp, self._path(key))
+
+    def clear(self):
+        """Empty the in-memory cache. Files on disk are left in place."""
+        self._entries.clear()
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+_caches = {}
+
+
+def get_cache(cache):
+    """
+    Resolve a ``cache`` argument of a plotting function.
+
+    Parameters
+    ----------
+    cache : bool, str or SurfaceCache
+        ``True`` selects the shared in-memory cache, a string selects a
+        shared cache backed by that directory, and a ``SurfaceCache`` is
+        used as is. ``False`` or ``None`` disables caching.
+
+    Returns
+    -------
+    cache : SurfaceCache or None
+    """
+    if cache is None or cache is False:
+        return None
+    if isinstance(cache, SurfaceCache):
+        return cache
+    if cache is True:
+        cache = None
+    elif not isinstance(cache, str):
+        raise ValueError('cache must be a bool, a directory or a '
+                         'SurfaceCache')
+    if cache not in _caches:
+        _caches[cache] = SurfaceCache(cachedir=cache)
+    return _caches[cache]
@@ -0,0 +1,199 @@
+"""
+Level-of-detail downsampling of long time series.
+
+A line drawn across ``w`` pixel columns cannot show more than a handful of
+distinct points per column, so long traces are decimated to a few points
+per pixel before they are handed to matplotlib. ``m4_indices`` keeps the
+first, last, minimum and maximum sample of each column, which renders the
+same pixels as the full series. ``lttb_indices`` keeps one point per bucket
+chosen by the largest-triangle-three-buckets rule, for a lighter line that
+preserves the visual shape.
+"""
+import numpy as np
+
+from .utils import BLOCK_BYTES
+
+__all__ = ['m4_indices', 'lttb_indices', 'decimate_indices',
+           'DecimatedLine']
+
+DOWNSAMPLE_METHODS = ('m4', 'lttb')
+
+
+def _buckets(start, stop, n_buckets):
+    """Integer edges of (at most) ``n_buckets`` equal buckets of indices."""
+    n_buckets = max(1, min(n_buckets, stop - start))
+    return np.unique(np.linspace(start, stop, n_buckets + 1).astype(np.intp))
+
+
+def m4_indices(y, n_buckets, start=0, stop=None):
+    """
+    Indices of the first, last, minimum and maximum sample of each bucket.
+
+    Parameters
+    ----------
+    y : array-like (nsamples,)
+        The samples. NaNs are ignored when finding extrema.
+    n_buckets : int
+        Number of buckets, typically the width of the axis in pixels.
+    start, stop : int, optional
+        Range of indices to decimate. Defaults to the whole series.
+
+    Returns
+    -------
+    idx : ndarray (<= 4 * n_buckets,)
+        Sorted indices of the samples to draw.
+    """
+    stop = len(y) if stop is None else stop
+    if stop - start <= 4 * n_buckets:
+        return np.arange(start, stop)
+    edges = _buckets(start, stop, n_buckets)
+    width = int(np.diff(edges).max())
+    # Buckets are processed a group at a time as (n, width) blocks, padded
+    # with the last sample of the group.
+    per_block = max(1, BLOCK_BYTES // (8 * width))
+    out = []
+    for b in range(0, edges.shape[0] - 1, per_block):
+        lo = edges[:-1][b:b + per_block]
+        hi = edges[b + 1:b + per_block + 1]
+        block = np.asarray(y[lo[0]:hi[-1]], dtype=float)
+        cols = np.minimum(lo[:, None] - lo[0] + np.arange(width),
+                          (hi - 1 - lo[0])[:, None])
+        values = block[cols]
+        finite = ~np.isnan(values)
+        argmin = np.where(finite, values, np.inf).argmin(axis=1)
+        argmax = np.where(finite, values, -np.inf).argmax(axis=1)
+        out.extend([lo, hi - 1, lo + argmin, lo + argmax])
+    return np.unique(np.concatenate(out))
+
+
+def lttb_indices(y, n_buckets, start=0, stop=None):
+    """
+    Indices selected by the largest-triangle-three-buckets algorithm.
+
+    The first and last samples are kept, and from each bucket in between the
+    sample forming the largest triangle with the previously selected sample
+    and the mean of the next bucket.
+
+    Parameters
+    ----------
+    y : array-like (nsamples,)
+        The samples.
+    n_buckets : int
+        Number of points to keep, typically twice the width of the axis in
+        pixels.
+    start, stop : int, optional
+        Range of indices to decimate. Defaults to the whole series.
+
+    Returns
+    -------
+    idx : ndarray (<= n_buckets,)
+        Sorted indices of the samples to draw.
+    """
+    stop = len(y) if stop is None else stop
+    if stop - start <= max(n_buckets, 3):
+        return np.arange(start, stop)
+    y = np.asarray(y[start:stop], dtype=float)
+    edges = _buckets(1, y.shape[0] - 1, n_buckets - 2)
+    # Mean position of each bucket, with the last sample as a final bucket
+    sums = np.add.reduceat(np.nan_to_num(y[:-1]), edges[:-1])
+    counts = np.diff(edges)
+    mean_x = np.append((edges[:-1] + edges[1:] - 1) / 2., y.shape[0] - 1)
+    mean_y = np.append(sums / counts, y[-1])
+
+    idx = np.empty(edges.shape[0] + 1, dtype=np.intp)
+    idx[0] = 0
+    idx[-1] = y.shape[0] - 1
+    for i in range(edges.shape[0] - 1):
+        a = idx[i]
+        x = np.arange(edges[i], edges[i + 1])
+        area = np.abs((a - mean_x[i + 1]) * (y[x] - y[a]) -
+                      (a - x) * (mean_y[i + 1] - y[a]))
+        idx[i + 1] = x[np.nanargmax(area) if np.isfinite(area).any() else 0]
+    return idx + start
+
+
+def decimate_indices(y, n_pixels, method='m4', start=0, stop=None):
+    """
+    Indices of the samples of ``y[start:stop]`` to draw across
+    ``n_pixels`` pixel columns.
+
+    Parameters
+    ----------
+    y : array-like (nsamples,)
+        The samples.
+    n_pixels : int
+        Width of the drawn range in pixels.
+    method : {'m4' | 'lttb'}, optional
+        'm4' keeps up to four samples per pixel column (see
+        ``m4_indices``). 'lttb' keeps two points per pixel column (see
+        ``lttb_indices``).
+    start, stop : int, optional
+        Range of indices to decimate. Defaults to the whole series.
+
+    Returns
+    -------
+    idx : ndarray
+        Sorted indices of the samples to draw.
+    """
+    if method == 'm4':
+        return m4_indices(y, n_pixels, start, stop)
+    elif method == 'lttb':
+        return lttb_indices(y, 2 * n_pixels, start, stop)
+    raise ValueError("method must be 'm4' or 'lttb'")
+
+
+class DecimatedLine(object):
+    """
+    Keep a line decimated to the resolution of its axis.
+
+    The samples visible in the current x-range are decimated with
+    ``decimate_indices`` whenever the x-limits change, so zooming in
+    reveals the full detail while every redraw stays proportional to the
+    width of the axis.
+
+    Parameters
+    ----------
+    ax : matplotlib axis
+        The axis the line is drawn on.
+    line : matplotlib.lines.Line2D
+        The line to update.
+    y : array-like (nsamples,)
+        The full series, drawn at x = ``x0 + i * dx``.
+    x0, dx : float, optional
+        Position of the first sample and spacing of the samples.
+    method : {'m4' | 'lttb'}, optional
+        Decimation method.
+    """
+
+    def __init__(self, ax, line, y, x0=0., dx=1., method='m4'):
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValueError("method must be 'm4' or 'lttb'")
+        self.ax = ax
+        self.line = line
+        self.y = y
+        self.x0 = x0
+        self.dx = dx
+        self.method = method
+        self._decimate(0, len(y))
+        self.cid = ax.callbacks.connect('xlim_changed',
+                                        lambda ax: self.update())
+
+    def update(self):
+        """Decimate the samples in the current x-range of the axis."""
+        n = len(self.y)
+        xmin, xmax = sorted(self.ax.get_xlim())
+        # One sample beyond each edge keeps the line running off the axis
+        start = int(np.clip(np.floor((xmin - self.x0) / self.dx), 1, n) - 1)
+        stop = int(np.clip(np.ceil((xmax - self.x0) / self.dx) + 2,
+                           start, n))
+        self._decimate(start, stop)
+
+    def _decimate(self, start, stop):
+        n_pixels = max(1, int(self.ax.get_window_extent().width))
+        idx = decimate_indices(self.y, n_pixels, self.method, start, stop)
+        self.line.set_data(self.x0 + idx * self.dx,
+                           np.asarray(self.y[idx]))
+
+    def disconnect(self):
+        """Stop following the x-limits of the axis."""
+        self.ax.callbacks.disconnect(self.cid)
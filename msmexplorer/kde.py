@@ -0,0 +1,989 @@
+"""
+Binned kernel density estimation.
+
+The estimators in this module bin the samples onto a regular grid with
+linear binning and convolve the binned weights with a Gaussian kernel using
+FFTs. Their cost is linear in the number of samples (plus a grid-sized FFT),
+so full datasets can be used without subsampling. ``histogram_density``
+is a cheaper alternative that skips the kernel altogether, and
+``direct_kde`` evaluates the exact Gaussian sum in parallel. Angles are
+handled by ``circular_kde``, which uses a von Mises kernel on a periodic
+grid.
+"""
+from functools import reduce
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+from scipy.fftpack import next_fast_len
+
+from .sampling import check_random_state
+from .utils import effective_n_jobs, constrain_angles, wrap_angles
+
+__all__ = ['fft_univariate_kde', 'fft_bivariate_kde', 'fft_kde',
+           'fft_kde_bootstrap', 'histogram_density', 'direct_univariate_kde',
+           'direct_bivariate_kde', 'direct_kde', 'gaussian_sum',
+           'linear_binning', 'gaussian_smooth', 'kernel_covariance',
+           'circular_histogram', 'circular_kde', 'vonmises_concentration',
+           'vonmises_smooth', 'RunningMoments']
+
+# Number of samples binned at a time; bounds the size of temporaries.
+BLOCK_SIZE = 2 ** 18
+
+# The binning grid is refined until its spacing is at most
+# 1 / OVERSAMPLE of the kernel bandwidth ...
+OVERSAMPLE = 4
+# ... up to this many grid nodes per dimension.
+MAX_BINS = {1: 2 ** 14, 2: 2 ** 10}
+
+# Kernel is truncated at this many bandwidths.
+KERNEL_CUTOFF = 4.
+
+# Maximum number of grid nodes over all replicates of a bootstrap batch.
+MAX_BATCH_SIZE = 2 ** 24
+
+# Size of the (points x samples) temporaries of ``gaussian_sum``, small
+# enough to stay in cache.
+TILE_BYTES = 2 ** 20
+# Maximum number of evaluation points per tile.
+TILE_POINTS = 256
+# Kernel values below exp(MIN_EXPONENT) are flushed to about zero.
+MIN_EXPONENT = -700.
+
+# Resolution of the histograms from which quantile bin edges are found.
+QUANTILE_BINS = 2 ** 12
+
+# Default number of bins of the periodic grid of ``circular_kde``.
+CIRCULAR_BINS = 2 ** 10
+
+# Period of periodic observables, which are angles in degrees.
+PERIOD = 360.
+
+
+class RunningMoments(object):
+    """Weighted first and second moments, extrema and effective sample size
+    accumulated one block of samples at a time. The spread of ``periodic``
+    dimensions (angles in degrees) is their circular standard deviation,
+    uncorrelated with the other dimensions."""
+
+    def __init__(self, ndim, periodic=None):
+        self.ndim = ndim
+        self.periodic = _check_periodic(periodic, ndim)
+        self.sum_w = 0.
+        self.sum_w2 = 0.
+        self.min = np.full(ndim, np.inf)
+        self.max = np.full(ndim, -np.inf)
+        self._shift = None
+        self._s1 = np.zeros(ndim)
+        self._s2 = np.zeros((ndim, ndim))
+        self._resultant = np.zeros(self.periodic.sum(), dtype=complex)
+
+    def update(self, X, weights=None):
+        X = np.asarray(X, dtype=float)
+        if X.shape[0] == 0:
+            return self
+        if weights is None:
+            weights = np.ones(X.shape[0])
+        weights = np.asarray(weights, dtype=float)
+
+        if self._shift is None:
+            # Accumulate about an early sample to limit cancellation
+            self._shift = X[0].copy()
+        Y = X - self._shift
+        wY = weights[:, np.newaxis] * Y
+
+        self.sum_w += weights.sum()
+        self.sum_w2 += np.dot(weights, weights)
+        self._s1 += wY.sum(axis=0)
+        self._s2 += np.dot(wY.T, Y)
+        self.min = np.minimum(self.min, X.min(axis=0))
+        self.max = np.maximum(self.max, X.max(axis=0))
+        if self.periodic.any():
+            self._resultant += np.dot(
+                weights, np.exp(1j * np.deg2rad(X[:, self.periodic])))
+        return self
+
+    @property
+    def n_eff(self):
+        return self.sum_w ** 2 / self.sum_w2
+
+    @property
+    def mean(self):
+        return self._shift + self._s1 / self.sum_w
+
+    @property
+    def covariance(self):
+        m = self._s1 / self.sum_w
+        cov = self._s2 / self.sum_w - np.outer(m, m)
+        # Unbiased estimate, as in ``np.cov(..., aweights=weights)``
+        cov *= self.sum_w ** 2 / (self.sum_w ** 2 - self.sum_w2)
+        if self.periodic.any():
+            std = np.rad2deg(_circular_std(self._resultant, self.sum_w))
+            cov[self.periodic] = cov[:, self.periodic] = 0.
+            cov[self.periodic, self.periodic] = std ** 2
+        return cov
+
+
+def _circular_std(resultant, total):
+    """Circular standard deviation in radians, ``sqrt(-2 log R)`` for the
+    mean resultant length ``R = |resultant| / total``."""
+    R = np.abs(resultant) / total
+    return np.sqrt(-2 * np.log(np.clip(R, 1e-12, 1.)))
+
+
+def _check_periodic(periodic, ndim):
+    """Boolean array telling which of ``ndim`` dimensions are periodic."""
+    if periodic is None:
+        periodic = False
+    periodic = np.broadcast_to(np.asarray(periodic, dtype=bool), (ndim,))
+    return periodic.copy()
+
+
+def _bandwidth_factor(bw, n_eff, d):
+    """Bandwidth factor of each of ``d`` dimensions."""
+    if isinstance(bw, str):
+        if bw == 'scott':
+            factor = n_eff ** (-1. / (d + 4))
+        elif bw == 'silverman':
+            factor = (n_eff * (d + 2) / 4.) ** (-1. / (d + 4))
+        else:
+            raise ValueError('bw must be "scott", "silverman" or a scalar')
+        return np.repeat(factor, d)
+    return np.broadcast_to(np.asarray(bw, dtype=float), (d,))
+
+
+def kernel_covariance(moments, bw):
+    """Kernel covariance matrix following ``scipy.stats.gaussian_kde``."""
+    factor = _bandwidth_factor(bw, moments.n_eff, moments.ndim)
+    cov = moments.covariance * np.outer(factor, factor)
+    if np.any(np.diag(cov) <= 0):
+        raise ValueError('Cannot estimate the density of data with '
+                         'zero variance.')
+    return cov
+
+
+def _kde_support(data_min, data_max, bw, gridsize, cut, clip):
+    """Establish support for a kernel density estimate."""
+    support_min = max(data_min - bw * cut, clip[0])
+    support_max = min(data_max + bw * cut, clip[1])
+    return np.linspace(support_min, support_max, gridsize)
+
+
+def _iter_blocks(X, weights=None, block_size=BLOCK_SIZE):
+    for start in range(0, X.shape[0], block_size):
+        stop = start + block_size
+        w = None if weights is None else np.asarray(weights[start:stop])
+        yield np.asarray(X[start:stop]), w
+
+
+def _wrapped_blocks(X, weights, periodic, block_size=BLOCK_SIZE):
+    """Blocks of samples with their periodic dimensions wrapped between
+    -180 and 180 degrees."""
+    for x, w in _iter_blocks(X, weights, block_size):
+        if periodic.any():
+            x = np.array(x, dtype=float)
+            x[:, periodic] = wrap_angles(x[:, periodic])
+        yield x, w
+
+
+def linear_binning(X, lo, delta, shape, weights=None, out=None,
+                   periodic=None):
+    """
+    Linearly bin samples onto a regular grid.
+
+    Each sample splits its weight between the ``2 ** ndim`` surrounding grid
+    nodes in proportion to its proximity to them. Samples outside of the grid
+    are ignored. Along periodic dimensions the grid wraps around, so samples
+    past the last node share their weight with the first one.
+
+    Parameters
+    ----------
+    X : ndarray (nsamples, ndim)
+        The samples.
+    lo : array-like (ndim,)
+        Position of the first grid node along each dimension.
+    delta : array-like (ndim,)
+        Grid spacing along each dimension.
+    shape : tuple of int
+        Number of grid nodes along each dimension.
+    weights : array-like (nsamples,), optional
+        Weight of each sample. Defaults to unit weights.
+    out : ndarray, optional
+        Array of binned weights to add to, with the given shape.
+    periodic : bool or sequence of bool, optional
+        Whether each dimension is periodic, with period ``shape * delta``.
+        Samples must already be wrapped into ``[lo, lo + shape * delta)``
+        along periodic dimensions.
+
+    Returns
+    -------
+    counts : ndarray
+        The binned weights.
+    """
+    shape = tuple(shape)
+    if out is None:
+        out = np.zeros(shape)
+    periodic = _check_periodic(periodic, len(shape))
+
+    t = (np.asarray(X, dtype=float) - lo) / delta
+    # The last cell of a periodic dimension ends on the first node
+    upper = np.asarray(shape) - 1 + periodic
+    inside = np.all((t >= 0) & ((t <= upper) | periodic), axis=1)
+    t = t[inside]
+    if weights is None:
+        weights = np.ones(t.shape[0])
+    else:
+        weights = np.asarray(weights, dtype=float)[inside]
+
+    # Samples sitting exactly on the last node belong to the last cell
+    i0 = np.minimum(np.floor(t), upper - 1).astype(np.intp)
+    frac = t - i0
+
+    flat = out.reshape(-1)
+    strides = np.cumprod((1,) + shape[:0:-1])[::-1]
+    base = np.dot(i0, strides)
+    for corner in np.ndindex(*(2,) * len(shape)):
+        w = weights.copy()
+        idx = base.copy()
+        for i, c in enumerate(corner):
+            w *= frac[:, i] if c else 1. - frac[:, i]
+            if c and periodic[i]:
+                # Wrap the upper neighbours of the last node to the first
+                idx += np.where(i0[:, i] == shape[i] - 1,
+                                (1 - shape[i]) * strides[i], strides[i])
+            elif c:
+                idx += strides[i]
+        flat += np.bincount(idx, weights=w, minlength=flat.size)
+    return out
+
+
+def _gaussian_kernel(delta, cov, half_width):
+    """Gaussian kernel sampled on grid offsets, normalized to unit mass."""
+    offsets = [np.arange(-k, k + 1) * dx for k, dx in zip(half_width, delta)]
+    grid = np.stack(np.meshgrid(*offsets, indexing='ij'), axis=-1)
+    icov = np.linalg.inv(cov)
+    kernel = np.exp(-0.5 * np.einsum('...i,ij,...j', grid, icov, grid))
+    return kernel / kernel.sum()
+
+
+def _fft_convolve(counts, kernel, periodic=None):
+    """Convolve over the trailing axes of ``counts`` and return the central
+    part, aligned with ``counts``. Leading axes are treated as a batch.
+    Periodic axes are convolved circularly, with a kernel of the length of
+    ``counts`` whose center is its first element."""
+    ndim = kernel.ndim
+    periodic = _check_periodic(periodic, ndim)
+    axes = tuple(range(-ndim, 0))
+    fshape = [n if p else next_fast_len(n + k - 1)
+              for n, k, p in zip(counts.shape[-ndim:], kernel.shape,
+                                 periodic)]
+    conv = np.fft.irfftn(np.fft.rfftn(counts, fshape, axes=axes) *
+                         np.fft.rfftn(kernel, fshape, axes=axes),
+                         fshape, axes=axes)
+    index = [Ellipsis] + [slice(0, n) if p else slice(k // 2, k // 2 + n)
+                          for n, k, p in zip(counts.shape[-ndim:],
+                                             kernel.shape, periodic)]
+    return conv[tuple(index)]
+
+
+def _wrap_kernel(kernel, shape, periodic):
+    """Fold the periodic axes of a centered kernel onto grids of the given
+    shape, with the center moved to the first element."""
+    for axis in np.flatnonzero(periodic):
+        k = kernel.shape[axis] // 2
+        wrapped = np.zeros(kernel.shape[:axis] + (shape[axis],) +
+                           kernel.shape[axis + 1:])
+        idx = (slice(None),) * axis + (np.arange(-k, k + 1) % shape[axis],)
+        np.add.at(wrapped, idx, kernel)
+        kernel = wrapped
+    return kernel
+
+
+def gaussian_smooth(counts, delta, cov, periodic=None):
+    """
+    Convolve binned weights with a Gaussian kernel.
+
+    Parameters
+    ----------
+    counts : ndarray
+        Binned weights on a regular grid, e.g. from ``linear_binning``.
+        Leading axes beyond the dimensions of ``cov`` are treated as a batch
+        of independent grids.
+    delta : array-like (ndim,)
+        Grid spacing along each dimension.
+    cov : ndarray (ndim, ndim)
+        Kernel covariance matrix.
+    periodic : bool or sequence of bool, optional
+        Whether each dimension is periodic, with period ``shape * delta``.
+        Weight smoothed past either end of a periodic grid wraps around to
+        the other end.
+
+    Returns
+    -------
+    density : ndarray
+        Smoothed weight per unit volume at each grid node.
+    """
+    delta = np.asarray(delta, dtype=float)
+    periodic = _check_periodic(periodic, len(delta))
+    shape = counts.shape[-len(delta):]
+    sigma = np.sqrt(np.diag(cov))
+    half_width = np.minimum(np.ceil(KERNEL_CUTOFF * sigma / delta),
+                            shape).astype(int)
+    kernel = _wrap_kernel(_gaussian_kernel(delta, cov, half_width), shape,
+                          periodic)
+    return _fft_convolve(counts, kernel, periodic) / np.prod(delta)
+
+
+def fft_kde(X, bw='scott', gridsize=100, cut=3, clip=None, weights=None,
+            block_size=BLOCK_SIZE, periodic=None):
+    """
+    Gaussian kernel density estimate by linear binning and FFT convolution.
+
+    Parameters
+    ----------
+    X : array-like (nsamples, ndim)
+        The samples. Anything that can be sliced along its first axis, such
+        as a memory-mapped array, is read ``block_size`` rows at a time.
+    bw : {'scott' | 'silverman' | scalar | sequence of scalars}, optional
+        Name of reference method to determine kernel size, or a bandwidth
+        factor (as in ``scipy.stats.gaussian_kde``) for every dimension or
+        for each dimension.
+    gridsize : int, optional (default: 100)
+        Number of discrete points in the evaluation grid per dimension.
+    cut : scalar, optional (default: 3)
+        Draw the estimate to cut * bw from the extreme data points.
+    clip : sequence of pairs of scalars, optional
+        Lower and upper bounds of the evaluation grid for each dimension.
+    weights : array-like (nsamples,), optional
+        Weight of each sample.
+    block_size : int, optional
+        Number of samples processed at a time.
+    periodic : bool or sequence of bool, optional
+        Whether each dimension is an angle in degrees. Periodic dimensions
+        are wrapped between -180 and 180 degrees and estimated on a grid
+        spanning that range with wrap-around boundaries, ignoring ``cut``
+        and ``clip``. Their kernel width follows from their circular
+        standard deviation.
+
+    Returns
+    -------
+    grids : list of ndarrays
+        Evaluation grid along each dimension.
+    density : ndarray
+        Density at the grid nodes, indexed like ``grids``.
+    """
+    ndim = X.shape[1]
+    moments = RunningMoments(ndim, periodic)
+    periodic = moments.periodic
+    if periodic.all():
+        return _torus_kde(X, bw, gridsize, weights, block_size)
+    for x, w in _wrapped_blocks(X, weights, periodic, block_size):
+        moments.update(x, w)
+    grids, cov, binning, index = _binning_grid(moments, bw, gridsize, cut,
+                                               clip, MAX_BINS[ndim])
+
+    counts = np.zeros(binning[2])
+    for x, w in _wrapped_blocks(X, weights, periodic, block_size):
+        linear_binning(x, *binning, weights=w, out=counts,
+                       periodic=periodic)
+
+    density = _take_nodes(gaussian_smooth(counts, binning[1], cov, periodic),
+                          index) / moments.sum_w
+
+    # Clear FFT round-off
+    return grids, np.clip(density, np.finfo(float).tiny, None)
+
+
+def _torus_kde(X, bw, gridsize, weights, block_size):
+    """``fft_kde`` of samples that are periodic along every dimension.
+
+    The grid does not depend on the data, so the samples are read once and
+    binned at the finest resolution, from which the kernel width is found.
+    """
+    ndim = X.shape[1]
+    periodic = np.ones(ndim, dtype=bool)
+    refine = max(1, (MAX_BINS[ndim] - 1) // (gridsize - 1))
+    n_nodes = (gridsize - 1) * refine
+    lo = np.full(ndim, -PERIOD / 2)
+    delta = np.full(ndim, PERIOD / n_nodes)
+
+    counts = np.zeros((n_nodes,) * ndim)
+    sum_w2 = 0.
+    for x, w in _wrapped_blocks(X, weights, periodic, block_size):
+        linear_binning(x, lo, delta, counts.shape, weights=w, out=counts,
+                       periodic=periodic)
+        sum_w2 += x.shape[0] if w is None else np.dot(w, w)
+    sum_w = counts.sum()
+
+    # Circular spread of each dimension from its binned marginal
+    phase = np.exp(2j * np.pi * np.arange(n_nodes) / n_nodes)
+    std = np.array([_circular_std(np.dot(counts.sum(axis=tuple(
+        j for j in range(ndim) if j != i)), phase), sum_w)
+        for i in range(ndim)])
+    factor = _bandwidth_factor(bw, sum_w ** 2 / sum_w2, ndim)
+    cov = np.diag((np.rad2deg(std) * factor) ** 2)
+    if np.any(np.diag(cov) <= 0):
+        raise ValueError('Cannot estimate the density of data with '
+                         'zero variance.')
+
+    density = gaussian_smooth(counts, delta, cov, periodic)
+    index = (np.arange(0, n_nodes + 1, refine) % n_nodes,) * ndim
+    density = _take_nodes(density, index) / sum_w
+    grids = [np.linspace(-PERIOD / 2, PERIOD / 2, gridsize)
+             for _ in range(ndim)]
+    return grids, np.clip(density, np.finfo(float).tiny, None)
+
+
+def fft_kde_bootstrap(X, lengths, n_bootstrap=100, bw='scott', gridsize=100,
+                      cut=3, clip=None, weights=None, random_state=None,
+                      n_jobs=1, block_size=BLOCK_SIZE, periodic=None):
+    """
+    Bootstrap a binned FFT kernel density estimate over trajectories.
+
+    Every trajectory is binned once. Each replicate resamples whole
+    trajectories with replacement, so its binned weights are a combination
+    of the per-trajectory bins, computed for all replicates at once with a
+    sparse matrix product. All replicates are then smoothed in one batched
+    FFT on a grid and with a bandwidth shared with the full-data estimate.
+
+    Parameters
+    ----------
+    X : array-like (nsamples, ndim)
+        The samples of all trajectories, concatenated.
+    lengths : array-like of int
+        Number of samples in each trajectory.
+    n_bootstrap : int, optional (default: 100)
+        Number of bootstrap replicates.
+    random_state : integer or numpy.RandomState, optional
+        The generator used to resample the trajectories.
+    n_jobs : int, optional (default: 1)
+        Number of threads used for the batched FFTs.
+
+    The remaining parameters are the same as for ``fft_kde``.
+
+    Returns
+    -------
+    grids : list of ndarrays
+        Evaluation grid along each dimension.
+    density : ndarray
+        Density of all the data at the grid nodes, indexed like ``grids``.
+    replicates : ndarray (n_bootstrap, ...)
+        Density of each bootstrap replicate at the grid nodes.
+    """
+    random_state = check_random_state(random_state)
+    lengths = np.asarray(lengths, dtype=int)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    n_traj = lengths.shape[0]
+    ndim = X.shape[1]
+
+    moments = RunningMoments(ndim, periodic)
+    periodic = moments.periodic
+    for x, w in _wrapped_blocks(X, weights, periodic, block_size):
+        moments.update(x, w)
+
+    # Limit the resolution so that all replicates fit in one batch
+    max_bins = min(MAX_BINS[ndim],
+                   int((MAX_BATCH_SIZE / n_bootstrap) ** (1. / ndim)))
+    grids, cov, binning, index = _binning_grid(moments, bw, gridsize, cut,
+                                               clip, max_bins)
+    shape = binning[2]
+
+    # Sparse (trajectory, grid node) matrix of binned weights, and the
+    # total weight of each trajectory (including samples off the grid)
+    buf = np.zeros(shape)
+    flat = buf.reshape(-1)
+    traj_weight = np.zeros(n_traj)
+    rows, cols, vals = [], [], []
+    for i in range(n_traj):
+        start, stop = offsets[i], offsets[i + 1]
+        traj_weights = None if weights is None else weights[start:stop]
+        for x, w in _wrapped_blocks(X[start:stop], traj_weights, periodic,
+                                    block_size):
+            linear_binning(x, *binning, weights=w, out=buf,
+                           periodic=periodic)
+            traj_weight[i] += x.shape[0] if w is None else w.sum()
+        nz = np.flatnonzero(flat)
+        rows.append(np.repeat(i, nz.shape[0]))
+        cols.append(nz)
+        vals.append(flat[nz])
+        flat[nz] = 0.
+    binned = sparse.csr_matrix((np.concatenate(vals),
+                                (np.concatenate(rows), np.concatenate(cols))),
+                               shape=(n_traj, flat.shape[0]))
+
+    resample = random_state.multinomial(n_traj, np.ones(n_traj) / n_traj,
+                                        size=n_bootstrap).astype(float)
+    counts = np.vstack([np.asarray(binned.sum(axis=0)),
+                        np.asarray((binned.T.dot(resample.T)).T)])
+    total = np.concatenate([[traj_weight.sum()], resample.dot(traj_weight)])
+    counts = counts.reshape((n_bootstrap + 1,) + tuple(shape))
+
+    batches = np.array_split(np.arange(n_bootstrap + 1),
+                             min(effective_n_jobs(n_jobs), n_bootstrap + 1))
+    delta = binning[1]
+    with ThreadPoolExecutor(len(batches)) as executor:
+        smoothed = list(executor.map(
+            lambda b: _take_nodes(gaussian_smooth(counts[b], delta, cov,
+                                                  periodic), index),
+            batches))
+    density = np.concatenate(smoothed)
+    density /= total.reshape((-1,) + ndim * (1,))
+
+    density = np.clip(density, np.finfo(float).tiny, None)
+    return grids, density[0], density[1:]
+
+
+def gaussian_sum(X, points, cov, weights=None, n_jobs=1,
+                 max_bytes=TILE_BYTES, block_size=BLOCK_SIZE):
+    """
+    Sum of Gaussian kernels centered on the samples, evaluated directly.
+
+    The samples are read ``block_size`` rows at a time and, for each block,
+    tiles of evaluation points are processed in parallel threads. Each
+    thread works through its block in slices of samples sized so that its
+    temporary (points x samples) array takes at most ``max_bytes``.
+
+    Parameters
+    ----------
+    X : array-like (nsamples, ndim)
+        Centers of the kernels. Anything that can be sliced along its first
+        axis, such as a memory-mapped array, is read in blocks.
+    points : array-like (npoints, ndim)
+        Points at which to evaluate the sum.
+    cov : ndarray (ndim, ndim)
+        Kernel covariance matrix.
+    weights : array-like (nsamples,), optional
+        Weight of each kernel.
+    n_jobs : int, optional (default: 1)
+        Number of threads. -1 uses all processors.
+    max_bytes : int, optional
+        Size of the temporary array of each thread.
+    block_size : int, optional
+        Number of samples processed at a time.
+
+    Returns
+    -------
+    total : ndarray (npoints,)
+        Weighted sum of the normalized kernels at each point.
+    """
+    # Work in whitened coordinates, centered to limit round-off in the
+    # expansion -|p - x|^2 / 2 = p.x - |p|^2 / 2 - |x|^2 / 2
+    whiten = np.linalg.cholesky(np.linalg.inv(cov))
+    points = np.asarray(points, dtype=float)
+    center = points.mean(axis=0)
+    P = (points - center).dot(whiten)
+    P_sq = -0.5 * (P ** 2).sum(axis=1)[:, np.newaxis]
+    norm = 1. / np.sqrt(np.linalg.det(2 * np.pi * cov))
+
+    n_points = P.shape[0]
+    n_jobs = effective_n_jobs(n_jobs)
+    tile = max(1, min(TILE_POINTS, -(-n_points // n_jobs)))
+    tiles = [slice(start, start + tile) for start in
+             range(0, n_points, tile)]
+    step = max(1, max_bytes // (8 * tile))
+    total = np.zeros(n_points)
+
+    def accumulate(t, x, x_sq, w):
+        for start in range(0, x.shape[0], step):
+            stop = start + step
+            e = P[t].dot(x[start:stop].T)
+            e += P_sq[t]
+            e += x_sq[start:stop]
+            # Underflowing exponentials are slow, and negligible
+            np.clip(e, MIN_EXPONENT, 0., out=e)
+            np.exp(e, out=e)
+            total[t] += (e.sum(axis=1) if w is None else
+                         e.dot(w[start:stop]))
+
+    with ThreadPoolExecutor(min(n_jobs, len(tiles))) as executor:
+        for x, w in _iter_blocks(X, weights, block_size):
+            x = (x - center).dot(whiten)
+            x_sq = -0.5 * (x ** 2).sum(axis=1)
+            list(executor.map(lambda t: accumulate(t, x, x_sq, w), tiles))
+    return norm * total
+
+
+def direct_kde(X, bw='scott', gridsize=100, cut=3, clip=None, weights=None,
+               n_jobs=1, block_size=BLOCK_SIZE):
+    """
+    Gaussian kernel density estimate by direct summation on a grid.
+
+    This matches ``scipy.stats.gaussian_kde`` up to round-off, but supports
+    weights and uses ``n_jobs`` threads with bounded temporary memory (see
+    ``gaussian_sum``). Its cost is proportional to the number of samples
+    times the number of grid points, so ``fft_kde`` is faster for large
+    datasets.
+
+    Parameters
+    ----------
+    n_jobs : int, optional (default: 1)
+        Number of threads. -1 uses all processors.
+
+    The remaining parameters and return values are the same as for
+    ``fft_kde``.
+    """
+    ndim = X.shape[1]
+    moments = RunningMoments(ndim)
+    for x, w in _iter_blocks(X, weights, block_size):
+        moments.update(x, w)
+    if clip is None:
+        clip = ndim * [(-np.inf, np.inf)]
+
+    cov = kernel_covariance(moments, bw)
+    sigma = np.sqrt(np.diag(cov))
+    grids = [_kde_support(moments.min[i], moments.max[i], sigma[i],
+                          gridsize, cut, clip[i]) for i in range(ndim)]
+
+    points = np.stack(np.meshgrid(*grids, indexing='ij'), axis=-1)
+    density = gaussian_sum(X, points.reshape(-1, ndim), cov, weights=weights,
+                           n_jobs=n_jobs, block_size=block_size)
+    density = density.reshape(points.shape[:-1]) / moments.sum_w
+    return grids, np.clip(density, np.finfo(float).tiny, None)
+
+
+def _binning_grid(moments, bw, gridsize, cut, clip, max_bins):
+    """Evaluation grid, kernel covariance, binning grid (as arguments to
+    ``linear_binning``) and the index of the evaluation nodes in the binning
+    grid (see ``_take_nodes``)."""
+    ndim = moments.ndim
+    periodic = moments.periodic
+    if clip is None:
+        clip = ndim * [(-np.inf, np.inf)]
+
+    cov = kernel_covariance(moments, bw)
+    sigma = np.sqrt(np.diag(cov))
+
+    # Periodic grids span a full turn, with the first node repeated last
+    grids = [np.linspace(-PERIOD / 2, PERIOD / 2, gridsize) if periodic[i]
+             else _kde_support(moments.min[i], moments.max[i], sigma[i],
+                               gridsize, cut, clip[i]) for i in range(ndim)]
+    step = np.array([g[1] - g[0] for g in grids])
+
+    # Refine the binning grid so that the kernel is well resolved
+    max_refine = max(1, (max_bins - 1) // (gridsize - 1))
+    refine = np.clip(np.ceil(OVERSAMPLE * step / sigma), 1,
+                     max_refine).astype(int)
+    delta = step / refine
+    n_nodes = (gridsize - 1) * refine + 1
+
+    # Pad the binning grid by the kernel width so that samples beyond
+    # the evaluation grid still contribute their tails. Periodic grids wrap
+    # around instead, and do not repeat their first node.
+    half_width = np.where(periodic, 0, np.minimum(
+        np.ceil(KERNEL_CUTOFF * sigma / delta), n_nodes)).astype(int)
+    lo = np.array([g[0] for g in grids]) - half_width * delta
+    shape = tuple(n_nodes - periodic + 2 * half_width)
+
+    index = tuple(np.arange(0, n, r) % (n - 1) if p else slice(k, k + n, r)
+                  for k, n, r, p in zip(half_width, n_nodes, refine,
+                                        periodic))
+    return grids, cov, (lo, delta, shape), index
+
+
+def _take_nodes(density, index):
+    """Select the evaluation nodes from the trailing axes of a smoothed
+    binning grid, one axis at a time."""
+    for axis, idx in enumerate(index, density.ndim - len(index)):
+        density = density[(slice(None),) * axis + (idx,)]
+    return density
+
+
+def _clipped_blocks(X, weights, clip, block_size):
+    for x, w in _iter_blocks(X, weights, block_size):
+        if clip is not None:
+            inside = np.all((x >= clip[:, 0]) & (x <= clip[:, 1]), axis=1)
+            x = x[inside]
+            w = None if w is None else w[inside]
+        yield x, w
+
+
+def histogram_density(X, bins=30, edges='uniform', clip=None, smooth=None,
+                      weights=None, block_size=BLOCK_SIZE):
+    """
+    Density estimate from a (weighted) histogram.
+
+    Each sample is counted once, so the cost is linear in the number of
+    samples whatever the number of bins. Samples and weights are read
+    ``block_size`` rows at a time.
+
+    Parameters
+    ----------
+    X : array-like (nsamples, ndim)
+        The samples.
+    bins : int, optional (default: 30)
+        Number of bins along each dimension.
+    edges : {'uniform' | 'quantile'}, optional (default: 'uniform')
+        'uniform' spaces the bin edges evenly between the extreme samples.
+        'quantile' places them at (weighted) quantiles of each dimension,
+        interpolated from a fine histogram, so that sparsely sampled
+        regions get wider bins. Repeated quantiles
+        are merged, which can leave fewer bins.
+    clip : sequence of pairs of scalars, optional
+        Lower and upper bounds of the samples used along each dimension.
+    smooth : scalar or sequence of scalars, optional
+        Standard deviation, in bins, of a Gaussian filter applied to the
+        counts along each dimension.
+    weights : array-like (nsamples,), optional
+        Weight of each sample.
+    block_size : int, optional
+        Number of samples processed at a time.
+
+    Returns
+    -------
+    centers : list of ndarrays
+        Bin centers along each dimension.
+    density : ndarray
+        Density in each bin, indexed like ``centers``. Empty bins are zero.
+    """
+    X = np.asarray(X, dtype=float)
+    if np.ndim(X) == 1:
+        X = np.reshape(X, (-1, 1))
+    ndim = X.shape[1]
+    if clip is not None:
+        clip = np.asarray(clip, dtype=float).reshape(ndim, 2)
+
+    moments = RunningMoments(ndim)
+    total = 0.
+    for x, w in _iter_blocks(X, weights, block_size):
+        total += x.shape[0] if w is None else w.sum()
+    for x, w in _clipped_blocks(X, weights, clip, block_size):
+        moments.update(x, w)
+
+    if edges == 'uniform':
+        bin_edges = [np.linspace(lo, hi, bins + 1)
+                     for lo, hi in zip(moments.min, moments.max)]
+    elif edges == 'quantile':
+        # Weighted quantiles, interpolated from a fine histogram
+        fine = [np.linspace(lo, hi, QUANTILE_BINS + 1)
+                for lo, hi in zip(moments.min, moments.max)]
+        cdf = np.zeros((ndim, QUANTILE_BINS))
+        for x, w in _clipped_blocks(X, weights, clip, block_size):
+            for i in range(ndim):
+                cdf[i] += np.histogram(x[:, i], fine[i], weights=w)[0]
+        cdf = np.cumsum(cdf, axis=1)
+        q = np.linspace(0., 1., bins + 1)
+        bin_edges = [np.unique(np.interp(q * c[-1], np.r_[0., c], f))
+                     for c, f in zip(cdf, fine)]
+    else:
+        raise ValueError("edges must be 'uniform' or 'quantile'")
+
+    counts = 0.
+    for x, w in _clipped_blocks(X, weights, clip, block_size):
+        counts = counts + np.histogramdd(x, bins=bin_edges, weights=w)[0]
+
+    if smooth:
+        sigma = np.broadcast_to(np.asarray(smooth, dtype=float), (ndim,))
+        counts = gaussian_smooth(counts, np.ones(ndim), np.diag(sigma ** 2))
+        # Round-off of the FFT leaves tiny values in empty regions
+        counts[counts < 1e-12 * counts.max()] = 0.
+
+    volume = reduce(np.multiply, np.ix_(*[np.diff(e) for e in bin_edges]))
+    centers = [(e[1:] + e[:-1]) / 2. for e in bin_edges]
+    return centers, counts / (total * volume)
+
+
+def circular_histogram(angles, bins, origin=-180., weights=None,
+                       block_size=BLOCK_SIZE):
+    """
+    Histogram of angles over one full turn.
+
+    Angles are wrapped into ``[origin, origin + 360)`` one block at a time,
+    so any number of turns is accepted and each sample is read once. The
+    columns of a 2-D array are histogrammed together, with a single
+    ``np.bincount`` per block.
+
+    Parameters
+    ----------
+    angles : array-like (nsamples,) or (nsamples, nangles)
+        Angles in degrees. Memory-mapped arrays are read in blocks.
+    bins : int
+        Number of bins.
+    origin : float, optional (default: -180)
+        Lower edge of the first bin, in degrees.
+    weights : array-like (nsamples,), optional
+        Weight of each sample.
+    block_size : int, optional
+        Number of angles processed at a time.
+
+    Returns
+    -------
+    edges : ndarray (bins + 1,)
+        Bin edges in degrees.
+    counts : ndarray (bins,) or (nangles, bins)
+        Total weight in each bin, for each column of ``angles``.
+    """
+    if np.ndim(angles) != 2:
+        angles = np.reshape(angles, -1)
+    n_angles = 1 if angles.ndim == 1 else angles.shape[1]
+    # Each column is binned into its own range of bins
+    offsets = bins * np.arange(n_angles)
+    counts = np.zeros(bins * n_angles)
+    for x, w in _iter_blocks(angles, weights,
+                             max(1, block_size // n_angles)):
+        t = np.subtract(x, origin, dtype=float)
+        constrain_angles(t, out=t)
+        t *= bins / 360.
+        # Round-off can map angles just below origin + 360 onto bins
+        idx = np.minimum(t.astype(np.intp), bins - 1)
+        if angles.ndim == 2:
+            idx += offsets
+            if w is not None:
+                w = np.repeat(w, n_angles)
+        counts += np.bincount(idx.ravel(), weights=w,
+                              minlength=bins * n_angles)
+    edges = np.linspace(origin, origin + 360., bins + 1)
+    if angles.ndim == 2:
+        return edges, counts.reshape(n_angles, bins)
+    return edges, counts
+
+
+def vonmises_concentration(counts, bw='scott', n_eff=None):
+    """
+    Concentration of a von Mises kernel for a circular histogram.
+
+    The kernel width is the circular standard deviation of the histogram,
+    ``sqrt(-2 log R)`` for a mean resultant length ``R``, times a bandwidth
+    factor, in analogy with ``kernel_covariance``.
+
+    Parameters
+    ----------
+    counts : ndarray (bins,) or (..., bins)
+        Histograms over one full turn, e.g. from ``circular_histogram``.
+        Leading axes are treated as a batch.
+    bw : {'scott' | 'silverman' | scalar}, optional
+        Name of reference method to determine the bandwidth factor, or the
+        factor itself.
+    n_eff : float, optional
+        Effective number of samples. Defaults to the total count.
+
+    Returns
+    -------
+    kappa : float or ndarray (...,)
+        Concentration of the kernel for each histogram.
+    """
+    bins = counts.shape[-1]
+    total = counts.sum(axis=-1)
+    if n_eff is None:
+        n_eff = total
+    if isinstance(bw, str):
+        if bw == 'scott':
+            factor = n_eff ** -0.2
+        elif bw == 'silverman':
+            factor = (n_eff * 3 / 4.) ** -0.2
+        else:
+            raise ValueError('bw must be "scott", "silverman" or a scalar')
+    else:
+        factor = float(bw)
+
+    theta = 2 * np.pi * (np.arange(bins) + 0.5) / bins
+    sigma = _circular_std(np.dot(counts, np.exp(1j * theta)), total) * factor
+    # Kernels much narrower than a bin all act as the identity
+    sigma = np.maximum(sigma, np.pi / bins)
+    return 1. / sigma ** 2
+
+
+def vonmises_smooth(counts, kappa):
+    """
+    Circular convolution of a histogram with a von Mises kernel.
+
+    Parameters
+    ----------
+    counts : ndarray (..., bins)
+        Histograms over one full turn. Leading axes are treated as a batch.
+    kappa : float or ndarray (...,)
+        Concentration of the kernel, or of the kernel of each histogram.
+
+    Returns
+    -------
+    smoothed : ndarray (..., bins)
+        The smoothed histograms, with the same total weight.
+    """
+    bins = counts.shape[-1]
+    theta = 2 * np.pi * np.arange(bins) / bins
+    # Scaled by exp(-kappa) to avoid overflow; the kernel is normalized
+    kernel = np.exp(np.multiply.outer(kappa, np.cos(theta) - 1.))
+    kernel /= kernel.sum(axis=-1, keepdims=True)
+    return np.fft.irfft(np.fft.rfft(counts) * np.fft.rfft(kernel), bins)
+
+
+def circular_kde(angles, bw='scott', gridsize=CIRCULAR_BINS, origin=-180.,
+                 weights=None, block_size=BLOCK_SIZE):
+    """
+    Von Mises kernel density estimate of angles.
+
+    The angles are binned once onto a periodic grid (``circular_histogram``)
+    and convolved with a von Mises kernel by FFT, so the estimate is
+    continuous across the wrap-around and linear in the number of samples.
+
+    Parameters
+    ----------
+    angles : array-like (nsamples,)
+        Angles in degrees.
+    bw : {'scott' | 'silverman' | scalar}, optional
+        Bandwidth method or factor (see ``vonmises_concentration``).
+    gridsize : int, optional
+        Number of grid points over the full turn.
+    origin : float, optional (default: -180)
+        Start of the grid in degrees.
+    weights : array-like (nsamples,), optional
+        Weight of each sample.
+    block_size : int, optional
+        Number of samples processed at a time.
+
+    Returns
+    -------
+    grid : ndarray (gridsize,)
+        Grid points in degrees, at the centers of the bins.
+    density : ndarray (gridsize,)
+        Density per degree at each grid point.
+    """
+    edges, counts = circular_histogram(angles, gridsize, origin, weights,
+                                       block_size)
+    n_eff = None
+    if weights is not None:
+        w = np.asarray(weights, dtype=float)
+        n_eff = w.sum() ** 2 / np.dot(w, w)
+    kappa = vonmises_concentration(counts, bw, n_eff)
+    density = vonmises_smooth(counts, kappa)
+    delta = 360. / gridsize
+    return edges[:-1] + delta / 2, density / (counts.sum() * delta)
+
+
+def fft_univariate_kde(data, bw, gridsize, cut, clip, weights=None):
+    """Univariate FFT KDE with the call signature and return values of
+    seaborn's ``_scipy_univariate_kde``."""
+    (grid,), y = fft_kde(np.reshape(data, (-1, 1)), bw=bw, gridsize=gridsize,
+                         cut=cut, clip=[clip], weights=weights)
+    return grid, y
+
+
+def fft_bivariate_kde(x, y, bw, gridsize, cut, clip, weights=None):
+    """Bivariate FFT KDE with the call signature and return values of
+    seaborn's ``_scipy_bivariate_kde``."""
+    (x_support, y_support), z = fft_kde(np.c_[x, y], bw=bw,
+                                        gridsize=gridsize, cut=cut,
+                                        clip=clip, weights=weights)
+    xx, yy = np.meshgrid(x_support, y_support)
+    return xx, yy, z.T
+
+
+def direct_univariate_kde(data, bw, gridsize, cut, clip, weights=None,
+                          n_jobs=1):
+    """Univariate direct KDE with the call signature and return values of
+    seaborn's ``_scipy_univariate_kde``."""
+    (grid,), y = direct_kde(np.reshape(data, (-1, 1)), bw=bw,
+                            gridsize=gridsize, cut=cut, clip=[clip],
+                            weights=weights, n_jobs=n_jobs)
+    return grid, y
+
+
+def direct_bivariate_kde(x, y, bw, gridsize, cut, clip, weights=None,
+                         n_jobs=1):
+    """Bivariate direct KDE with the call signature and return values of
+    seaborn's ``_scipy_bivariate_kde``."""
+    (x_support, y_support), z = direct_kde(np.c_[x, y], bw=bw,
+                                           gridsize=gridsize, cut=cut,
+                                           clip=clip, weights=weights,
+                                           n_jobs=n_jobs)
+    xx, yy = np.meshgrid(x_support, y_support)
+    return xx, yy, z.T
@@ -0,0 +1,303 @@
+"""
+Layouts of MSM networks.
+
+``spring_layout`` is a Fruchterman-Reingold force-directed layout whose
+repulsion between all pairs of nodes is approximated on a grid: the nodes
+are linearly binned and the binned "charge" is convolved with the repulsive
+kernel by FFT, as in particle-mesh N-body codes. Each iteration then costs
+O(nnodes + nedges + grid log grid) instead of O(nnodes ** 2). Large
+networks are laid out from a hierarchy of coarsened networks, so that the
+global shape is found cheaply, and networks of ``10 ** 4`` states are laid
+out in seconds. ``spectral_layout`` places the states along the slowest
+processes of the model instead.
+"""
+import numpy as np
+from scipy import sparse
+from scipy.fftpack import next_fast_len
+
+from .kde import linear_binning
+from .sampling import check_random_state
+
+__all__ = ['spring_layout', 'spectral_layout']
+
+LAYOUTS = ('spring', 'spectral')
+
+# Bounds on the number of grid nodes per dimension for the repulsion.
+MIN_GRID_SIZE = 16
+MAX_GRID_SIZE = 512
+
+# Multilevel layouts coarsen networks down to about this many nodes, and
+# stop when a round of coarsening removes less than a quarter of them.
+COARSEST_SIZE = 50
+COARSENING = 0.75
+
+# Largest step of the first iteration, in the [-1, 1] box, and in units of
+# the optimal distance between nodes when refining a coarser layout.
+TEMPERATURE = 0.2
+REFINE_TEMPERATURE = 4.
+
+_GOLDEN_ANGLE = np.pi * (3 - np.sqrt(5))
+
+
+def _rescale(pos):
+    """Center positions and scale them into [-1, 1]."""
+    pos = pos - pos.mean(axis=0)
+    scale = np.abs(pos).max() if pos.size else 0
+    return pos / scale if scale > 0 else pos
+
+
+def _spiral(n_nodes):
+    """Deterministic, evenly spread starting positions in the unit disk."""
+    i = np.arange(n_nodes)
+    r = np.sqrt((i + .5) / n_nodes)
+    return np.column_stack([r * np.cos(i * _GOLDEN_ANGLE),
+                            r * np.sin(i * _GOLDEN_ANGLE)])
+
+
+def _repulsion_kernel(grid_size, fft_shape):
+    """FFTs of the x and y components of ``r / (|r| ** 2 + 1)``, for
+    offsets ``r`` in grid units. The softening spreads the repulsion of
+    nodes closer than a grid cell."""
+    m = np.arange(-(grid_size - 1), grid_size, dtype=float)
+    dx, dy = np.meshgrid(m, m, indexing='ij')
+    r2 = dx * dx + dy * dy + 1
+    return (np.fft.rfft2(dx / r2, fft_shape),
+            np.fft.rfft2(dy / r2, fft_shape))
+
+
+def _self_repulsion(frac):
+    """Repulsion of each node by its own binned charge, in grid units.
+
+    A node splits its charge between the four surrounding grid nodes, and
+    the field interpolated back at the node includes the contribution of
+    these four charges, which is not zero away from the center of a cell.
+    """
+    corners = [(0, 0), (0, 1), (1, 0), (1, 1)]
+    weights = [np.where(a, frac[:, 0], 1 - frac[:, 0]) *
+               np.where(b, frac[:, 1], 1 - frac[:, 1]) for a, b in corners]
+    force = np.zeros_like(frac)
+    for (a, b), wa in zip(corners, weights):
+        for (c, d), wc in zip(corners, weights):
+            r = np.array([c - a, d - b], dtype=float)
+            if r.any():
+                force += (wa * wc)[:, None] * r / (r.dot(r) + 1)
+    return force
+
+
+def _coarsen(row, col, weight, n_nodes, rounds=20):
+    """Merge the nodes of a heavy-edge matching. Returns the coarse node of
+    each node and the number of coarse nodes.
+
+    In each round, every unmatched node picks its heaviest unmatched
+    neighbour, and mutual picks are matched, until no pick is mutual. Ties
+    are broken by a deterministic perturbation of the weights.
+    """
+    lo, hi = np.minimum(row, col), np.maximum(row, col)
+    w = weight * (1 + 1e-3 * ((lo * 7919 + hi * 104729) % 997) / 997.)
+    adj = sparse.coo_matrix((np.r_[w, w], (np.r_[row, col], np.r_[col, row])),
+                            shape=(n_nodes, n_nodes)).tocsr()
+    nodes = np.arange(n_nodes)
+    match = np.full(n_nodes, -1)
+    for _ in range(rounds):
+        free = sparse.diags((match < 0).astype(float))
+        candidates = (free.dot(adj).dot(free)).tocsr()
+        candidates.eliminate_zeros()
+        has = np.diff(candidates.indptr) > 0
+        if not has.any():
+            break
+        best = np.asarray(candidates.argmax(axis=1)).ravel()
+        mutual = has & (best[best] == nodes) & (best != nodes)
+        if not mutual.any():
+            break
+        match[mutual] = best[mutual]
+    match[match < 0] = nodes[match < 0]
+    _, labels = np.unique(np.minimum(nodes, match), return_inverse=True)
+    return labels, labels.max() + 1
+
+
+def _force_directed(row, col, weight, n_nodes, pos, iterations, temperature,
+                    grid_size):
+    """Fruchterman-Reingold iterations with particle-mesh repulsion."""
+    if grid_size is None:
+        grid_size = int(np.clip(2 * np.sqrt(n_nodes), MIN_GRID_SIZE,
+                                MAX_GRID_SIZE))
+    shape = (grid_size, grid_size)
+    # Only the field on the grid is needed, so the convolution may wrap
+    # around as long as it does not wrap onto the grid
+    fft_shape = (next_fast_len(2 * grid_size - 1),) * 2
+    kernel_x, kernel_y = _repulsion_kernel(grid_size, fft_shape)
+    keep = slice(grid_size - 1, 2 * grid_size - 1)
+
+    # Optimal distance between nodes in the [-1, 1] box
+    pos = _rescale(pos)
+    k = np.sqrt(4. / n_nodes)
+    # The largest step cools down linearly
+    t = temperature
+    dt = t / (iterations + 1)
+    for _ in range(iterations):
+        lo = pos.min(axis=0)
+        delta = max((pos.max(axis=0) - lo).max(), k) / (grid_size - 1)
+        charge = linear_binning(pos, lo, [delta, delta], shape)
+        charge_hat = np.fft.rfft2(charge, fft_shape)
+        fx = np.fft.irfft2(charge_hat * kernel_x, fft_shape)[keep, keep]
+        fy = np.fft.irfft2(charge_hat * kernel_y, fft_shape)[keep, keep]
+
+        # Interpolate the field back to the nodes
+        u = np.minimum((pos - lo) / delta, grid_size - 1 - 1e-9)
+        i = u.astype(np.intp)
+        frac = u - i
+        disp = np.zeros_like(pos)
+        for a in (0, 1):
+            for b in (0, 1):
+                w = (np.where(a, frac[:, 0], 1 - frac[:, 0]) *
+                     np.where(b, frac[:, 1], 1 - frac[:, 1]))
+                ia = np.minimum(i[:, 0] + a, grid_size - 1)
+                ib = np.minimum(i[:, 1] + b, grid_size - 1)
+                disp[:, 0] += w * fx[ia, ib]
+                disp[:, 1] += w * fy[ia, ib]
+        disp -= _self_repulsion(frac)
+        # The kernel is in grid units: k ** 2 * r / |r| ** 2
+        disp *= k * k / delta
+
+        diff = pos[row] - pos[col]
+        dist = np.sqrt((diff * diff).sum(axis=1))
+        pull = (weight * dist / k)[:, None] * diff
+        for d in (0, 1):
+            disp[:, d] -= np.bincount(row, pull[:, d], minlength=n_nodes)
+            disp[:, d] += np.bincount(col, pull[:, d], minlength=n_nodes)
+
+        length = np.sqrt((disp * disp).sum(axis=1))
+        step = np.minimum(length, t) / np.where(length > 0, length, 1)
+        pos += disp * step[:, None]
+        t -= dt
+    return _rescale(pos)
+
+
+def _multilevel(row, col, weight, n_nodes, pos, iterations, grid_size):
+    """Lay out a coarsened network, then refine its positions."""
+    if n_nodes > COARSEST_SIZE and row.size:
+        labels, n_coarse = _coarsen(row, col, weight, n_nodes)
+        if n_coarse <= COARSENING * n_nodes:
+            coarse = sparse.coo_matrix(
+                (weight, (labels[row], labels[col])),
+                shape=(n_coarse, n_coarse)).tocsr().tocoo()
+            inter = coarse.row != coarse.col
+            size = np.bincount(labels, minlength=n_coarse)
+            start = np.column_stack([
+                np.bincount(labels, pos[:, d], minlength=n_coarse) / size
+                for d in (0, 1)])
+            # Merged edges keep the mean weight of the network, so that
+            # the coarse network is not pulled tighter than the fine one
+            coarse_weight = coarse.data[inter]
+            coarse_weight *= weight.mean() / coarse_weight.mean()
+            coarse_pos = _multilevel(coarse.row[inter], coarse.col[inter],
+                                     coarse_weight, n_coarse, start,
+                                     iterations, None)
+            # Members of a coarse node start next to each other
+            k = np.sqrt(4. / n_nodes)
+            pos = coarse_pos[labels] + 0.1 * k * _spiral(n_nodes)
+            return _force_directed(row, col, weight, n_nodes, pos,
+                                   iterations, REFINE_TEMPERATURE * k,
+                                   grid_size)
+    return _force_directed(row, col, weight, n_nodes, pos, iterations,
+                           TEMPERATURE, grid_size)
+
+
+def spring_layout(row, col, weight=None, n_nodes=None, pos=None,
+                  iterations=50, random_state=None, grid_size=None,
+                  multilevel=True):
+    """
+    Force-directed layout of a network.
+
+    Connected nodes attract each other with a force proportional to the
+    square of their distance and the weight of their edge, and all nodes
+    repel each other with a force inversely proportional to their distance,
+    as in ``networkx.spring_layout``. The repulsion is computed on a
+    ``grid_size`` by ``grid_size`` grid spanning the nodes.
+
+    Large networks are first coarsened by repeatedly merging pairs of
+    strongly connected nodes. The coarsest network is laid out, and each
+    finer network starts from the positions of its merged nodes, which
+    untangles long chains and lattices that a single level leaves folded.
+
+    Parameters
+    ----------
+    row, col : array-like (nedges,)
+        The nodes joined by each edge.
+    weight : array-like (nedges,), optional
+        Weight of each edge. Defaults to unit weights.
+    n_nodes : int, optional
+        Number of nodes. Defaults to one more than the largest node in
+        ``row`` and ``col``.
+    pos : array-like (n_nodes, 2), optional
+        Starting positions. Multilevel layouts only use them to start the
+        coarsest level.
+    iterations : int, optional (default: 50)
+        Number of iterations at each level.
+    random_state : int or RandomState, optional
+        Seed of uniformly random starting positions. By default the nodes
+        start on a spiral, so the layout is deterministic.
+    grid_size : int, optional
+        Number of grid nodes along each dimension of the finest level.
+        Defaults to about twice the square root of the number of nodes.
+    multilevel : bool, optional (default: True)
+        Whether to coarsen networks of more than ``COARSEST_SIZE`` nodes.
+
+    Returns
+    -------
+    pos : ndarray (n_nodes, 2)
+        Node positions, centered and scaled into [-1, 1].
+    """
+    row = np.asarray(row, dtype=np.intp)
+    col = np.asarray(col, dtype=np.intp)
+    weight = (np.ones(row.shape[0]) if weight is None
+              else np.asarray(weight, dtype=float))
+    if n_nodes is None:
+        n_nodes = int(max(row.max(), col.max())) + 1 if row.size else 0
+    if pos is not None:
+        pos = np.array(pos, dtype=float)
+        if pos.shape != (n_nodes, 2):
+            raise ValueError('pos must have shape (n_nodes, 2)')
+    elif random_state is not None:
+        pos = check_random_state(random_state).rand(n_nodes, 2)
+    else:
+        pos = _spiral(n_nodes)
+    if n_nodes < 2:
+        return np.zeros((n_nodes, 2))
+
+    if multilevel:
+        return _multilevel(row, col, weight, n_nodes, pos, iterations,
+                           grid_size)
+    return _force_directed(row, col, weight, n_nodes, pos, iterations,
+                           TEMPERATURE, grid_size)
+
+
+def spectral_layout(vectors):
+    """
+    Layout of an MSM along its slowest processes.
+
+    The coordinates of each state are its components in the second and
+    third left eigenvectors of the transition matrix, divided by its
+    stationary population (the first left eigenvector), i.e. its components
+    in the corresponding right eigenvectors. States that interconvert
+    slowly are placed far apart.
+
+    Parameters
+    ----------
+    vectors : array-like (nstates, nvectors)
+        Left eigenvectors, as columns sorted by decreasing eigenvalue, like
+        ``MarkovStateModel.left_eigenvectors_``. Missing eigenvectors are
+        replaced by zeros.
+
+    Returns
+    -------
+    pos : ndarray (nstates, 2)
+        State positions, centered and scaled into [-1, 1].
+    """
+    vectors = np.real(np.asarray(vectors))
+    pop = vectors[:, 0]
+    pos = np.zeros((vectors.shape[0], 2))
+    n = min(vectors.shape[1] - 1, 2)
+    np.divide(vectors[:, 1:n + 1], pop[:, None], out=pos[:, :n],
+              where=pop[:, None] != 0)
+    return _rescale(pos)
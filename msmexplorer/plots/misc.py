@@ -3,16 +3,24 @@ import pandas as pd
 
 from matplotlib import pyplot as pp
 from matplotlib.path import Path
+from matplotlib import animation
 from matplotlib.colors import Normalize
+from matplotlib.collections import LineCollection
 import matplotlib.gridspec as gridspec
 import matplotlib.patches as patches
 
 import seaborn.apionly as sns
 
-from ..utils import msme_colors, wrap_angle, constrain_angle
+from ..utils import (msme_colors, take_columns, iter_blocks,
+                     ConcatenatedArray)
+from ..decimate import DecimatedLine
+from ..rolling import rolling_statistic, ROLLING_STATISTICS
+from ..kde import (fft_univariate_kde, circular_histogram,
+                   vonmises_concentration, vonmises_smooth, CIRCULAR_BINS)
 from .. import palettes
 
-__all__ = ['plot_chord', 'plot_stackdist', 'plot_trace', 'plot_trace2d', 'plot_angle']
+__all__ = ['plot_chord', 'plot_stackdist', 'plot_trace', 'plot_traces',
+           'plot_trace2d', 'animate_trace2d', 'plot_angle', 'plot_angles']
 
 
 def plot_chord(data, ax=None, cmap=None, labels=None, labelsize=12, norm=True,
@@ -223,7 +231,8 @@ def plot_stackdist(data, size=.5, aspect=12, x_labels=None,
 @msme_colors
 def plot_trace(data, label=None, window=1, ax=None, side_ax=None,
                color='beryl', alpha=0.8, legend=None, xlabel=None, ylabel=None,
-               labelsize=14, rolling_kwargs=None):
+               labelsize=14, rolling_kwargs=None, downsample=None,
+               statistic='mean'):
     """
     Plot trace of time-series data.
 
@@ -257,7 +266,22 @@ def plot_trace(data, label=None, window=1, ax=None, side_ax=None,
     labelsize : int, optional (default: 14)
         Font side for axes labels.
     rolling_kwargs : dict, optional
-        Keyword arguments for ``pandas.DataFrame.rolling``.
+        Keyword arguments for ``pandas.DataFrame.rolling``. If given, the
+        rolling statistic is computed by pandas and the histogram is drawn
+        by pandas and seaborn. Otherwise, the trace is computed by
+        ``msmexplorer.rolling`` without copying the data, and the histogram
+        and its density estimate (``msmexplorer.kde``) are computed in a
+        single pass.
+    downsample : {'m4' | 'lttb'}, optional
+        Draw the trace decimated to the width of the axis in pixels, and
+        decimate it again whenever the x-limits change (e.g. on zoom), so
+        drawing time does not depend on the length of the series. 'm4' keeps
+        the first, last, minimum and maximum samples of each pixel column
+        and looks the same as the full trace. 'lttb' keeps two points per
+        pixel column (largest-triangle-three-buckets). See
+        ``msmexplorer.decimate``. By default, every sample is drawn.
+    statistic : {'mean' | 'std' | 'median'}, optional (default: 'mean')
+        Statistic of the moving window to plot.
 
     Returns
     -------
@@ -282,10 +306,31 @@ def plot_trace(data, label=None, window=1, ax=None, side_ax=None,
     if legend is None:
         legend = (label is not None)
 
-    df = (pd.DataFrame(data, columns=(label,))
-          .rolling(window, **rolling_kwargs)
-          .mean())
-    df.plot(ax=ax, color=color, alpha=alpha, legend=legend)
+    if statistic not in ROLLING_STATISTICS:
+        raise ValueError('statistic must be one of %s'
+                         % ', '.join(map(repr, ROLLING_STATISTICS)))
+
+    if rolling_kwargs:
+        df = getattr(pd.DataFrame(data, columns=(label,))
+                     .rolling(window, **rolling_kwargs), statistic)()
+        trace = df[label].values
+    else:
+        df = None
+        trace = rolling_statistic(data, window, statistic)
+
+    if downsample is not None:
+        line, = ax.plot([], [], color=color, alpha=alpha, label=label)
+        DecimatedLine(ax, line, trace, method=downsample)
+        ax.relim()
+        ax.autoscale_view()
+        if legend:
+            ax.legend()
+    elif df is not None:
+        df.plot(ax=ax, color=color, alpha=alpha, legend=legend)
+    else:
+        ax.plot(trace, color=color, alpha=alpha, label=label)
+        if legend:
+            ax.legend()
 
     ax.tick_params(top='off', right='off')
 
@@ -294,10 +339,23 @@ def plot_trace(data, label=None, window=1, ax=None, side_ax=None,
     if ylabel:
         ax.set_ylabel(ylabel, size=labelsize)
 
-    if side_ax is not None:
+    if side_ax is not None and df is not None:
         df.hist(bins=30, normed=True, color=color, alpha=0.3,
                 orientation='horizontal', ax=side_ax)
         sns.kdeplot(df[label], color=color, ax=side_ax, vertical=True)
+    elif side_ax is not None:
+        # Windows that are not full or contain gaps are NaN
+        values = trace[np.isfinite(trace)]
+        if values.size:
+            density, edges = np.histogram(values, bins=30, density=True)
+            side_ax.hist(edges[:-1], bins=edges, weights=density,
+                         color=color, alpha=0.3, orientation='horizontal')
+        # The density of fewer than two distinct values is undefined
+        if values.size and values.min() < values.max():
+            grid, kde = fft_univariate_kde(values, bw='scott', gridsize=100,
+                                           cut=3, clip=(-np.inf, np.inf))
+            side_ax.plot(kde, grid, color=color)
+    if side_ax is not None:
         side_ax.tick_params(top='off', right='off')
         side_ax.xaxis.set_ticklabels([])
         side_ax.legend([])
@@ -306,10 +364,278 @@ def plot_trace(data, label=None, window=1, ax=None, side_ax=None,
     return ax, side_ax
 
 
+TRACE_LAYOUTS = ('overlay', 'grid')
+
+
+@msme_colors
+def plot_traces(data, window=1, statistic='mean', layout='overlay', ncols=5,
+                labels=None, color='beryl', alpha=0.8, xlabel=None,
+                ylabel=None, labelsize=14, bins=30, line_kwargs=None):
+    """
+    Plot the traces of many time series at once.
+
+    The rolling statistics of all series are computed in one pass over
+    their concatenation, and the traces in each axis are drawn as a single
+    ``LineCollection``, so hundreds of trajectories can be plotted quickly.
+
+    Parameters
+    ----------
+    data : list of array-like (nsamples_i, )
+        The time series, e.g. one per trajectory.
+    window : int, optional (default: 1)
+        Size of the moving window.
+    statistic : {'mean' | 'std' | 'median'}, optional (default: 'mean')
+        Statistic of the moving window to plot (see
+        ``msmexplorer.rolling``).
+    layout : {'overlay' | 'grid'}, optional (default: 'overlay')
+        'overlay' draws all traces on one axis, next to a histogram of all
+        their values. 'grid' draws one small panel per trace, with shared
+        axes.
+    ncols : int, optional (default: 5)
+        Number of columns of panels when ``layout='grid'``.
+    labels : list of str, optional
+        Titles of the panels when ``layout='grid'``.
+    color : str or list of str, optional (default: 'beryl')
+        Color of the traces. A list of colors is cycled over the traces.
+    alpha : float, optional (default: 0.8)
+        Opacity of the traces.
+    xlabel : str, optional
+        x-axis label
+    ylabel : str, optional
+        y-axis label
+    labelsize : int, optional (default: 14)
+        Font size for axes labels.
+    bins : int, optional (default: 30)
+        Number of bins of the histogram when ``layout='overlay'``.
+    line_kwargs : dict, optional
+        Arguments to pass to matplotlib LineCollection
+
+    Returns
+    -------
+    fig : matplotlib figure
+        The figure.
+    axes : ndarray of matplotlib axes
+        ``(ax, side_ax)`` when ``layout='overlay'``, or the
+        ``(nrows, ncols)`` panels when ``layout='grid'``.
+    """
+    if layout not in TRACE_LAYOUTS:
+        raise ValueError("layout must be 'overlay' or 'grid'")
+    if line_kwargs is None:
+        line_kwargs = {}
+    colors = [color] if isinstance(color, str) else list(color)
+
+    arrays = [np.ravel(a) for a in data]
+    lengths = np.array([a.shape[0] for a in arrays])
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    trace = rolling_statistic(np.concatenate(arrays), window, statistic)
+    # Windows that straddle two series are not valid
+    head = (offsets[:-1, None] + np.arange(window - 1)).ravel()
+    trace[head[head < np.repeat(offsets[1:], window - 1)]] = np.nan
+
+    frames = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    segments = np.split(np.column_stack([frames, trace]), offsets[1:-1])
+    segment_colors = [colors[i % len(colors)] for i in range(len(arrays))]
+    xlim = (0, max(1, lengths.max() - 1))
+    ylim = (np.nanmin(trace), np.nanmax(trace))
+
+    if layout == 'overlay':
+        fig, axes = pp.subplots(1, 2, sharey=True, figsize=(20, 5),
+                                gridspec_kw={'width_ratios': [6, 1],
+                                             'wspace': 0.01})
+        ax, side_ax = axes
+        ax.add_collection(LineCollection(segments, colors=segment_colors,
+                                         alpha=alpha, **line_kwargs),
+                          autolim=False)
+        ax.set_xlim(*xlim)
+        ax.set_ylim(*ylim)
+        density, edges = np.histogram(trace, bins=bins, range=ylim,
+                                      density=True)
+        side_ax.hist(edges[:-1], bins=edges, weights=density,
+                     color=colors[0], alpha=0.3, orientation='horizontal')
+        side_ax.xaxis.set_ticklabels([])
+        panels = [ax]
+    else:
+        nrows = -(-len(arrays) // ncols)
+        fig, axes = pp.subplots(nrows, ncols, squeeze=False,
+                                figsize=(2.5 * ncols, 1.5 * nrows))
+        panels = axes.ravel()[:len(arrays)]
+        # Sharing the axes through matplotlib is slow with many panels, so
+        # the limits are set on each one and only outer panels get ticks.
+        bottom = np.arange(len(arrays)) + ncols >= len(arrays)
+        for i, ax in enumerate(panels):
+            ax.add_collection(LineCollection(
+                segments[i:i + 1], colors=segment_colors[i:i + 1],
+                alpha=alpha, **line_kwargs), autolim=False)
+            ax.set_xlim(*xlim)
+            ax.set_ylim(*ylim)
+            if not bottom[i]:
+                ax.set_xticks([])
+            if i % ncols:
+                ax.set_yticks([])
+            if labels is not None:
+                ax.set_title(labels[i], size=labelsize)
+        for ax in axes.ravel()[len(arrays):]:
+            ax.set_visible(False)
+
+    if xlabel:
+        for ax in panels[bottom] if layout == 'grid' else panels:
+            ax.set_xlabel(xlabel, size=labelsize)
+    if ylabel:
+        for ax in panels[::ncols] if layout == 'grid' else panels:
+            ax.set_ylabel(ylabel, size=labelsize)
+
+    return fig, axes
+
+
+AGGREGATE_REDUCTIONS = ('count', 'mean', 'last')
+
+
+def _aggregate_trace(data, obs, ts, shape, reduction, block_size=None):
+    """
+    Bin the frames of a 2-D trace into a grid of pixels.
+
+    Frames are read in blocks and binned with ``np.bincount``, so memory use
+    does not depend on the number of frames. Times restart at zero for each
+    trajectory of a list. Frames with a non-finite coordinate are skipped.
+
+    Returns
+    -------
+    image : ndarray (ny, nx)
+        Number of frames, mean time or last time in each pixel. Empty pixels
+        are nan.
+    extent : tuple
+        ``(xmin, xmax, ymin, ymax)`` of the grid.
+    """
+    if reduction not in AGGREGATE_REDUCTIONS:
+        raise ValueError('reduction must be one of %s'
+                         % ', '.join(map(repr, AGGREGATE_REDUCTIONS)))
+    if isinstance(data, list):
+        data = ConcatenatedArray(data)
+    if isinstance(data, ConcatenatedArray):
+        offsets = data.offsets
+    else:
+        offsets = np.array([0, data.shape[0]])
+
+    lo = np.full(2, np.inf)
+    hi = np.full(2, -np.inf)
+    for block in iter_blocks(data, obs, block_size):
+        block = block[np.isfinite(block).all(axis=1)]
+        if block.shape[0]:
+            lo = np.fmin(lo, np.nanmin(block, axis=0))
+            hi = np.fmax(hi, np.nanmax(block, axis=0))
+    lo = np.where(np.isfinite(lo), lo, 0)
+    hi = np.where(hi > lo, hi, lo + 1)
+
+    nx, ny = shape
+    size = np.array([nx, ny])
+    scale = size / (hi - lo)
+    count = np.zeros(nx * ny)
+    if reduction == 'mean':
+        total = np.zeros(nx * ny)
+    elif reduction == 'last':
+        last = np.full(nx * ny, -np.inf)
+
+    start = 0
+    for block in iter_blocks(data, obs, block_size):
+        finite = np.isfinite(block).all(axis=1)
+        frames = np.arange(start, start + block.shape[0])[finite]
+        start += block.shape[0]
+        idx = ((block[finite] - lo) * scale).astype(np.intp)
+        np.minimum(idx, size - 1, out=idx)
+        flat = idx[:, 1] * nx + idx[:, 0]
+        count += np.bincount(flat, minlength=nx * ny)
+        if reduction != 'count':
+            traj = np.searchsorted(offsets, frames, side='right') - 1
+            time = (frames - offsets[traj]) * ts
+            if reduction == 'mean':
+                total += np.bincount(flat, weights=time, minlength=nx * ny)
+            else:
+                np.maximum.at(last, flat, time)
+
+    empty = count == 0
+    if reduction == 'count':
+        image = count
+    elif reduction == 'mean':
+        image = total / np.where(empty, 1, count)
+    else:
+        image = last
+    image[empty] = np.nan
+    return image.reshape(ny, nx), (lo[0], hi[0], lo[1], hi[1])
+
+
+def _trace_collection(data, obs, ts, hue, stride, plot_kwargs):
+    """
+    Build one LineCollection for all trajectories of a list.
+
+    With ``hue='trajectory'`` each trajectory is a single polyline.
+    Otherwise every step is colored by the time or the observable at its
+    first frame.
+    """
+    data = ConcatenatedArray(data)
+    lengths = -(-data.lengths // stride)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    if stride == 1:
+        rows = None
+    else:
+        rows = np.concatenate([np.arange(a, b, stride) for a, b
+                               in zip(data.offsets[:-1], data.offsets[1:])])
+    points = take_columns(data, obs, rows=rows)
+
+    if isinstance(hue, str) and hue == 'trajectory':
+        colors = pp.rcParams['axes.prop_cycle'].by_key()['color']
+        kwargs = dict(colors=[colors[i % len(colors)]
+                              for i in range(lengths.shape[0])])
+        kwargs.update(plot_kwargs)
+        return points, LineCollection(np.split(points, offsets[1:-1]),
+                                      **kwargs)
+
+    if isinstance(hue, str) and hue == 'time':
+        values = (np.arange(offsets[-1]) -
+                  np.repeat(offsets[:-1], lengths)) * (stride * ts)
+    elif isinstance(hue, str):
+        raise ValueError("hue must be 'trajectory', 'time' or a list of "
+                         "per-frame values")
+    else:
+        values = np.concatenate([np.ravel(v)[::stride] for v in hue])
+        if values.shape[0] != offsets[-1]:
+            raise ValueError('hue must have one value per frame')
+
+    # Steps between the last frame of one trajectory and the first frame of
+    # the next are dropped
+    keep = np.ones(max(0, offsets[-1] - 1), dtype=bool)
+    keep[offsets[1:-1] - 1] = False
+    values = values[:-1][keep]
+
+    # A path per step is very slow to draw, so steps are grouped by their
+    # entry in the colormap (which only has cmap.N colors anyway) and each
+    # group is drawn as one path, broken between steps by NaNs.
+    kwargs = dict(plot_kwargs)
+    cmap = pp.get_cmap(kwargs.pop('cmap', None))
+    norm = kwargs.pop('norm', None)
+    if norm is None:
+        norm = Normalize(values.min(), values.max())
+    level = np.clip((norm(values) * cmap.N).astype(int), 0, cmap.N - 1)
+    order = np.argsort(level, kind='mergesort')
+    vertices = np.full((order.shape[0], 3, 2), np.nan)
+    vertices[:, 0] = points[:-1][keep][order]
+    vertices[:, 1] = points[1:][keep][order]
+    counts = np.bincount(level, minlength=cmap.N)
+    groups = np.split(vertices.reshape(-1, 2), 3 * np.cumsum(counts)[:-1])
+    used = np.flatnonzero(counts)
+
+    collection = LineCollection([groups[i] for i in used], cmap=cmap,
+                                norm=norm, **kwargs)
+    # Each group takes the value at the center of its colormap entry
+    collection.set_array(norm.inverse((used + 0.5) / cmap.N))
+    return points, collection
+
+
 @msme_colors
 def plot_trace2d(data, obs=(0, 1), ts=1.0, cbar=True, ax=None, xlabel=None,
                  ylabel=None, labelsize=14,
-                 cbar_kwargs=None, scatter_kwargs=None, plot_kwargs=None):
+                 cbar_kwargs=None, scatter_kwargs=None, plot_kwargs=None,
+                 render='scatter', reduction='mean', resolution=None,
+                 aggregate_kwargs=None, hue='trajectory', stride=1):
     """
     Plot a 2D trace of time-series data.
 
@@ -320,8 +646,11 @@ def plot_trace2d(data, obs=(0, 1), ts=1.0, cbar=True, ax=None, xlabel=None,
         time-series arrays.
         If it is a single 2D np.array, the elements will be scatter plotted and
         color mapped to their values.
-        If it is a list of 2D np.arrays, each will be plotted with a single color on
-        the same axis.
+        If it is a list of 2D np.arrays, their frames will be joined with
+        lines on the same axis, drawn as a single ``LineCollection`` and
+        colored according to ``hue``.
+        Memory-mapped arrays are read in blocks, and only the columns in
+        ``obs`` are loaded into memory.
     obs: tuple, optional (default: (0,1))
         Observables to plot.
     ts: float, optional (default: 1.0)
@@ -341,7 +670,32 @@ def plot_trace2d(data, obs=(0, 1), ts=1.0, cbar=True, ax=None, xlabel=None,
     scatter_kwargs: dict, optional
         Arguments to pass to matplotlib scatter
     plot_kwargs: dict, optional
-        Arguments to pass to matplotlib plot
+        Arguments to pass to matplotlib LineCollection (e.g. ``cmap`` or
+        ``linewidths``) when data is a list
+    render : {'scatter' | 'aggregate'}, optional (default: 'scatter')
+        'scatter' draws every frame as above. 'aggregate' bins the frames
+        (of a single array or of all arrays in a list) into a grid of
+        pixels and draws it as a single image, so drawing time and file size
+        do not grow with the number of frames.
+    reduction : {'count' | 'mean' | 'last'}, optional (default: 'mean')
+        Value of each pixel when ``render='aggregate'``: the number of
+        frames, or the mean or last time of the frames in it. Times restart
+        at zero for each trajectory of a list.
+    resolution : tuple of int, optional
+        Number of pixels ``(nx, ny)`` when ``render='aggregate'``. Defaults
+        to the size of the axis on screen.
+    aggregate_kwargs: dict, optional
+        Arguments to pass to matplotlib imshow when ``render='aggregate'``
+    hue : {'trajectory' | 'time'} or list of array-like, optional
+        Coloring of the lines when data is a list. 'trajectory' (the
+        default) gives each trajectory a single color from the color cycle.
+        'time' colors each step by its time, and a list with one array of
+        values per trajectory (e.g. an observable of each frame) colors
+        each step by the value at its first frame. Time and values are
+        mapped through ``cmap`` and shown in a colorbar if ``cbar``. Steps
+        are then drawn grouped by color rather than in time order.
+    stride : int, optional (default: 1)
+        Only draw every stride-th frame of each trajectory of a list.
     Returns
     -------
     ax : matplotlib axis
@@ -358,14 +712,37 @@ def plot_trace2d(data, obs=(0, 1), ts=1.0, cbar=True, ax=None, xlabel=None,
     if not isinstance(obs, tuple):
         raise ValueError('obs must be a tuple')
 
-    if isinstance(data, list):
-        # Plot each item in the list with a single color and join with lines
-        for item in data:
-            prune = item[:, obs]
-            ax.plot(prune[:, 0], prune[:, 1], **plot_kwargs)
+    if render == 'aggregate':
+        if resolution is None:
+            bbox = ax.get_window_extent()
+            resolution = (max(1, int(bbox.width)), max(1, int(bbox.height)))
+        image, extent = _aggregate_trace(data, obs, ts, resolution,
+                                         reduction)
+        if aggregate_kwargs is None:
+            aggregate_kwargs = {}
+        c = ax.imshow(image, extent=extent, origin='lower', aspect='auto',
+                      interpolation='nearest', **aggregate_kwargs)
+        if cbar:
+            if cbar_kwargs is None:
+                cbar_kwargs = {}
+            pp.colorbar(c, ax=ax, **cbar_kwargs)
+    elif render != 'scatter':
+        raise ValueError("render must be 'scatter' or 'aggregate'")
+    elif isinstance(data, list):
+        points, collection = _trace_collection(data, obs, ts, hue, stride,
+                                               plot_kwargs)
+        # Limits from the points, which is cheaper than from the segments
+        ax.add_collection(collection, autolim=False)
+        ax.update_datalim(np.r_[points.min(axis=0), points.max(axis=0)]
+                          .reshape(2, 2))
+        ax.autoscale_view()
+        if cbar and collection.get_array() is not None:
+            if cbar_kwargs is None:
+                cbar_kwargs = {}
+            pp.colorbar(collection, ax=ax, **cbar_kwargs)
     else:
         # A single array of data is passed, so we scatter plot
-        prune = data[:, obs]
+        prune = take_columns(data, obs)
         c = ax.scatter(prune[:, 0], prune[:, 1],
                        c=np.linspace(0, data.shape[0] * ts, data.shape[0]),
                        **scatter_kwargs)
@@ -383,11 +760,243 @@ def plot_trace2d(data, obs=(0, 1), ts=1.0, cbar=True, ax=None, xlabel=None,
     return ax
 
 
+# Writers that pipe each frame to an external encoder as it is drawn, in
+# order of preference.
+STREAMING_WRITERS = ('ffmpeg', 'imagemagick')
+
+
+def _save_blitted(fig, update, frames, filename, writer, fps, dpi):
+    """
+    Save an animation by blitting its animated artists over a cached
+    background.
+
+    ``FuncAnimation.save`` redraws the whole figure twice per frame. Here
+    the figure is drawn once, and every frame restores that background,
+    draws the artists returned by ``update`` and streams the raw pixels to
+    the pipe of an ``FFMpegWriter``. Other writers, or an ``FFMpegWriter``
+    without the subprocess it pipes frames to, fall back to ``grab_frame``.
+    """
+    if isinstance(writer, str):
+        writer = animation.writers[writer](fps=fps)
+    canvas = fig.canvas
+    old_dpi = fig.dpi
+    with writer.saving(fig, filename, dpi):
+        pipe = None
+        if (isinstance(writer, animation.FFMpegWriter) and
+                hasattr(writer, '_proc')):
+            pipe = getattr(writer._proc, 'stdin', None)
+        if (pipe is None or writer.frame_format != 'rgba' or
+                not hasattr(canvas, 'copy_from_bbox')):
+            for frame in frames:
+                update(frame)
+                writer.grab_frame()
+            return
+        fig.set_dpi(writer.dpi)
+        try:
+            canvas.draw()
+            background = canvas.copy_from_bbox(fig.bbox)
+            for frame in frames:
+                canvas.restore_region(background)
+                for artist in update(frame):
+                    fig.draw_artist(artist)
+                pipe.write(canvas.buffer_rgba())
+        finally:
+            fig.set_dpi(old_dpi)
+
+
 @msme_colors
-def plot_angle(data, N=50, title=None, ax1=None, ax2=None, color=None, wrap=True):
+def animate_trace2d(data, obs=(0, 1), ts=1.0, ax=None, tail=50, step=1,
+                    interval=30, color=None, filename=None, fps=30,
+                    writer=None, dpi=None, xlabel=None, ylabel=None,
+                    labelsize=14, line_kwargs=None, scatter_kwargs=None):
+    """
+    Animate the motion of one or more trajectories in 2D.
+
+    Anything already drawn on the axis (e.g. a free energy surface from
+    ``plot_free_energy``) is rendered once and cached as the background.
+    Each frame only updates a ``LineCollection`` with the recent path of
+    every trajectory, their current positions and the time label, which are
+    blitted on top, both on screen and when saving to a file.
+
+    Parameters
+    ----------
+    data : array-like (nsamples, nfeatures) or list thereof
+        The trajectories, which are played back simultaneously.
+        Memory-mapped arrays are read in blocks, and only the columns in
+        ``obs`` are loaded into memory.
+    obs : tuple, optional (default: (0, 1))
+        Observables to plot.
+    ts : float, optional (default: 1.0)
+        Step in units of time between each data point in data.
+    ax : matplotlib axis, optional
+        Axis to animate on, otherwise uses the current axis.
+    tail : int, optional (default: 50)
+        Number of past frames drawn behind the current position.
+    step : int, optional (default: 1)
+        Number of frames of data advanced by each frame of the animation.
+    interval : int, optional (default: 30)
+        Delay between frames in milliseconds when shown on screen.
+    color : str or list of str, optional
+        Color of the trajectories. A list of colors is cycled over the
+        trajectories. Defaults to the color cycle.
+    filename : str, optional
+        Save the animation to this file (e.g. ``.mp4`` or ``.gif``).
+    fps : int, optional (default: 30)
+        Frames per second of the saved file.
+    writer : str or matplotlib.animation.MovieWriter, optional
+        Writer used to save the file. Defaults to the first available of
+        ``STREAMING_WRITERS``, which pass every frame to the encoder as it
+        is drawn, so no more than one frame is held in memory.
+    dpi : float, optional
+        Resolution of the saved file.
+    xlabel : str, optional
+        x-axis label
+    ylabel : str, optional
+        y-axis label
+    labelsize : int, optional (default: 14)
+        Font size for axes labels.
+    line_kwargs : dict, optional
+        Arguments to pass to matplotlib LineCollection
+    scatter_kwargs : dict, optional
+        Arguments to pass to matplotlib scatter
+
+    Returns
+    -------
+    anim : matplotlib.animation.FuncAnimation
+        The animation. Keep a reference to it while it is shown.
+    """
+    if ax is None:
+        ax = pp.gca()
+    if not isinstance(obs, tuple):
+        raise ValueError('obs must be a tuple')
+    if line_kwargs is None:
+        line_kwargs = {}
+    if scatter_kwargs is None:
+        scatter_kwargs = {}
+
+    if not isinstance(data, list):
+        data = [data]
+    data = ConcatenatedArray(data)
+    points = np.split(take_columns(data, obs), data.offsets[1:-1])
+    n_frames = int(data.lengths.max())
+
+    if color is None:
+        color = pp.rcParams['axes.prop_cycle'].by_key()['color']
+    colors = [color] if isinstance(color, str) else list(color)
+    colors = [colors[i % len(colors)] for i in range(len(points))]
+
+    # Fix the limits so that the background never needs to be redrawn
+    if not ax.has_data():
+        lo = np.min([p.min(axis=0) for p in points if len(p)], axis=0)
+        hi = np.max([p.max(axis=0) for p in points if len(p)], axis=0)
+        ax.update_datalim(np.array([lo, hi]))
+        ax.autoscale_view()
+    ax.set_autoscale_on(False)
+    if xlabel:
+        ax.set_xlabel(xlabel, size=labelsize)
+    if ylabel:
+        ax.set_ylabel(ylabel, size=labelsize)
+
+    tails = LineCollection([], colors=colors, animated=True, **line_kwargs)
+    ax.add_collection(tails, autolim=False)
+    heads = ax.scatter(np.zeros(len(points)), np.zeros(len(points)),
+                       c=colors, animated=True, zorder=3, **scatter_kwargs)
+    label = ax.text(0.02, 0.95, '', transform=ax.transAxes, animated=True)
+    artists = (tails, heads, label)
+
+    def init():
+        tails.set_segments([])
+        heads.set_offsets(np.empty((0, 2)))
+        label.set_text('')
+        return artists
+
+    def update(frame):
+        start = max(0, frame - tail)
+        tails.set_segments([p[start:frame + 1] for p in points])
+        heads.set_offsets(np.array([p[min(frame, len(p) - 1)]
+                                    for p in points if len(p)]))
+        label.set_text('t = %g' % (frame * ts))
+        return artists
+
+    anim = animation.FuncAnimation(ax.figure, update,
+                                   frames=range(0, n_frames, step),
+                                   init_func=init, interval=interval,
+                                   blit=True)
+    if filename is not None:
+        if writer is None:
+            available = [w for w in STREAMING_WRITERS
+                         if animation.writers.is_available(w)]
+            if not available:
+                raise ValueError('None of the streaming writers %s is '
+                                 'available; install one or pass writer'
+                                 % (STREAMING_WRITERS,))
+            writer = available[0]
+        _save_blitted(ax.figure, update, range(0, n_frames, step), filename,
+                      writer, fps, dpi)
+    return anim
+
+
+def _draw_angle(ax1, ax2, counts, smoothed, N, color, wrap, step=45):
+    """
+    Draw the polar histogram and the density of an angle from one fine
+    circular histogram, whose bins are grouped by ``len(counts) // N``
+    into the ``N`` bins shown, and its smoothed counts. Each panel is a
+    single filled step polygon rather than ``N`` bars. Angles are ticked
+    every ``step`` degrees.
+    """
+    origin = -180. if wrap else 0.
+    fine = counts.shape[0]
+    total = counts.sum()
+    radii = counts.reshape(N, -1).sum(axis=1) / (total * 360. / N)
+    kde = smoothed / (total * 360. / fine)
+    edges = np.linspace(origin, origin + 360., N + 1)
+    # Close the periodic density at both ends of the axis
+    grid = np.r_[origin, origin + (np.arange(fine) + 0.5) * 360. / fine,
+                 origin + 360.]
+    ends = (kde[0] + kde[-1]) / 2.
+    kde = np.r_[ends, kde, ends]
+
+    if color is None:
+        color = pp.rcParams['axes.prop_cycle'].by_key()['color'][0]
+    # Polygon edges are straight in (theta, r), so the arc of each polar bin
+    # is traced with a few points
+    arc = np.linspace(0., 1., 5)
+    theta = np.deg2rad(edges[:-1, None] + arc * 360. / N).ravel()
+    ax1.fill(theta, np.repeat(radii, arc.shape[0]), color=color, alpha=.5,
+             linewidth=0)
+    ax1.set_ylim(0, 1.05 * radii.max())
+    ax1.set_yticklabels([])
+    ax2.fill_between(edges, np.r_[radii, radii[-1]], step='post',
+                     color=color, alpha=.4, linewidth=0)
+    ax2.plot(grid, kde, color=color)
+
+    ax1ticks = np.arange(0, 360, step)
+    ax2ticks = list(range(int(origin), int(origin) + 360 + step, step))
+    ax1.set_xticks(np.deg2rad(ax1ticks))
+    if wrap:
+        ax1.set_xticklabels(['{}°'.format(x)
+                             for x in np.where(ax1ticks > 180, ax1ticks - 360,
+                                               ax1ticks)])
+    else:
+        ax1.set_xticklabels(['{}°'.format(x) for x in ax1ticks])
+    ax2.set_xlim(origin, origin + 360)
+    ax2.set_ylim(0, None)
+    ax2.set_xticks(ax2ticks)
+    ax2.set_xticklabels(['{}°'.format(x) for x in ax2ticks])
+    ax2.set_yticks([])
+    sns.despine(ax=ax2)
+
+
+@msme_colors
+def plot_angle(data, N=50, title=None, ax1=None, ax2=None, color=None, wrap=True,
+               bw='scott'):
     """
     Plot the distrubution of an angle in polar coordinates and a standard histogram / KDE plot.
 
+    Both panels are drawn from a single circular histogram of the data, and
+    the density is a von Mises kernel density estimate, which is continuous
+    across the ends of the axis.
+
     Parameters
     ----------
     data: array-like (nsamples,)
@@ -404,6 +1013,9 @@ def plot_angle(data, N=50, title=None, ax1=None, ax2=None, color=None, wrap=True
     wrap: bool, optional (default: True)
         True: Wrap the angle between -180 and 180
         False: Constrain the angle between 0 and 360
+    bw: {'scott' | 'silverman' | scalar}, optional (default: 'scott')
+        Bandwidth of the density estimate (see
+        ``msmexplorer.kde.vonmises_concentration``)
 
     Returns
     -------
@@ -420,38 +1032,14 @@ def plot_angle(data, N=50, title=None, ax1=None, ax2=None, color=None, wrap=True
         ax1 = pp.subplot(gs[:1, :2], polar=True)
         ax2 = pp.subplot(gs[:1, 2:])
 
-    if wrap:
-        vf = np.vectorize(wrap_angle)
-    else:
-        vf = np.vectorize(constrain_angle)
-    x = vf(data)
-
-    sns.distplot(x, bins=N, ax=ax2, color=color, kde=True)
-    radii, theta = np.histogram(x, bins=N, normed=True)
-    ax1.set_yticklabels([])
-
-    if wrap:
-        ax1ticks = [0, 45, 90, 135, 180, -135, -90, -45]
-        ax2ticks = list(range(-180, 180 + 45, 45))
-        ax1.set_xticklabels(['{}°'.format(x) for x in ax1ticks])
-        ax2.set_xlim(-180, 180)
-        ax2.set_xticks(ax2ticks)
-        ax2.set_xticklabels(['{}°'.format(x) for x in ax2ticks])
-
-    else:
-        ax2ticks = list(range(0, 360 + 45, 45))
-        ax2.set_xlim(0, 360)
-        ax2.set_xticks(ax2ticks)
-        ax2.set_xticklabels(['{}°'.format(x) for x in ax2ticks])
-
-    ax2.set_yticks([])
+    # The fine bins are nested in the N bins shown
+    bins = N * -(-CIRCULAR_BINS // N)
+    _, counts = circular_histogram(np.reshape(data, -1), bins,
+                                   -180. if wrap else 0.)
+    smoothed = vonmises_smooth(counts, vonmises_concentration(counts, bw))
+    _draw_angle(ax1, ax2, counts, smoothed, N, color, wrap)
     ax2.set(xlabel='Angle', ylabel='Density')
 
-    sns.despine(ax=ax2)
-    width = (2 * np.pi) / N
-
-    ax1.bar(np.deg2rad(theta[1:]), radii, width=width, color=color, alpha=.5)
-
     if title is not None:
         pp.suptitle(title)
 
@@ -460,3 +1048,89 @@ def plot_angle(data, N=50, title=None, ax1=None, ax2=None, color=None, wrap=True
     f = pp.gcf()
     return f, (ax1, ax2)
 
+
+@msme_colors
+def plot_angles(data, labels=None, ncols=4, N=50, color=None, wrap=True,
+                bw='scott', labelsize=10):
+    """
+    Plot the distributions of many angles, each in polar coordinates and as
+    a standard histogram / KDE plot.
+
+    The histograms of all angles are computed in a single pass over the
+    data, the density estimates are smoothed together, and the panels are
+    laid out once with fixed spacing instead of ``tight_layout``, so the
+    cost grows linearly with the number of angles.
+
+    Parameters
+    ----------
+    data : array-like (nsamples, nangles), or list thereof
+        Angles in degrees. Memory-mapped arrays and lists of per-trajectory
+        arrays are read in blocks.
+    labels : list of str, optional
+        A title for each angle.
+    ncols : int, optional (default: 4)
+        Number of angles per row.
+    N : int, optional (default: 50)
+        Number of bins to use for histogramming the data
+    color : str, optional (default: None)
+        A color string to use
+    wrap : bool, optional (default: True)
+        True: Wrap the angles between -180 and 180
+        False: Constrain the angles between 0 and 360
+    bw : {'scott' | 'silverman' | scalar}, optional (default: 'scott')
+        Bandwidth of the density estimates (see
+        ``msmexplorer.kde.vonmises_concentration``)
+    labelsize : int, optional (default: 10)
+        Font size for titles and axes labels.
+
+    Returns
+    -------
+    f : matplotlib.figure
+        The figure.
+    axes : ndarray (nangles, 2)
+        The polar and density axis of each angle.
+    """
+    if isinstance(data, list):
+        data = ConcatenatedArray(data)
+    elif np.ndim(data) != 2:
+        data = np.reshape(data, (-1, 1))
+    n_angles = data.shape[1]
+    if labels is not None and len(labels) != n_angles:
+        raise ValueError('labels must have one entry per angle')
+
+    bins = N * -(-CIRCULAR_BINS // N)
+    _, counts = circular_histogram(data, bins, -180. if wrap else 0.)
+    smoothed = vonmises_smooth(counts, vonmises_concentration(counts, bw))
+
+    # Each angle takes a square polar axis, a density axis and a gap, with
+    # sizes in inches
+    ncols = min(ncols, n_angles)
+    nrows = -(-n_angles // ncols)
+    size, margin = 1.6, 0.6
+    width = ncols * 3 * size + margin
+    height = nrows * 1.5 * size + 2 * margin
+    f = pp.figure(figsize=(width, height))
+    gs = gridspec.GridSpec(nrows, 3 * ncols, width_ratios=[1, 1.6, 0.1] *
+                           ncols, wspace=0.3, hspace=0.5,
+                           left=margin / width, right=1,
+                           bottom=margin / height,
+                           top=1 - margin / height)
+    axes = np.empty((n_angles, 2), dtype=object)
+    # Restyling the ticks of hundreds of axes is slow, so their size is set
+    # before they are created
+    ticksize = {'xtick.labelsize': labelsize - 2,
+                'ytick.labelsize': labelsize - 2}
+    for i in range(n_angles):
+        row, col = divmod(i, ncols)
+        with pp.rc_context(ticksize):
+            ax1 = f.add_subplot(gs[row, 3 * col], polar=True)
+            ax2 = f.add_subplot(gs[row, 3 * col + 1])
+            _draw_angle(ax1, ax2, counts[i], smoothed[i], N, color, wrap,
+                        step=90)
+        if labels is not None:
+            ax2.set_title(labels[i], size=labelsize)
+        if i + ncols >= n_angles:
+            ax2.set_xlabel('Angle', size=labelsize)
+        axes[i] = ax1, ax2
+
+    return f, axes
@@ -1,9 +1,12 @@
 import numpy as np
-import networkx as nx
 import seaborn as sns
+from scipy import sparse
 from matplotlib import pyplot as pp
+from matplotlib.collections import LineCollection
 
-from ..utils import msme_colors
+from ..utils import msme_colors, left_eigenvectors
+from ..cache import get_cache, fingerprint, array_fingerprint
+from ..layout import LAYOUTS, spring_layout, spectral_layout
 from ..palettes import msme_rgb
 
 __all__ = ['plot_pop_resids', 'plot_msm_network',
@@ -42,33 +45,152 @@ def plot_pop_resids(msm, **kwargs):
     return ax
 
 
+def _transition_matrix(msm):
+    """Transition matrix (dense or sparse) and populations of an MSM, or of
+    a bare transition matrix."""
+    if hasattr(msm, 'all_populations_'):
+        return msm.all_transmats_.mean(0), msm.all_populations_.mean(0)
+    elif hasattr(msm, 'populations_'):
+        return msm.transmat_, msm.populations_
+    _, vectors = left_eigenvectors(msm)
+    return msm, vectors[:, 0]
+
+
+def _network_edges(tmat, pop, threshold=None, top_k=None):
+    """Undirected edges ``(row, col, weight)`` of an MSM network, with
+    ``row < col``. Transitions below ``threshold`` and beyond the ``top_k``
+    largest fluxes out of each state are dropped, and the weight of a pair
+    is its largest remaining transition probability. Only the non-zero
+    entries of the matrix are visited."""
+    coo = sparse.coo_matrix(tmat)
+    keep = (coo.row != coo.col) & (coo.data > 0)
+    if threshold is not None:
+        keep &= coo.data >= threshold
+    row, col, prob = coo.row[keep], coo.col[keep], coo.data[keep]
+
+    if top_k is not None:
+        flux = np.asarray(pop)[row] * prob
+        # Rank the transitions out of each state by decreasing flux
+        order = np.lexsort((-flux, row))
+        row, col, prob = row[order], col[order], prob[order]
+        first = np.searchsorted(row, row)
+        keep = np.arange(row.shape[0]) - first < top_k
+        row, col, prob = row[keep], col[keep], prob[keep]
+
+    # Merge the two directions of each pair by their maximum
+    n_states = coo.shape[0]
+    key = (np.minimum(row, col).astype(np.int64) * n_states +
+           np.maximum(row, col))
+    order = np.argsort(key, kind='mergesort')
+    key, prob = key[order], prob[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    weight = np.maximum.reduceat(prob, starts) if prob.size else prob
+    key = key[starts]
+    return key // n_states, key % n_states, weight
+
+
+def _network_layout(msm, tmat, row, col, weight, nodes=None,
+                    layout='spring', random_state=None, cache=None,
+                    layout_kwargs=None):
+    """Positions of the states of an MSM network, or of its ``nodes``, by
+    the spring layout of the edges ``(row, col, weight)`` or the spectral
+    layout of the MSM. Layouts are cached unless the random state is a
+    RandomState."""
+    if layout not in LAYOUTS:
+        raise ValueError('layout must be one of %s'
+                         % ', '.join(map(repr, LAYOUTS)))
+    layout_kwargs = layout_kwargs or {}
+    n_states = tmat.shape[0]
+    if nodes is None:
+        nodes = np.arange(n_states)
+    nodes = np.asarray(nodes, dtype=np.intp)
+
+    cache = get_cache(cache)
+    key = pos = None
+    if cache is not None and (random_state is None or
+                              isinstance(random_state, (int, np.integer))):
+        key = fingerprint('layout', layout, n_states,
+                          array_fingerprint(nodes), array_fingerprint(row),
+                          array_fingerprint(col), array_fingerprint(weight),
+                          random_state, sorted(layout_kwargs.items()))
+        arrays = cache.get(key)
+        pos = arrays[0] if arrays is not None else None
+
+    if pos is None:
+        if layout == 'spectral':
+            vectors = getattr(msm, 'left_eigenvectors_', None)
+            if vectors is None or vectors.shape[1] < 3:
+                _, vectors = left_eigenvectors(tmat, min(3, n_states))
+            pos = spectral_layout(np.asarray(vectors)[nodes])
+        else:
+            # Lay out the subnetwork of the nodes
+            index = np.full(n_states, -1, dtype=np.intp)
+            index[nodes] = np.arange(nodes.shape[0])
+            inside = (index[row] >= 0) & (index[col] >= 0)
+            pos = spring_layout(index[row[inside]], index[col[inside]],
+                                weight[inside], nodes.shape[0],
+                                random_state=random_state, **layout_kwargs)
+        if key is not None:
+            cache.set(key, [pos])
+    return pos
+
+
 @msme_colors
 def plot_msm_network(msm, pos=None, node_size=None, node_color='pomegranate',
                      edge_color='carbon', alpha=.7, ax=None, with_labels=True,
-                     **kwargs):
+                     threshold=None, top_k=None, font_size=12,
+                     layout='spring', random_state=None, cache=None,
+                     layout_kwargs=None, **kwargs):
     """
     Plot MSM network diagram.
 
     Parameters
     ----------
-    msm : msmbuilder.msm
-        MSMBuilder MarkovStateModel
-    pos : dict, optional
-        Node positions in dict format (e.g. {node_id : [x, y]})
+    msm : msmbuilder.msm, array-like or scipy.sparse matrix
+        MSMBuilder MarkovStateModel, or a (sparse) transition matrix whose
+        populations are found from its dominant left eigenvector.
+    pos : dict or array-like (nstates, 2), optional
+        Node positions in dict format (e.g. {node_id : [x, y]}) or as an
+        array
     node_color : str or [r, g, b], optional
-        networkx node colors
+        Node colors
     node_size : int or list, optional
-        networkx node size
-    node_color : str, optional
-        networkx edge color
+        Node size
+    edge_color : str, optional
+        Edge color
     ax : matplotlib axis, optional (default: None)
         Axis to plot on, otherwise uses current axis.
     with_labels : boolean, optional
         Whether or not to include node labels (default: True)
     alpha : float, optional  (default: 0.7)
-        Opacity of nodes
+        Opacity of nodes and edges
+    threshold : float, optional
+        Only draw transitions with at least this probability.
+    top_k : int, optional
+        Only draw the ``top_k`` transitions with the largest flux out of
+        each state.
+    font_size : int, optional (default: 12)
+        Font size of the node labels.
+    layout : {'spring' | 'spectral'}, optional (default: 'spring')
+        Layout used when ``pos`` is not given. 'spring' is a multilevel
+        force-directed layout of the drawn edges, weighted by transition
+        probability (see ``msmexplorer.layout.spring_layout``). 'spectral'
+        places the states along the two slowest processes of the MSM, from
+        its ``left_eigenvectors_`` when available (see
+        ``msmexplorer.layout.spectral_layout``).
+    random_state : int or RandomState, optional
+        Seed of the starting positions of the spring layout. By default
+        they are deterministic, so repeated plots are identical.
+    cache : bool, str or msmexplorer.cache.SurfaceCache, optional
+        Reuse the layout computed by an earlier call with the same network
+        and layout parameters (see ``plot_free_energy``). Layouts are not
+        cached when ``random_state`` is a RandomState.
+    layout_kwargs : dict, optional
+        Extra arguments to pass to ``msmexplorer.layout.spring_layout``
+        (e.g. ``iterations``)
     **kwargs : dict, optional
-        Extra arguments to pass to networkx.draw_networkx
+        Extra arguments to pass to the LineCollection of edges (e.g.
+        ``linewidths``)
 
     Returns
     -------
@@ -76,33 +198,44 @@ def plot_msm_network(msm, pos=None, node_size=None, node_color='pomegranate',
         matplotlib figure axis
 
     """
-    if hasattr(msm, 'all_populations_'):
-        tmat = msm.all_transmats_.mean(0)
-        pop = msm.all_populations_.mean(0)
-    elif hasattr(msm, 'populations_'):
-        tmat = msm.transmat_
-        pop = msm.populations_
-
-    graph = nx.Graph(tmat)
+    tmat, pop = _transition_matrix(msm)
+    row, col, weight = _network_edges(tmat, pop, threshold=threshold,
+                                      top_k=top_k)
+    n_states = tmat.shape[0]
 
     if not ax:
         ax = pp.gca()
 
     if pos is None:
-        pos = nx.spring_layout(graph)
+        pos = _network_layout(msm, tmat, row, col, weight,
+                              layout=layout, random_state=random_state,
+                              cache=cache, layout_kwargs=layout_kwargs)
+
+    if isinstance(pos, dict):
+        pos = np.array([pos[i] for i in range(n_states)])
+    pos = np.asarray(pos, dtype=float)
 
     if node_size is None:
         node_size = 5000. * pop
 
-    if isinstance(node_size, (list, np.ndarray)):
-        node_size = [node_size[i] for i in graph.nodes()]
-
-    if isinstance(node_color, (list, np.ndarray)):
-        node_color = [node_color[i] for i in graph.nodes()]
-
-    nx.draw_networkx(graph, pos=pos, node_color=node_color,
-                     node_size=node_size, edge_color=edge_color, ax=ax,
-                     with_labels=with_labels, alpha=alpha, **kwargs)
+    # All edges are drawn at once, below the nodes
+    edges = LineCollection(np.stack([pos[row], pos[col]], axis=1),
+                           colors=edge_color, alpha=alpha, zorder=1,
+                           **kwargs)
+    ax.add_collection(edges)
+    ax.scatter(pos[:, 0], pos[:, 1], s=node_size, c=node_color, alpha=alpha,
+               zorder=2)
+    if with_labels:
+        for i, (x, y) in enumerate(pos):
+            ax.text(x, y, str(i), size=font_size, ha='center', va='center',
+                    zorder=3)
+
+    ax.update_datalim(pos)
+    # Leave room for the largest nodes
+    ax.margins(0.1)
+    ax.autoscale_view()
+    ax.tick_params(axis='both', which='both', bottom=False, left=False,
+                   labelbottom=False, labelleft=False)
 
     return ax
 
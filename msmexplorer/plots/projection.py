@@ -1,13 +1,39 @@
+import os
+import shutil
+import tempfile
+import warnings
+import threading
+from itertools import combinations
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
 import numpy as np
 from scipy.constants import Avogadro, Boltzmann, calorie_th
 from matplotlib import pyplot as pp
+from matplotlib.artist import Artist
+from matplotlib.colors import LinearSegmentedColormap, to_rgba
+from matplotlib.contour import ContourSet
+from matplotlib.gridspec import GridSpec
+from matplotlib.ticker import MaxNLocator, NullLocator
 
-from corner import corner
-from seaborn.distributions import (_scipy_univariate_kde, _scipy_bivariate_kde)
+from scipy import stats
+from seaborn.distributions import (_scipy_univariate_kde, _scipy_bivariate_kde,
+                                   _kde_support)
 
-from ..utils import msme_colors
+from ..kde import (fft_kde, fft_univariate_kde, fft_bivariate_kde,
+                   fft_kde_bootstrap, direct_univariate_kde,
+                   direct_bivariate_kde,
+                   histogram_density, gaussian_smooth, kernel_covariance,
+                   linear_binning, RunningMoments, BLOCK_SIZE)
+from ..cache import get_cache, fingerprint, array_fingerprint
+from ..sampling import sample_indices
+from ..utils import (msme_colors, take_columns, iter_blocks,
+                     ConcatenatedArray, StateWeights, msm_frame_weights,
+                     effective_n_jobs)
 
-__all__ = ['plot_histogram', 'plot_free_energy', 'plot_decomp_grid']
+__all__ = ['plot_histogram', 'plot_free_energy', 'plot_decomp_grid',
+           'plot_free_energy_surface', 'plot_free_energy_grid',
+           'compute_free_energy',
+           'FreeEnergySurface', 'FreeEnergyAccumulator']
 
 THERMO_CONSTANT = 10**-3 * Boltzmann * Avogadro / calorie_th
 
@@ -16,7 +42,931 @@ def _thermo_transform(Z, temperature):
     return - THERMO_CONSTANT * temperature * np.log(Z)
 
 
-plot_histogram = msme_colors(corner)
+def _scipy_univariate(x, bw, gridsize, cut, clip, weights=None):
+    if weights is None:
+        return _scipy_univariate_kde(x, bw, gridsize, cut, clip)
+    # The weighted equivalent of seaborn's estimate
+    kde = stats.gaussian_kde(x, bw_method=bw,
+                             weights=np.asarray(weights[:], dtype=float))
+    if isinstance(bw, str):
+        bw = np.sqrt(kde.covariance[0, 0])
+    grid = _kde_support(x, bw, gridsize, cut, clip)
+    return grid, kde(grid)
+
+
+def _scipy_bivariate(x, y, bw, gridsize, cut, clip, weights=None):
+    if weights is None:
+        return _scipy_bivariate_kde(x, y, bw, gridsize, cut, clip)
+    # The weighted equivalent of seaborn's estimate, whose kernel always
+    # uses Scott's rule
+    data = np.c_[x, y]
+    kde = stats.gaussian_kde(data.T,
+                             weights=np.asarray(weights[:], dtype=float))
+    if isinstance(bw, str):
+        bw = 'scotts' if bw == 'scott' else bw
+        std = np.sqrt(np.diag(kde.covariance)) / kde.factor
+        bw_x, bw_y = getattr(kde, '%s_factor' % bw)() * std
+    elif np.isscalar(bw):
+        bw_x, bw_y = bw, bw
+    else:
+        raise ValueError('Cannot specify a different bandwidth for each '
+                         "dimension with method='scipy'")
+    x_support = _kde_support(data[:, 0], bw_x, gridsize, cut, clip[0])
+    y_support = _kde_support(data[:, 1], bw_y, gridsize, cut, clip[1])
+    xx, yy = np.meshgrid(x_support, y_support)
+    z = kde([xx.ravel(), yy.ravel()]).reshape(xx.shape)
+    return xx, yy, z
+
+
+# Univariate and bivariate density estimators available to
+# ``plot_free_energy``, by name.
+KDE_METHODS = {
+    'scipy': (_scipy_univariate, _scipy_bivariate),
+    'fft': (fft_univariate_kde, fft_bivariate_kde),
+    'direct': (direct_univariate_kde, direct_bivariate_kde),
+}
+
+
+def _plot_free_energy_1d(ax, X, Z, color, shade, alpha, interval=None):
+    Z = Z - np.nanmin(Z)
+    artists = ax.plot(X, Z, color=color)
+
+    if shade:
+        artists.append(ax.fill_between(X, Z, np.nanmax(Z), facecolor=color,
+                                       alpha=alpha))
+    if interval is not None:
+        lower, upper = interval
+        artists.append(ax.fill_between(X, lower,
+                                       np.minimum(upper, np.nanmax(Z)),
+                                       facecolor=color, alpha=alpha,
+                                       linewidth=0))
+    return artists
+
+
+def _plot_free_energy_2d(ax, X, Y, Z, shade, alpha, cmap, vmin, vmax,
+                         n_levels, clabel, clabel_kwargs, cbar, cbar_kwargs,
+                         errors=None, color=None):
+    if not vmin:
+        vmin = -1E-12
+    if not vmax:
+        vmax = np.nanpercentile(Z, 50)
+    Z = Z - np.nanmin(Z)
+
+    cf = None
+    if shade:
+        cf = ax.contourf(X, Y, Z, cmap=pp.get_cmap(cmap),
+                         levels=np.linspace(vmin, vmax, n_levels),
+                         alpha=alpha, zorder=1, vmin=vmin, vmax=vmax)
+    cs = ax.contour(X, Y, Z, cmap=pp.get_cmap('bone_r'),
+                    levels=np.linspace(vmin, vmax, n_levels), alpha=1,
+                    zorder=1, vmin=vmin, vmax=vmax)
+
+    if clabel:
+        if not clabel_kwargs:
+            clabel_kwargs = {}
+
+        ax.clabel(cs, **clabel_kwargs)
+
+    if shade:
+        artists = [cf, cs]
+    else:
+        artists = [cs]
+
+    colorbar = None
+    if cbar:
+        if not cbar_kwargs:
+            cbar_kwargs = {}
+        colorbar = pp.colorbar(artists[0], **cbar_kwargs)
+
+    if errors is not None:
+        # Quartiles of the standard error within the drawn free energy
+        # range, where it is not dominated by the sparsely sampled tails
+        errors = np.ma.masked_where(Z > vmax, errors)
+        levels = np.unique(np.percentile(errors.compressed(), [25, 50, 75]))
+        es = ax.contour(X, Y, errors, levels=levels, colors=color,
+                        linestyles='dashed', linewidths=1, zorder=2)
+        ax.clabel(es, fmt='%.2g', fontsize='small')
+        artists.append(es)
+
+    ax.grid(zorder=0)
+
+    return artists, colorbar
+
+
+def _draw_free_energy_surface(ax, surface, color, shade, alpha, cmap, vmin,
+                              vmax, n_levels, clabel, clabel_kwargs, cbar,
+                              cbar_kwargs):
+    """Draw a surface and return the artists drawn (the mappable of the
+    colorbar first, for 2-D surfaces) and the colorbar, if any."""
+    if surface.ndim == 1:
+        return _plot_free_energy_1d(ax, surface.grid[0], surface.values,
+                                    color=color, shade=shade, alpha=alpha,
+                                    interval=surface.interval), None
+    return _plot_free_energy_2d(ax, surface.grid[0], surface.grid[1],
+                                surface.values, shade=shade, alpha=alpha,
+                                cmap=cmap, vmin=vmin, vmax=vmax,
+                                n_levels=n_levels, clabel=clabel,
+                                clabel_kwargs=clabel_kwargs, cbar=cbar,
+                                cbar_kwargs=cbar_kwargs,
+                                errors=surface.errors, color=color)
+
+
+def _remove_artists(artists):
+    for artist in artists:
+        if isinstance(artist, ContourSet) and not isinstance(artist, Artist):
+            # Contour sets are only artists as of matplotlib 3.8
+            for collection in artist.collections:
+                collection.remove()
+            for text in artist.labelTexts:
+                text.remove()
+        else:
+            artist.remove()
+
+
+# Credible levels of the 2-D contours, as in corner (0.5 to 2 sigma).
+CORNER_LEVELS = 1. - np.exp(-0.5 * np.arange(0.5, 2.1, 0.5) ** 2)
+
+# Resolution of the 1-D histograms used to compute quantiles.
+QUANTILE_BINS = 2 ** 12
+
+# Arguments of ``corner.corner`` that ``plot_histogram`` accepts but ignores.
+IGNORED_CORNER_KWARGS = ('plot_datapoints', 'scale_hist', 'top_ticks',
+                         'reverse', 'hist_bin_factor', 'data_kwargs')
+
+
+def _histogram_block(data, weights, start, stop, lo, hi, bins, pairs):
+    """1-D, fine 1-D and 2-D histograms of one block of samples."""
+    x = np.asarray(data[start:stop], dtype=float)
+    w = None if weights is None else np.asarray(weights[start:stop])
+    outside = ~((x >= lo) & (x <= hi))
+    scaled = (x - lo) / (hi - lo)
+
+    def digitize(n):
+        # Samples on the upper edge go in the last bin, and samples out of
+        # range in an extra one, so that no masking is needed
+        idx = np.minimum((scaled * n).astype(np.intp), n - 1)
+        idx[outside] = n
+        return np.ascontiguousarray(idx.T)
+
+    idx = digitize(bins)
+    fine = digitize(QUANTILE_BINS)
+    hist1 = np.array([np.bincount(i, w, minlength=bins + 1)[:bins]
+                      for i in idx])
+    hist_fine = np.array([np.bincount(i, w, minlength=QUANTILE_BINS + 1)
+                          [:QUANTILE_BINS] for i in fine])
+
+    n = bins + 1
+    hist2 = np.zeros((len(pairs), bins, bins))
+    for k, (i, j) in enumerate(pairs):
+        flat = np.bincount(idx[i] * n + idx[j], w, minlength=n * n)
+        hist2[k] = flat.reshape(n, n)[:bins, :bins]
+    return hist1, hist_fine, hist2
+
+
+def _contour_levels(H, levels):
+    """Density thresholds enclosing the given fractions of the weight."""
+    flat = np.sort(H.ravel())[::-1]
+    cum = np.cumsum(flat)
+    cum /= cum[-1]
+    V = np.array([flat[max(np.searchsorted(cum, v, side='right') - 1, 0)]
+                  for v in levels])
+    V.sort()
+    # Contour levels must be increasing
+    for i in range(1, V.shape[0]):
+        if V[i] <= V[i - 1]:
+            V[i] = np.nextafter(V[i - 1], np.inf)
+    return V
+
+
+def _histogram_quantiles(hist_fine, lo, hi, q):
+    cdf = np.r_[0., np.cumsum(hist_fine)]
+    return np.interp(np.asarray(q) * cdf[-1], cdf,
+                     np.linspace(lo, hi, hist_fine.shape[0] + 1))
+
+
+@msme_colors
+def plot_histogram(data, bins=20, range=None, weights=None, color=None,
+                   smooth=None, smooth1d=None, labels=None, label_kwargs=None,
+                   show_titles=False, title_fmt='.2f', title_kwargs=None,
+                   truths=None, truth_color='#4682b4', quantiles=None,
+                   levels=None, plot_density=True, plot_contours=True,
+                   fill_contours=False, max_n_ticks=5, fig=None,
+                   hist_kwargs=None, contour_kwargs=None,
+                   contourf_kwargs=None, n_jobs=1, block_size=None, **kwargs):
+    """
+    Plot a corner plot of the 1- and 2-D histograms of the samples.
+
+    All histograms are computed together, one block of samples at a time
+    (in ``n_jobs`` threads), and drawn as step plots, images and contours,
+    so that the cost does not depend on the number of samples beyond a
+    single pass over them (plus one to find the ranges, unless given).
+    The arguments follow ``corner.corner``, but individual samples are
+    never drawn.
+
+    Parameters
+    ----------
+    data : ndarray (nsamples, ndim), or list thereof
+        The samples. A memory-mapped array or a list of (memory-mapped)
+        per-trajectory arrays is read in blocks.
+    bins : int, optional (default: 20)
+        Number of bins along each dimension. A list of the same number for
+        every dimension is also accepted.
+    range : list of pairs of scalars, optional
+        Lower and upper bounds for each dimension. Defaults to the extreme
+        samples. Unlike ``corner.corner``, fractions of the samples are not
+        accepted.
+    weights : array-like (nsamples,), optional
+        Weight of each sample, e.g. from ``msmexplorer.utils.StateWeights``.
+    color : str, optional
+        Color of the histograms and contours (default: black).
+    smooth : float, optional
+        Standard deviation, in bins, of a Gaussian filter applied to the 2-D
+        histograms.
+    smooth1d : float, optional
+        Standard deviation, in bins, of a Gaussian filter applied to the 1-D
+        histograms, which are then drawn as lines.
+    labels : list of str, optional
+        Label for each dimension.
+    label_kwargs : dict, optional
+        Arguments to pass to matplotlib ``set_xlabel`` and ``set_ylabel``.
+    show_titles : bool, optional (default: False)
+        Title each 1-D histogram with the median and the 0.16 and 0.84
+        quantiles.
+    title_fmt : str, optional (default: '.2f')
+        Format of the numbers in the titles.
+    title_kwargs : dict, optional
+        Arguments to pass to matplotlib ``set_title``.
+    truths : list of scalars, optional
+        Reference values to mark in each dimension. None entries are
+        skipped.
+    truth_color : str, optional (default: '#4682b4')
+        Color of the reference values.
+    quantiles : list of scalars, optional
+        Quantiles to mark with dashed lines on the 1-D histograms.
+    levels : list of scalars, optional
+        Fractions of the weight enclosed by the 2-D contours. Defaults to
+        0.5, 1, 1.5 and 2 sigma levels of a 2-D Gaussian.
+    plot_density : bool, optional (default: True)
+        Draw the 2-D histograms as images.
+    plot_contours : bool, optional (default: True)
+        Draw contours of the 2-D histograms.
+    fill_contours : bool, optional (default: False)
+        Fill the contours.
+    max_n_ticks : int, optional (default: 5)
+        Maximum number of ticks on each axis.
+    fig : matplotlib figure, optional
+        Figure to draw on, with (ndim x ndim) axes or the lower triangle of
+        axes created by an earlier call, e.g. to overplot two datasets.
+    hist_kwargs : dict, optional
+        Arguments to pass to matplotlib ``step`` for the 1-D histograms.
+    contour_kwargs : dict, optional
+        Arguments to pass to matplotlib ``contour``.
+    contourf_kwargs : dict, optional
+        Arguments to pass to matplotlib ``contourf``.
+    n_jobs : int, optional (default: 1)
+        Number of threads that histogram blocks of samples. -1 uses all
+        processors.
+    block_size : int, optional
+        Number of samples histogrammed at a time.
+    **kwargs : dict, optional
+        The ``corner.corner`` arguments ``plot_datapoints``, ``scale_hist``,
+        ``top_ticks``, ``reverse``, ``hist_bin_factor`` and ``data_kwargs``
+        are accepted for compatibility and ignored, with a warning.
+
+    Returns
+    -------
+    fig : matplotlib figure
+        The corner plot figure.
+    """
+    for key in kwargs:
+        if key not in IGNORED_CORNER_KWARGS:
+            raise TypeError('plot_histogram() got an unexpected keyword '
+                            'argument %r' % key)
+        warnings.warn('%s is ignored since plot_histogram no longer uses '
+                      'corner' % key, DeprecationWarning, stacklevel=2)
+    if np.ndim(bins):
+        if len(set(np.ravel(bins))) != 1:
+            raise ValueError('bins must be the same for every dimension')
+        bins = np.ravel(bins)[0]
+    bins = int(bins)
+
+    if isinstance(data, list):
+        data = ConcatenatedArray(data)
+    elif np.ndim(data) == 1:
+        data = np.reshape(data, (-1, 1))
+    n_samples, ndim = data.shape
+    if block_size is None:
+        block_size = BLOCK_SIZE
+    if color is None:
+        color = 'k'
+    pairs = [(i, j) for i in np.arange(ndim) for j in np.arange(i)]
+
+    if range is None:
+        lo = np.full(ndim, np.inf)
+        hi = np.full(ndim, -np.inf)
+        for block in iter_blocks(data, block_size=block_size):
+            lo = np.minimum(lo, block.min(axis=0))
+            hi = np.maximum(hi, block.max(axis=0))
+    else:
+        if np.size(range) != 2 * ndim:
+            raise ValueError('range must be a pair of bounds for each '
+                             'dimension')
+        lo, hi = np.asarray(range, dtype=float).reshape(ndim, 2).T
+    hi = np.where(hi > lo, hi, lo + 1.)
+
+    # Each block is added to the totals as soon as it is histogrammed
+    totals = (np.zeros((ndim, bins)), np.zeros((ndim, QUANTILE_BINS)),
+              np.zeros((len(pairs), bins, bins)))
+    lock = threading.Lock()
+
+    def accumulate(start):
+        parts = _histogram_block(data, weights, start, start + block_size,
+                                 lo, hi, bins, pairs)
+        with lock:
+            for total, part in zip(totals, parts):
+                total += part
+
+    starts = np.arange(0, n_samples, block_size)
+    with ThreadPoolExecutor(effective_n_jobs(n_jobs)) as executor:
+        for _ in executor.map(accumulate, starts):
+            pass
+    hist1, hist_fine, hist2 = totals
+
+    if fig is None:
+        # Margins and spacing as in corner
+        factor, whspace = 2., 0.05
+        lbdim, trdim = 0.5 * factor, 0.2 * factor
+        plotdim = factor * ndim + factor * (ndim - 1) * whspace
+        dim = lbdim + plotdim + trdim
+        fig = pp.figure(figsize=(dim, dim))
+        grid = GridSpec(ndim, ndim, left=lbdim / dim, bottom=lbdim / dim,
+                        right=(lbdim + plotdim) / dim,
+                        top=(lbdim + plotdim) / dim, wspace=whspace,
+                        hspace=whspace)
+        # Axes above the diagonal are never created
+        axes = np.empty((ndim, ndim), dtype=object)
+        for row in np.arange(ndim):
+            for col in np.arange(row + 1):
+                axes[row, col] = fig.add_subplot(grid[row, col])
+    elif len(fig.axes) == ndim * ndim:
+        axes = np.asarray(fig.axes).reshape(ndim, ndim)
+        for row, col in zip(*np.triu_indices(ndim, 1)):
+            axes[row, col].set_visible(False)
+    elif len(fig.axes) == ndim * (ndim + 1) // 2:
+        # The lower triangle, in the order created above
+        axes = np.empty((ndim, ndim), dtype=object)
+        axes[np.tril_indices(ndim)] = fig.axes
+    else:
+        raise ValueError('fig must have ndim x ndim axes, or the lower '
+                         'triangle of them')
+
+    if levels is None:
+        levels = CORNER_LEVELS
+    hist_kwargs = dict({'color': color}, **(hist_kwargs or {}))
+    contour_kwargs = dict({'colors': color}, **(contour_kwargs or {}))
+    cmap = LinearSegmentedColormap.from_list(
+        'density', [to_rgba(color, 0.), to_rgba(color, 1.)])
+    label_kwargs = label_kwargs or {}
+    title_kwargs = title_kwargs or {}
+
+    edges = [np.linspace(lo[i], hi[i], bins + 1) for i in np.arange(ndim)]
+    centers = [(e[1:] + e[:-1]) / 2. for e in edges]
+    for i in np.arange(ndim):
+        ax = axes[i, i]
+        if smooth1d:
+            h = gaussian_smooth(hist1[i], [1.], [[smooth1d ** 2]])
+            ax.plot(centers[i], h, **hist_kwargs)
+        else:
+            ax.step(edges[i], np.r_[hist1[i], hist1[i][-1]], where='post',
+                    **hist_kwargs)
+        ax.set_ylim(0, 1.1 * hist1[i].max())
+        if quantiles is not None:
+            for q in _histogram_quantiles(hist_fine[i], lo[i], hi[i],
+                                          quantiles):
+                ax.axvline(q, ls='dashed', color=color)
+        if show_titles:
+            q16, q50, q84 = _histogram_quantiles(hist_fine[i], lo[i], hi[i],
+                                                 [0.16, 0.5, 0.84])
+            fmt = '{{0:{0}}}'.format(title_fmt).format
+            title = r'${0}_{{-{1}}}^{{+{2}}}$'.format(
+                fmt(q50), fmt(q50 - q16), fmt(q84 - q50))
+            if labels is not None:
+                title = '{0} = {1}'.format(labels[i], title)
+            ax.set_title(title, **title_kwargs)
+        if truths is not None and truths[i] is not None:
+            ax.axvline(truths[i], color=truth_color)
+
+    for k, (row, col) in enumerate(pairs):
+        ax = axes[row, col]
+        # hist2 is indexed [row dimension, column dimension]
+        H = hist2[k]
+        if smooth:
+            H = gaussian_smooth(H, [1., 1.], np.diag([smooth ** 2] * 2))
+        if plot_density:
+            ax.imshow(H, origin='lower', aspect='auto', cmap=cmap,
+                      interpolation='nearest',
+                      extent=(lo[col], hi[col], lo[row], hi[row]))
+        if (plot_contours or fill_contours) and H.max() > 0:
+            V = _contour_levels(H, levels)
+            if fill_contours:
+                ax.contourf(centers[col], centers[row], H,
+                            np.r_[V, H.max() * (1 + 1e-4)], cmap=cmap,
+                            **(contourf_kwargs or {}))
+            if plot_contours:
+                ax.contour(centers[col], centers[row], H, V,
+                           **contour_kwargs)
+        if truths is not None:
+            if truths[col] is not None:
+                ax.axvline(truths[col], color=truth_color)
+            if truths[row] is not None:
+                ax.axhline(truths[row], color=truth_color)
+        ax.set_ylim(lo[row], hi[row])
+
+    for row in np.arange(ndim):
+        for col in np.arange(row + 1):
+            ax = axes[row, col]
+            ax.set_xlim(lo[col], hi[col])
+            ax.xaxis.set_major_locator(MaxNLocator(max_n_ticks,
+                                                   prune='lower'))
+            if row < ndim - 1:
+                ax.tick_params(axis='x', labelbottom=False)
+            else:
+                ax.tick_params(axis='x', labelrotation=45)
+                if labels is not None:
+                    ax.set_xlabel(labels[col], **label_kwargs)
+            if col == row:
+                ax.yaxis.set_major_locator(NullLocator())
+                continue
+            ax.yaxis.set_major_locator(MaxNLocator(max_n_ticks,
+                                                   prune='lower'))
+            if col > 0:
+                ax.tick_params(axis='y', labelleft=False)
+            else:
+                ax.tick_params(axis='y', labelrotation=45)
+                if labels is not None:
+                    ax.set_ylabel(labels[row], **label_kwargs)
+
+    return fig
+
+
+class FreeEnergyAccumulator(object):
+    """
+    Accumulate the free energy of observable(s) one chunk of data at a time.
+
+    Samples are linearly binned onto a fixed grid as they arrive, so memory
+    use is bounded by the grid and the chunk size regardless of how much
+    data is seen. The binned weights are smoothed with a Gaussian kernel
+    when the surface is computed.
+
+    For live monitoring, ``update`` folds in new samples and redraws the
+    surface drawn by ``plot`` in place, at a cost that depends on the new
+    samples and the grid but not on the samples seen before.
+
+    Parameters
+    ----------
+    range : pair of scalars, or pair of pair of scalars
+        Lower and upper bounds of the grid for each observable. Samples
+        outside of these bounds are ignored.
+    obs : int or tuple, optional (default: 0)
+        Observables to accumulate.
+    temperature : float, optional (default: 300.0)
+        Simulation temperature in degrees Kelvin.
+    bw : {'scott' | 'silverman' | scalar | pair of scalars }, optional
+        Name of reference method to determine kernel size, or scalar
+        bandwidth factor for all or each dimension, computed from the
+        moments of all data seen so far.
+    gridsize : int, optional (default: 100)
+        Number of discrete points in the grid per dimension.
+
+    Examples
+    --------
+    >>> acc = FreeEnergyAccumulator([(-3, 3), (-3, 3)], obs=(0, 1))
+    >>> for fn in filenames:
+    ...     acc.partial_fit(np.load(fn, mmap_mode='r'))
+    >>> ax = acc.plot(cbar=True)
+    >>> acc.update(np.load(new_filename, mmap_mode='r'))
+    """
+
+    def __init__(self, range, obs=0, temperature=300., bw='scott',
+                 gridsize=100):
+        if isinstance(obs, int):
+            obs = (obs,)
+        if len(obs) > 2:
+            raise ValueError('obs cannot be greater than size 2')
+        if np.ndim(range) == 1:
+            range = [range]
+        if len(range) != len(obs):
+            raise ValueError('range must have a pair of bounds for each '
+                             'observable')
+
+        self.obs = obs
+        self.temperature = temperature
+        self.bw = bw
+        self.gridsize = gridsize
+        self.grids = [np.linspace(lo, hi, gridsize) for lo, hi in range]
+        self.counts = np.zeros(len(obs) * (gridsize,))
+        self.moments = RunningMoments(len(obs))
+        self._drawn = None
+
+    def partial_fit(self, chunk, weights=None):
+        """
+        Add a chunk of samples.
+
+        Parameters
+        ----------
+        chunk : array-like (nsamples, nfeatures)
+            The samples. Memory-mapped arrays are read in blocks.
+        weights : array-like (nsamples,), optional
+            Equilibrium ensemble weights for each sample.
+
+        Returns
+        -------
+        self
+        """
+        lo = [g[0] for g in self.grids]
+        delta = [g[1] - g[0] for g in self.grids]
+        for start in range(0, chunk.shape[0], BLOCK_SIZE):
+            stop = start + BLOCK_SIZE
+            x = np.asarray(chunk[start:stop, list(self.obs)])
+            w = None if weights is None else np.asarray(weights[start:stop])
+            self.moments.update(x, w)
+            linear_binning(x, lo, delta, self.counts.shape, weights=w,
+                           out=self.counts)
+        return self
+
+    def compute(self):
+        """
+        Compute the free energy surface from the samples seen so far.
+
+        Returns
+        -------
+        surface : FreeEnergySurface
+            Free energy in kilocalories per mole on the accumulator's grid.
+        """
+        if self.moments.sum_w == 0:
+            raise ValueError('No samples have been accumulated')
+        delta = [g[1] - g[0] for g in self.grids]
+        cov = kernel_covariance(self.moments, self.bw)
+        density = gaussian_smooth(self.counts, delta, cov) / self.moments.sum_w
+        Z = _thermo_transform(np.clip(density, np.finfo(float).tiny, None),
+                              self.temperature)
+        metadata = dict(obs=self.obs, temperature=self.temperature,
+                        bw=self.bw, method='accumulator',
+                        n_eff=self.moments.n_eff)
+        return FreeEnergySurface(self.grids, Z.T, metadata=metadata)
+
+    @msme_colors
+    def plot(self, ax=None, color='beryl', shade=True, alpha=0.5, cmap='bone',
+             vmin=None, vmax=None, n_levels=10, clabel=False,
+             clabel_kwargs=None, cbar=False, cbar_kwargs=None, xlabel=None,
+             ylabel=None, labelsize=14):
+        """
+        Plot the free energy surface from the samples seen so far.
+
+        The surface is redrawn in place by ``update`` and ``redraw``.
+
+        Styling arguments are the same as for ``plot_free_energy``.
+
+        Returns
+        -------
+        ax : matplotlib axis
+            matplotlib figure axis
+        """
+        if ax is None:
+            ax = pp.gca()
+
+        style = dict(color=color, shade=shade, alpha=alpha, cmap=cmap,
+                     vmin=vmin, vmax=vmax, n_levels=n_levels, clabel=clabel,
+                     clabel_kwargs=clabel_kwargs, cbar=cbar,
+                     cbar_kwargs=cbar_kwargs)
+        artists, colorbar = _draw_free_energy_surface(ax, self.compute(),
+                                                      **style)
+        self._drawn = (ax, style, artists, colorbar)
+
+        if xlabel:
+            ax.set_xlabel(xlabel, size=labelsize)
+
+        if ylabel:
+            ax.set_ylabel(ylabel, size=labelsize)
+
+        return ax
+
+    def redraw(self):
+        """
+        Redraw the surface drawn by the last call to ``plot`` in place.
+
+        Only the artists of the surface are replaced; the axis, its labels
+        and the colorbar are kept.
+
+        Returns
+        -------
+        ax : matplotlib axis
+            matplotlib figure axis
+        """
+        if self._drawn is None:
+            raise ValueError('The surface has not been plotted')
+        ax, style, artists, colorbar = self._drawn
+
+        _remove_artists(artists)
+        artists, _ = _draw_free_energy_surface(ax, self.compute(),
+                                               **dict(style, cbar=False))
+        if colorbar is not None:
+            colorbar.update_normal(artists[0])
+        self._drawn = (ax, style, artists, colorbar)
+
+        ax.relim()
+        ax.autoscale_view()
+        ax.figure.canvas.draw_idle()
+        return ax
+
+    def update(self, chunk, weights=None):
+        """
+        Add a chunk of samples and redraw the plotted surface, if any.
+
+        Parameters
+        ----------
+        chunk : array-like (nsamples, nfeatures)
+            The new samples. Memory-mapped arrays are read in blocks.
+        weights : array-like (nsamples,), optional
+            Equilibrium ensemble weights for each sample.
+
+        Returns
+        -------
+        self
+        """
+        self.partial_fit(chunk, weights=weights)
+        if self._drawn is not None:
+            self.redraw()
+        return self
+
+
+class FreeEnergySurface(object):
+    """
+    Free energy of one or two observables on a grid.
+
+    Surfaces hold no reference to the data they were computed from and can
+    be pickled, e.g. to compute them in worker processes and draw them with
+    ``plot_free_energy_surface`` elsewhere.
+
+    Parameters
+    ----------
+    grid : list of ndarrays
+        Grid points along each observable.
+    values : ndarray
+        Free energy at the grid points. For two observables, ``values[j, i]``
+        is the free energy at ``(grid[0][i], grid[1][j])``, as expected by
+        matplotlib's ``contour``.
+    units : str, optional (default: 'kcal/mol')
+        Units of ``values``.
+    metadata : dict, optional
+        Parameters used to compute the surface.
+    errors : ndarray, optional
+        Standard error of the free energy at the grid points.
+    interval : tuple of ndarrays, optional
+        Lower and upper bounds of a confidence interval of the free energy
+        at the grid points, relative to the minimum free energy.
+    """
+
+    def __init__(self, grid, values, units='kcal/mol', metadata=None,
+                 errors=None, interval=None):
+        self.grid = [np.asarray(g) for g in grid]
+        self.values = np.asarray(values)
+        self.units = units
+        self.metadata = {} if metadata is None else dict(metadata)
+        self.errors = None if errors is None else np.asarray(errors)
+        self.interval = (None if interval is None else
+                         tuple(np.asarray(b) for b in interval))
+        shape = tuple(len(g) for g in self.grid[::-1])
+        if self.values.shape != shape:
+            raise ValueError('values do not match the grid')
+        if self.errors is not None and self.errors.shape != shape:
+            raise ValueError('errors do not match the grid')
+
+    @property
+    def ndim(self):
+        return len(self.grid)
+
+    def to_list(self):
+        """Grid and free energy in the format of ``plot_free_energy``'s
+        ``return_data``."""
+        if self.ndim == 1:
+            return [self.grid[0], self.values]
+        X, Y = np.meshgrid(*self.grid)
+        return [X, Y, self.values]
+
+    def __repr__(self):
+        return '%s(shape=%s, units=%r)' % (type(self).__name__,
+                                           self.values.shape, self.units)
+
+
+def _free_energy_surface(data, obs, temperature, n_samples, pi, bw, gridsize,
+                         cut, clip, random_state, method, sampling,
+                         n_bootstrap, n_jobs, histogram_kwargs, periodic=None):
+    """Grid axes and free energy, followed by its bootstrap standard error
+    and 95% interval if ``n_bootstrap`` is given."""
+    if method not in KDE_METHODS and method != 'histogram':
+        raise ValueError('method must be one of %s'
+                         % sorted(list(KDE_METHODS) + ['histogram']))
+
+    if len(obs) > 2:
+        raise ValueError('obs cannot be greater than size 2')
+
+    if isinstance(data, list):
+        data = ConcatenatedArray(data)
+
+    if n_bootstrap:
+        return _bootstrap_free_energy(data, obs, temperature, pi, bw,
+                                      gridsize, cut, clip, random_state,
+                                      n_samples, n_bootstrap, n_jobs,
+                                      periodic)
+
+    weights = pi
+    if n_samples:
+        idx = sample_indices(data.shape[0], n_samples, weights=pi,
+                             method=sampling,
+                             lengths=getattr(data, 'lengths', None),
+                             random_state=random_state)
+        prune = take_columns(data, obs, rows=idx)
+        weights = None
+    else:
+        prune = take_columns(data, obs)
+
+    if periodic is not None:
+        # Angles are estimated on a torus, which only the FFT estimator
+        # supports
+        if clip is not None and np.ndim(clip) == 1:
+            clip = [clip] * prune.shape[1]
+        grids, density = fft_kde(prune, bw=bw, gridsize=gridsize, cut=cut,
+                                 clip=clip, weights=weights,
+                                 periodic=periodic)
+        return grids + [_thermo_transform(density.T, temperature)]
+
+    if method == 'histogram':
+        if clip is not None and np.ndim(clip) == 1:
+            clip = [clip] * prune.shape[1]
+        grids, density = histogram_density(prune, bins=gridsize, clip=clip,
+                                           weights=weights,
+                                           **(histogram_kwargs or {}))
+        # Empty bins have an undefined (nan) free energy
+        density[density == 0] = np.nan
+        return grids + [_thermo_transform(density.T, temperature)]
+
+    univariate_kde, bivariate_kde = KDE_METHODS[method]
+    kde_kwargs = dict(weights=weights)
+    if method == 'direct':
+        kde_kwargs['n_jobs'] = n_jobs
+
+    if prune.shape[1] == 1:
+        if clip is None:
+            clip = (-np.inf, np.inf)
+
+        X, Z = univariate_kde(prune[:, 0], bw, gridsize, cut, clip,
+                              **kde_kwargs)
+        return [X, _thermo_transform(Z, temperature)]
+
+    if clip is None:
+        clip = [(-np.inf, np.inf), (-np.inf, np.inf)]
+    elif np.ndim(clip) == 1:
+        clip = [clip, clip]
+
+    X, Y, Z = bivariate_kde(prune[:, 0], prune[:, 1], bw, gridsize,
+                            cut, clip, **kde_kwargs)
+    return [X[0], Y[:, 0], _thermo_transform(Z, temperature)]
+
+
+def _bootstrap_free_energy(data, obs, temperature, pi, bw, gridsize, cut,
+                           clip, random_state, n_samples, n_bootstrap,
+                           n_jobs, periodic=None):
+    if not isinstance(data, ConcatenatedArray):
+        raise ValueError('n_bootstrap requires a list of trajectories')
+    if n_samples:
+        raise ValueError('n_bootstrap cannot be combined with n_samples')
+
+    if clip is None:
+        clip = [(-np.inf, np.inf)] * len(obs)
+    elif np.ndim(clip) == 1:
+        clip = [clip] * len(obs)
+
+    weights = pi
+    if pi is not None and not isinstance(pi, StateWeights):
+        weights = np.asarray(pi, dtype=float)
+    grids, density, replicates = fft_kde_bootstrap(
+        take_columns(data, obs), data.lengths, n_bootstrap=n_bootstrap,
+        bw=bw, gridsize=gridsize, cut=cut, clip=clip, weights=weights,
+        random_state=random_state, n_jobs=n_jobs, periodic=periodic)
+
+    # Replicates are compared up to their arbitrary offsets, as drawn
+    replicates = _thermo_transform(replicates.T, temperature)
+    replicates -= replicates.min(axis=tuple(range(len(obs))))
+    lower, upper = np.percentile(replicates, [2.5, 97.5], axis=-1)
+    return grids + [_thermo_transform(density.T, temperature),
+                    replicates.std(axis=-1), lower, upper]
+
+
+def compute_free_energy(data, obs=0, temperature=300., n_samples=None,
+                        pi=None, bw='scott', gridsize=30, cut=3, clip=None,
+                        random_state=None, method='scipy', sampling='random',
+                        cache=None, n_bootstrap=None, n_jobs=1,
+                        histogram_kwargs=None, msm=None, assignments=None,
+                        periodic=None):
+    """
+    Compute the free energy of observable(s) in kilocalories per mole.
+
+    Parameters are the same as for ``plot_free_energy``, which draws the
+    result.
+
+    Returns
+    -------
+    surface : FreeEnergySurface
+        The free energy surface.
+    """
+    if isinstance(obs, int):
+        obs = (obs,)
+    if periodic is not None:
+        periodic = tuple(np.broadcast_to(periodic, (len(obs),)).tolist())
+        if not any(periodic):
+            periodic = None
+    if msm is not None:
+        if pi is not None:
+            raise ValueError('pi cannot be combined with msm')
+        if assignments is None:
+            raise ValueError('msm requires assignments')
+        pi = msm_frame_weights(msm, assignments)
+    metadata = dict(obs=obs, temperature=temperature, n_samples=n_samples,
+                    bw=bw, gridsize=gridsize, cut=cut, clip=clip,
+                    method=method, n_bootstrap=n_bootstrap,
+                    periodic=periodic)
+
+    cache = get_cache(cache)
+    key = arrays = None
+    seeded = isinstance(random_state, (int, np.integer))
+    if cache is not None and (seeded or not (n_samples or n_bootstrap)):
+        key = fingerprint(array_fingerprint(data, obs), obs, temperature,
+                          n_samples, pi if pi is None else
+                          array_fingerprint(pi), bw, gridsize, cut, clip,
+                          random_state if n_samples or n_bootstrap else None,
+                          method,
+                          sampling if n_samples else None, n_bootstrap,
+                          sorted((histogram_kwargs or {}).items())
+                          if method == 'histogram' else None, periodic)
+        arrays = cache.get(key)
+
+    if arrays is None:
+        arrays = _free_energy_surface(data, obs, temperature, n_samples, pi,
+                                      bw, gridsize, cut, clip, random_state,
+                                      method, sampling, n_bootstrap, n_jobs,
+                                      histogram_kwargs, periodic)
+        if key is not None:
+            cache.set(key, arrays)
+
+    ndim = len(obs)
+    errors = interval = None
+    if len(arrays) > ndim + 1:
+        errors, interval = arrays[ndim + 1], arrays[ndim + 2:]
+    return FreeEnergySurface(arrays[:ndim], arrays[ndim], metadata=metadata,
+                             errors=errors, interval=interval)
+
+
+@msme_colors
+def plot_free_energy_surface(surface, ax=None, color='beryl', shade=True,
+                             alpha=0.5, cmap='bone', vmin=None, vmax=None,
+                             n_levels=10, clabel=False, clabel_kwargs=None,
+                             cbar=False, cbar_kwargs=None, xlabel=None,
+                             ylabel=None, labelsize=14):
+    """
+    Plot a precomputed free energy surface.
+
+    Parameters
+    ----------
+    surface : FreeEnergySurface
+        The free energy surface, e.g. from ``compute_free_energy``.
+    ax : matplotlib axis, optional
+        matplotlib figure axis
+
+    Styling arguments are the same as for ``plot_free_energy``. The
+    uncertainty of bootstrapped surfaces is drawn as well.
+
+    Returns
+    -------
+    ax : matplotlib axis
+        matplotlib figure axis
+    """
+    if ax is None:
+        ax = pp.gca()
+
+    _draw_free_energy_surface(ax, surface, color=color, shade=shade,
+                              alpha=alpha, cmap=cmap, vmin=vmin, vmax=vmax,
+                              n_levels=n_levels, clabel=clabel,
+                              clabel_kwargs=clabel_kwargs, cbar=cbar,
+                              cbar_kwargs=cbar_kwargs)
+
+    if xlabel:
+        ax.set_xlabel(xlabel, size=labelsize)
+
+    if ylabel:
+        ax.set_ylabel(ylabel, size=labelsize)
+
+    return ax
 
 
 @msme_colors
@@ -26,20 +976,24 @@ def plot_free_energy(data, ax=None, obs=0, temperature=300., n_samples=None,
                      vmin=None, vmax=None, n_levels=10, clabel=False,
                      clabel_kwargs=None, cbar=False, cbar_kwargs=None,
                      xlabel=None, ylabel=None,
-                     labelsize=14, random_state=None, return_data=False):
+                     labelsize=14, random_state=None, return_data=False,
+                     method='scipy', sampling='random', cache=None,
+                     n_bootstrap=None, n_jobs=1, histogram_kwargs=None,
+                     msm=None, assignments=None, periodic=None):
     """
     Plot free energy of observable(s) in kilocalories per mole.
 
     Parameters
     ----------
-    data : ndarray (nsamples, ndim)
-        The samples. This should be a 1- or 2-dimensional array. For a 1-D
-        array this results in 1-D kernel density plot. For a 2-D array, this
-        generates a 2-D contour plot.
+    data : ndarray (nsamples, ndim), or list thereof
+        The samples. A memory-mapped array or a list of (memory-mapped)
+        per-trajectory arrays is read in blocks, and only the columns in
+        ``obs`` are loaded into memory.
     ax : matplotlib axis, optional
         matplotlib figure axis
     obs : int or tuple, optional (default: 0)
-        Observables to plot.
+        Observables to plot. A single observable results in a 1-D kernel
+        density plot, and a pair generates a 2-D contour plot.
     temperature : float, optional (default: 300.0)
         Simulation temperature in degrees Kelvin.
     n_samples : int, optional
@@ -57,7 +1011,8 @@ def plot_free_energy(data, ax=None, obs=0, temperature=300., n_samples=None,
         Lower and upper bounds for datapoints used to fit KDE. Can provide a
         pair of (low, high) bounds for bivariate plots.
     color : str, optional (default: 'beryl')
-        Color of the univariate KDE curve.
+        Color of the univariate KDE curve, and of the standard error
+        contours of a bootstrapped bivariate plot.
     shade : bool, optional
         If True, shade in the area over the KDE curve (or draw with filled
         contours when data is bivariate).
@@ -93,6 +1048,63 @@ def plot_free_energy(data, ax=None, obs=0, temperature=300., n_samples=None,
         number generator
     return_data : Boolean,optional
         Whether or not to return the plotting data
+    method : {'scipy' | 'direct' | 'fft' | 'histogram'}, optional
+        Density estimator (default: 'scipy'). 'scipy' evaluates a Gaussian
+        KDE directly at every grid point and ignores ``pi`` unless
+        subsampling. 'direct' computes the same sum in ``n_jobs`` threads,
+        in tiles that bound its temporary memory, and weights the samples
+        by ``pi`` when ``n_samples`` is not set. 'fft' bins
+        the data on a grid and convolves it with the kernel, which scales
+        linearly with the number of samples, and weights the samples by
+        ``pi`` when ``n_samples`` is not set. 'histogram' is a cheaper,
+        rougher estimate from a weighted histogram with ``gridsize`` bins
+        per observable (see ``histogram_kwargs``), which ignores ``bw`` and
+        ``cut`` and leaves empty bins blank.
+    sampling : {'random' | 'stratified' | 'trajectory'}, optional
+        How ``n_samples`` frames are drawn (with replacement, in proportion
+        to ``pi``). 'random' draws independent frames, 'stratified' uses
+        low-variance systematic resampling and 'trajectory' draws from each
+        trajectory in proportion to its weight, which requires ``data`` to
+        be a list of trajectories. See ``msmexplorer.sampling``.
+    cache : bool, str or msmexplorer.cache.SurfaceCache, optional
+        Reuse the free energy surface computed by an earlier call with the
+        same data and estimation parameters, so that calls which only change
+        the style are fast. ``True`` uses a shared in-memory LRU cache and a
+        directory name also stores surfaces there. The data and ``pi`` are
+        identified by a cheap fingerprint of evenly spaced rows (see
+        ``msmexplorer.cache.array_fingerprint``). Random subsamples are only
+        cached when ``random_state`` is an integer.
+    n_bootstrap : int, optional
+        Number of bootstrap replicates used to estimate the uncertainty of
+        the free energy, which requires ``data`` to be a list of
+        trajectories. Each replicate resamples whole trajectories with
+        replacement, so correlated frames are not mistaken for independent
+        ones. Univariate plots show the 95% interval as a band and
+        bivariate plots show contours of the standard error. Bootstrapping
+        always uses the 'fft' estimator and cannot be combined with
+        ``n_samples``.
+    n_jobs : int, optional (default: 1)
+        Number of threads used by the 'direct' estimator and to smooth the
+        bootstrap replicates. -1 uses all processors.
+    histogram_kwargs : dict, optional
+        Arguments to pass to ``msmexplorer.kde.histogram_density`` when
+        ``method='histogram'``, e.g. ``edges='quantile'`` for adaptive bin
+        edges or ``smooth=1.`` to smooth the counts.
+    msm : msmbuilder.msm.MarkovStateModel, optional
+        Reweight the frames by the stationary populations of this model,
+        split evenly between the frames of each state, instead of by
+        ``pi``. The weights are looked up from ``assignments`` one block of
+        frames at a time, so no per-frame array is built.
+    assignments : array-like of int, or list thereof, optional
+        State of each frame of ``data``, as used to fit ``msm``.
+    periodic : bool or tuple of bool, optional
+        Whether each observable is an angle in degrees, e.g.
+        ``periodic=(True, True)`` for a Ramachandran plot of dihedrals.
+        Periodic observables are wrapped between -180 and 180 degrees and
+        their density is estimated on that range with wrap-around
+        boundaries, so basins across the seams are continuous. ``cut`` and
+        ``clip`` do not apply to them. Periodic surfaces always use the
+        'fft' estimator.
 
     Returns
     -------
@@ -104,103 +1116,183 @@ def plot_free_energy(data, ax=None, obs=0, temperature=300., n_samples=None,
         To remake 2 dim plots: contour(return_data[0],return_data[1],return_data[2])
     """
 
-    if ax is None:
-        ax = pp.gca()
+    surface = compute_free_energy(data, obs=obs, temperature=temperature,
+                                  n_samples=n_samples, pi=pi, bw=bw,
+                                  gridsize=gridsize, cut=cut, clip=clip,
+                                  random_state=random_state, method=method,
+                                  sampling=sampling, cache=cache,
+                                  n_bootstrap=n_bootstrap, n_jobs=n_jobs,
+                                  histogram_kwargs=histogram_kwargs, msm=msm,
+                                  assignments=assignments, periodic=periodic)
 
-    if pi is not None and sum(pi) > 1:
-        pi /= sum(pi)
+    ax = plot_free_energy_surface(surface, ax=ax, color=color, shade=shade,
+                                  alpha=alpha, cmap=cmap, vmin=vmin,
+                                  vmax=vmax, n_levels=n_levels, clabel=clabel,
+                                  clabel_kwargs=clabel_kwargs, cbar=cbar,
+                                  cbar_kwargs=cbar_kwargs, xlabel=xlabel,
+                                  ylabel=ylabel, labelsize=labelsize)
 
-    if isinstance(obs, int):
-        obs = (obs,)
+    if return_data:
+        return ax, surface.to_list()
+    else:
+        return ax
 
-    if isinstance(random_state, (int, type(None))):
-        random_state = np.random.RandomState(random_state)
 
-    prune = data[:, obs]
-    if n_samples:
-        idx = random_state.choice(range(data.shape[0]), size=n_samples, p=pi)
-        prune = prune[idx, :]
+def _compute_free_energy_from_file(filename, pi_filename, obs, kwargs):
+    data = np.load(filename, mmap_mode='r')
+    pi = None if pi_filename is None else np.load(pi_filename, mmap_mode='r')
+    return compute_free_energy(data, obs=obs, pi=pi, **kwargs)
 
-    if return_data:
-        to_return = []
 
-    if prune.shape[1] == 1:
+def _compute_free_energies(data, tasks, pi, n_jobs, backend, kwargs):
+    """Compute a free energy surface for each tuple of columns in tasks."""
+    n_jobs = effective_n_jobs(n_jobs)
+    if n_jobs == 1:
+        return [compute_free_energy(data, obs=obs, pi=pi, **kwargs)
+                for obs in tasks]
 
-        if clip is None:
-            clip = (-np.inf, np.inf)
+    if backend == 'threading':
+        with ThreadPoolExecutor(n_jobs) as executor:
+            futures = [executor.submit(compute_free_energy, data, obs=obs,
+                                       pi=pi, **kwargs) for obs in tasks]
+            return [f.result() for f in futures]
 
-        X, Z = _scipy_univariate_kde(prune[:, 0], bw, gridsize, cut, clip)
+    if backend == 'multiprocessing':
+        # Workers share a single read-only, memory-mapped copy of the data
+        tmpdir = tempfile.mkdtemp(prefix='msmexplorer')
+        try:
+            filename = os.path.join(tmpdir, 'data.npy')
+            np.save(filename, data)
+            pi_filename = None
+            if pi is not None:
+                pi_filename = os.path.join(tmpdir, 'pi.npy')
+                np.save(pi_filename, pi)
+            with ProcessPoolExecutor(n_jobs) as executor:
+                futures = [executor.submit(_compute_free_energy_from_file,
+                                           filename, pi_filename, obs, kwargs)
+                           for obs in tasks]
+                return [f.result() for f in futures]
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
 
-        Z = _thermo_transform(Z, temperature)
+    raise ValueError("backend must be 'threading' or 'multiprocessing'")
 
-        ax.plot(X, Z - Z.min(), color=color)
 
-        if shade:
-            ax.fill_between(X, Z - Z.min(), Z.max() - Z.min(),
-                            facecolor=color, alpha=alpha)
-        if return_data:
-            to_return.append(X)
-            to_return.append(Z)
+@msme_colors
+def plot_free_energy_grid(data, obs=None, obs_pairs=None, n_jobs=1,
+                          backend='threading', temperature=300.,
+                          n_samples=None, pi=None, bw='scott', gridsize=30,
+                          cut=3, method='scipy', sampling='random',
+                          random_state=None, color='beryl', shade=True,
+                          alpha=0.5, cmap='bone', n_levels=10, labels=None,
+                          labelsize=14, axes=None):
+    """
+    Plot free energies of many observables and pairs of observables as a
+    corner-style grid.
 
-    elif prune.shape[1] == 2:
+    The surfaces are computed in parallel from a single in-memory copy of
+    the requested columns of ``data``, which is gathered (and subsampled)
+    once for all of the panels.
 
-        if clip is None:
-            clip = [(-np.inf, np.inf), (-np.inf, np.inf)]
-        elif np.ndim(clip) == 1:
-            clip = [clip, clip]
-
-        X, Y, Z = _scipy_bivariate_kde(prune[:, 0], prune[:, 1], bw, gridsize,
-                                       cut, clip)
-
-        Z = _thermo_transform(Z, temperature)
-
-        if not vmin:
-            vmin = -1E-12
-        if not vmax:
-            vmax = np.percentile(Z, 50)
-
-        if shade:
-            cf = ax.contourf(X, Y, Z - Z.min(), cmap=pp.get_cmap(cmap),
-                             levels=np.linspace(vmin, vmax, n_levels),
-                             alpha=alpha, zorder=1, vmin=vmin, vmax=vmax)
-        cs = ax.contour(X, Y, Z - Z.min(), cmap=pp.get_cmap('bone_r'),
-                        levels=np.linspace(vmin, vmax, n_levels), alpha=1,
-                        zorder=1, vmin=vmin, vmax=vmax)
-
-        if clabel:
-            if not clabel_kwargs:
-                clabel_kwargs = {}
-
-            ax.clabel(cs, **clabel_kwargs)
-
-        if cbar:
-            if not cbar_kwargs:
-                cbar_kwargs = {}
-            if shade:
-                mappable = cf
-            else:
-                mappable = cs
-            pp.colorbar(mappable, **cbar_kwargs)
+    Parameters
+    ----------
+    data : ndarray (nsamples, ndim), or list thereof
+        The samples. A memory-mapped array or a list of (memory-mapped)
+        per-trajectory arrays is read in blocks.
+    obs : list of int, optional
+        Observables to plot on the diagonal. Defaults to every observable
+        that appears in ``obs_pairs``, or to every column of ``data``.
+    obs_pairs : list of pairs of int, optional
+        Pairs of observables to plot in 2-D, as (x, y). Defaults to every
+        pair of ``obs``.
+    n_jobs : int, optional (default: 1)
+        Number of surfaces computed in parallel. -1 uses all CPUs.
+    backend : {'threading' | 'multiprocessing'}, optional
+        Compute surfaces in threads that share the data, or in processes
+        that share a temporary memory-mapped copy of it.
+    labels : list of str, optional
+        Label for each observable in ``obs``.
+    axes : ndarray of matplotlib axes, optional
+        Square array of axes to draw on, with one row and one column per
+        observable.
+
+    The remaining parameters are the same as for ``plot_free_energy``.
+
+    Returns
+    -------
+    fig : matplotlib figure
+        The figure.
+    axes : ndarray of matplotlib axes
+        The grid of axes, indexed [row, column].
+    """
+    if isinstance(data, list):
+        data = ConcatenatedArray(data)
 
-        ax.grid(zorder=0)
+    if obs is None:
+        if obs_pairs is None:
+            obs = range(data.shape[1])
+        else:
+            obs = [o for pair in obs_pairs for o in pair]
+    obs = sorted(set(obs))
+    if obs_pairs is None:
+        obs_pairs = list(combinations(obs, 2))
+    obs = sorted(set(obs).union(*obs_pairs))
+    position = dict((o, i) for i, o in enumerate(obs))
 
-        if return_data:
-            to_return.append(X)
-            to_return.append(Y)
-            to_return.append(Z)
+    weights = pi
+    if n_samples:
+        idx = sample_indices(data.shape[0], n_samples, weights=pi,
+                             method=sampling,
+                             lengths=getattr(data, 'lengths', None),
+                             random_state=random_state)
+        shared = take_columns(data, obs, rows=idx)
+        weights = None
     else:
-        raise ValueError('obs cannot be greater than size 2')
+        shared = take_columns(data, obs)
 
-    if xlabel:
-        ax.set_xlabel(xlabel, size=labelsize)
+    tasks = ([(position[o],) for o in obs] +
+             [(position[x], position[y]) for x, y in obs_pairs])
+    kwargs = dict(temperature=temperature, bw=bw, gridsize=gridsize, cut=cut,
+                  method=method)
+    surfaces = dict(zip(tasks, _compute_free_energies(shared, tasks, weights,
+                                                      n_jobs, backend,
+                                                      kwargs)))
 
-    if ylabel:
-        ax.set_ylabel(ylabel, size=labelsize)
+    k = len(obs)
+    if axes is None:
+        _, axes = pp.subplots(k, k, figsize=(2.5 * k, 2.5 * k),
+                              squeeze=False)
+    axes = np.asarray(axes).reshape(k, k)
+    fig = axes[0, 0].figure
 
-    if return_data:
-        return ax, to_return
-    else:
-        return ax
+    limits = [(surfaces[(i,)].grid[0][0], surfaces[(i,)].grid[0][-1])
+              for i in range(k)]
+    for row in range(k):
+        for col in range(k):
+            ax = axes[row, col]
+            if row == col:
+                plot_free_energy_surface(surfaces[(col,)], ax=ax, color=color,
+                                         shade=shade, alpha=alpha)
+            elif (col, row) in surfaces:
+                plot_free_energy_surface(surfaces[(col, row)], ax=ax,
+                                         shade=shade, alpha=alpha, cmap=cmap,
+                                         n_levels=n_levels)
+                ax.set_ylim(limits[row])
+            else:
+                ax.set_visible(False)
+                continue
+            ax.set_xlim(limits[col])
+
+            if row < k - 1:
+                ax.set_xticklabels([])
+            elif labels is not None:
+                ax.set_xlabel(labels[col], size=labelsize)
+            if col > 0 and row != col:
+                ax.set_yticklabels([])
+            elif col == 0 and row > 0 and labels is not None:
+                ax.set_ylabel(labels[row], size=labelsize)
+
+    return fig, axes
 
 
 def plot_decomp_grid(decomposition, obs=0, n_levels=10, res=50, alpha=1.,
@@ -5,6 +5,7 @@ from matplotlib import pyplot as pp
 from msmbuilder import tpt
 
 from ..utils import msme_colors
+from .msm import _transition_matrix, _network_layout
 
 __all__ = ['plot_tpaths']
 
@@ -13,7 +14,8 @@ __all__ = ['plot_tpaths']
 def plot_tpaths(msm, sources, sinks, for_committors=None, num_paths=1,
                 pos=None, node_size=None, node_color='pomegranate',
                 edge_color='carbon', alpha=.7, with_labels=True, ax=None,
-                **kwargs):
+                layout='spring', random_state=None, cache=None,
+                layout_kwargs=None, **kwargs):
     """
     Plot TPT network diagram.
 
@@ -41,6 +43,21 @@ def plot_tpaths(msm, sources, sinks, for_committors=None, num_paths=1,
         Axis to plot on, otherwise uses current axis.
     with_labels : boolean, optional
         Whether or not to include node labels (default: True)
+    layout : {'spring' | 'spectral'}, optional (default: 'spring')
+        Layout used when ``pos`` is not given. 'spring' is a force-directed
+        layout of the paths, weighted by their net fluxes (see
+        ``msmexplorer.layout.spring_layout``). 'spectral' places the states
+        along the two slowest processes of the MSM (see
+        ``msmexplorer.layout.spectral_layout``).
+    random_state : int or RandomState, optional
+        Seed of the starting positions of the spring layout. By default
+        they are deterministic, so repeated plots are identical.
+    cache : bool, str or msmexplorer.cache.SurfaceCache, optional
+        Reuse the layout computed by an earlier call with the same paths
+        and layout parameters (see ``plot_msm_network``).
+    layout_kwargs : dict, optional
+        Extra arguments to pass to ``msmexplorer.layout.spring_layout``
+        (e.g. ``iterations``)
     **kwargs : dict, optional
         Extra arguments to pass to networkx.draw_networkx
 
@@ -50,10 +67,7 @@ def plot_tpaths(msm, sources, sinks, for_committors=None, num_paths=1,
         matplotlib figure axis
 
     """
-    if hasattr(msm, 'all_populations_'):
-        pop = msm.all_populations_.mean(0)
-    elif hasattr(msm, 'populations_'):
-        pop = msm.populations_
+    tmat, pop = _transition_matrix(msm)
 
     net_flux = tpt.net_fluxes(sources, sinks, msm,
                               for_committors=for_committors)
@@ -68,7 +82,15 @@ def plot_tpaths(msm, sources, sinks, for_committors=None, num_paths=1,
         ax = pp.gca()
 
     if pos is None:
-        pos = nx.spring_layout(graph)
+        nodes = list(graph.nodes())
+        row, col, flux = (np.array(x) for x in
+                          zip(*graph.edges(data='weight')))
+        # Net fluxes are small, so they are scaled to a maximum of one
+        pos = _network_layout(msm, tmat, row, col, flux / flux.max(),
+                              nodes=nodes, layout=layout,
+                              random_state=random_state, cache=cache,
+                              layout_kwargs=layout_kwargs)
+        pos = dict(zip(nodes, pos))
 
     if node_size is None:
         node_size = 5000. * pop
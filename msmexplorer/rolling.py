@@ -0,0 +1,213 @@
+"""
+Rolling statistics of long time series.
+
+Each statistic is computed over trailing windows, like
+``pandas.Series.rolling(window)``: the value at frame ``i`` summarizes
+frames ``i - window + 1`` to ``i``, and the first ``window - 1`` values are
+NaN. The series is processed in blocks that overlap by ``window - 1``
+frames, so apart from the output array the memory use is bounded by
+``BLOCK_BYTES``. Means and standard deviations use running sums, which are
+restarted in every block to limit round-off (more often for standard
+deviations). As in pandas, windows that contain a NaN are NaN.
+"""
+import numpy as np
+from scipy.ndimage import rank_filter
+
+from .utils import BLOCK_BYTES
+
+__all__ = ['rolling_mean', 'rolling_std', 'rolling_median',
+           'rolling_statistic']
+
+ROLLING_STATISTICS = ('mean', 'std', 'median')
+
+# Running sums of squares lose precision quickly, so they are restarted
+# after this many windows.
+STD_BLOCK_SIZE = 2 ** 12
+
+
+def _rolling_blocks(x, window, out, block_size):
+    """Yield ``(block, result)`` pairs: ``block`` holds the frames needed
+    for the windows ending in ``result``, a view of ``out``."""
+    out[:window - 1] = np.nan
+    for start in range(window - 1, x.shape[0], block_size):
+        stop = min(start + block_size, x.shape[0])
+        yield (np.asarray(x[start - window + 1:stop], dtype=float),
+               out[start:stop])
+
+
+def _check(x, window, out):
+    x = np.asanyarray(x)
+    if x.ndim == 2 and x.shape[1] == 1:
+        x = x[:, 0]
+    if x.ndim != 1:
+        raise ValueError('x must be 1-D')
+    if int(window) != window or window < 1:
+        raise ValueError('window must be a positive integer')
+    if out is None:
+        out = np.empty(x.shape[0])
+    elif out.shape != x.shape:
+        raise ValueError('out must have the shape of x')
+    return x, int(window), out
+
+
+def _sums(block, window):
+    """Sums of the windows of block, from a running sum."""
+    total = np.cumsum(block)
+    sums = total[window - 1:].copy()
+    sums[1:] -= total[:-window]
+    return sums
+
+
+def _nan_windows(block, window):
+    """NaN mask of block and whether each of its windows contains a NaN,
+    from a running count of the NaNs."""
+    nan = np.isnan(block)
+    return nan, _sums(nan.astype(np.intp), window) > 0
+
+
+def rolling_mean(x, window, out=None, block_size=None):
+    """
+    Trailing moving average.
+
+    Parameters
+    ----------
+    x : array-like (nsamples,)
+        The time series. Memory-mapped arrays are read in blocks.
+    window : int
+        Number of frames in each window.
+    out : ndarray (nsamples,), optional
+        Array in which to store the result.
+    block_size : int, optional
+        Number of windows computed at a time.
+
+    Returns
+    -------
+    out : ndarray (nsamples,)
+        The moving average. The first ``window - 1`` values are NaN.
+    """
+    x, window, out = _check(x, window, out)
+    if block_size is None:
+        block_size = max(window, BLOCK_BYTES // 16)
+    for block, result in _rolling_blocks(x, window, out, block_size):
+        nan, gaps = _nan_windows(block, window)
+        result[:] = _sums(np.where(nan, 0, block), window) / window
+        result[gaps] = np.nan
+    return out
+
+
+def rolling_std(x, window, out=None, block_size=None, ddof=1):
+    """
+    Trailing moving standard deviation.
+
+    Parameters
+    ----------
+    x : array-like (nsamples,)
+        The time series. Memory-mapped arrays are read in blocks.
+    window : int
+        Number of frames in each window.
+    out : ndarray (nsamples,), optional
+        Array in which to store the result.
+    block_size : int, optional
+        Number of windows computed at a time.
+    ddof : int, optional (default: 1)
+        Delta degrees of freedom, as in ``numpy.std``.
+
+    Returns
+    -------
+    out : ndarray (nsamples,)
+        The moving standard deviation. The first ``window - 1`` values
+        are NaN.
+    """
+    x, window, out = _check(x, window, out)
+    if block_size is None:
+        block_size = max(window, STD_BLOCK_SIZE)
+    for block, result in _rolling_blocks(x, window, out, block_size):
+        nan, gaps = _nan_windows(block, window)
+        # Shifting by a typical value avoids cancellation in the sums
+        finite = block[~nan]
+        shift = (np.median(finite[::max(1, finite.shape[0] // 64)])
+                 if finite.size else 0)
+        block = np.where(nan, 0, block - shift)
+        sums = _sums(block, window)
+        result[:] = _sums(block * block, window) - sums * sums / window
+        np.maximum(result, 0, out=result)
+        result /= window - ddof
+        np.sqrt(result, out=result)
+        result[gaps] = np.nan
+    return out
+
+
+def rolling_median(x, window, out=None, block_size=None):
+    """
+    Trailing moving median.
+
+    The middle order statistics of the windows are found in C by
+    ``scipy.ndimage.rank_filter``, one block at a time. Even windows average
+    the two middle values, like pandas.
+
+    Parameters
+    ----------
+    x : array-like (nsamples,)
+        The time series. Memory-mapped arrays are read in blocks.
+    window : int
+        Number of frames in each window.
+    out : ndarray (nsamples,), optional
+        Array in which to store the result.
+    block_size : int, optional
+        Number of windows computed at a time.
+
+    Returns
+    -------
+    out : ndarray (nsamples,)
+        The moving median. The first ``window - 1`` values are NaN.
+    """
+    x, window, out = _check(x, window, out)
+    if block_size is None:
+        block_size = max(window, BLOCK_BYTES // 16)
+    # Align the filter windows to end at each frame
+    origin = (window - 1) // 2
+    for block, result in _rolling_blocks(x, window, out, block_size):
+        # The order statistics of windows with a NaN are undefined
+        _, gaps = _nan_windows(block, window)
+        result[:] = rank_filter(block, window // 2, size=window,
+                                origin=origin)[window - 1:]
+        if window % 2 == 0:
+            result += rank_filter(block, window // 2 - 1, size=window,
+                                  origin=origin)[window - 1:]
+            result /= 2
+        result[gaps] = np.nan
+    return out
+
+
+def rolling_statistic(x, window, statistic='mean', out=None,
+                      block_size=None):
+    """
+    Trailing moving statistic.
+
+    Parameters
+    ----------
+    x : array-like (nsamples,)
+        The time series.
+    window : int
+        Number of frames in each window.
+    statistic : {'mean' | 'std' | 'median'}, optional (default: 'mean')
+        The statistic to compute. See ``rolling_mean``, ``rolling_std``
+        and ``rolling_median``.
+    out : ndarray (nsamples,), optional
+        Array in which to store the result.
+    block_size : int, optional
+        Number of windows computed at a time.
+
+    Returns
+    -------
+    out : ndarray (nsamples,)
+        The moving statistic. The first ``window - 1`` values are NaN.
+    """
+    if statistic == 'mean':
+        return rolling_mean(x, window, out, block_size)
+    elif statistic == 'std':
+        return rolling_std(x, window, out, block_size)
+    elif statistic == 'median':
+        return rolling_median(x, window, out, block_size)
+    raise ValueError('statistic must be one of %s'
+                     % ', '.join(map(repr, ROLLING_STATISTICS)))
@@ -0,0 +1,215 @@
+"""
+Vectorized (weighted) subsampling of frames.
+
+All samplers draw indices with replacement by inverting the cumulative sum of
+the weights with ``np.searchsorted``, so their cost is a single pass over the
+weights plus ``O(size log n)``. The weights are never modified. Lazy
+``StateWeights`` are read in blocks instead, so that no per-frame array is
+ever held in memory.
+"""
+import numpy as np
+
+from .utils import StateWeights
+
+__all__ = ['check_random_state', 'weighted_choice', 'stratified_choice',
+           'trajectory_choice', 'sample_indices']
+
+
+def check_random_state(random_state):
+    """Turn ``None``, an integer seed or a RandomState into a RandomState."""
+    if isinstance(random_state, np.random.RandomState):
+        return random_state
+    if random_state is None or isinstance(random_state, (int, np.integer)):
+        return np.random.RandomState(random_state)
+    raise ValueError('%r cannot be used to seed a numpy.random.RandomState'
+                     % random_state)
+
+
+class _LazyCumulativeWeights(object):
+    """Cumulative sum of ``StateWeights``, computed in blocks on access."""
+
+    def __init__(self, weights):
+        self.weights = weights
+        self.shape = weights.shape
+        self.total = weights.sum()
+
+    def __getitem__(self, index):
+        if np.ndim(index) == 0 and index in (-1, self.shape[0] - 1):
+            return self.total
+        return self.weights.cumsum_at(index)
+
+
+def _cumulative_weights(weights):
+    if isinstance(weights, StateWeights):
+        if np.any(weights.state_weights < 0):
+            raise ValueError('weights must be non-negative')
+        cum = _LazyCumulativeWeights(weights)
+    else:
+        cum = np.cumsum(weights, dtype=float)
+        if np.any(np.asarray(weights) < 0):
+            raise ValueError('weights must be non-negative')
+    if cum.shape[0] == 0 or not cum[-1] > 0:
+        raise ValueError('weights must have a positive sum')
+    return cum
+
+
+def _invert(cum, u):
+    if isinstance(cum, _LazyCumulativeWeights):
+        idx = cum.weights.searchsorted(u)
+    else:
+        idx = np.searchsorted(cum, u, side='right')
+    # Guard against round-off placing u at (or past) the final total
+    return np.minimum(idx, cum.shape[0] - 1)
+
+
+def weighted_choice(weights, size, random_state=None):
+    """
+    Draw independent indices with probabilities proportional to weights.
+
+    Parameters
+    ----------
+    weights : array-like or StateWeights (n,)
+        Non-negative weight of each index. Need not be normalized.
+    size : int
+        Number of indices to draw.
+    random_state : integer or numpy.RandomState, optional
+        The generator used to draw the indices.
+
+    Returns
+    -------
+    idx : ndarray (size,)
+        The sampled indices.
+    """
+    random_state = check_random_state(random_state)
+    cum = _cumulative_weights(weights)
+    return _invert(cum, random_state.rand(size) * cum[-1])
+
+
+def stratified_choice(weights, size, random_state=None):
+    """
+    Draw indices by systematic (stratified) resampling.
+
+    The cumulative weight is split into ``size`` equal strata and one index
+    is drawn from each, with a single random offset shared by all strata.
+    Every index is then sampled within one of its expected number of times,
+    which gives a lower variance than independent draws.
+
+    Parameters
+    ----------
+    weights : array-like or StateWeights (n,)
+        Non-negative weight of each index. Need not be normalized.
+    size : int
+        Number of indices to draw.
+    random_state : integer or numpy.RandomState, optional
+        The generator used to draw the offset.
+
+    Returns
+    -------
+    idx : ndarray (size,)
+        The sampled indices, in increasing order.
+    """
+    random_state = check_random_state(random_state)
+    cum = _cumulative_weights(weights)
+    u = (np.arange(size) + random_state.rand()) * (cum[-1] / size)
+    return _invert(cum, u)
+
+
+def trajectory_choice(lengths, size, weights=None, random_state=None):
+    """
+    Draw indices trajectory by trajectory.
+
+    Each trajectory receives a whole number of samples proportional to its
+    total weight (by largest remainder), so every trajectory that carries
+    enough weight is represented. Samples are then drawn independently
+    within each trajectory in proportion to the weights.
+
+    Parameters
+    ----------
+    lengths : array-like of int (n_trajectories,)
+        Number of frames in each trajectory. Indices refer to the frames of
+        all trajectories concatenated in order.
+    size : int
+        Number of indices to draw.
+    weights : array-like or StateWeights (sum(lengths),), optional
+        Non-negative weight of each frame. Defaults to uniform weights.
+    random_state : integer or numpy.RandomState, optional
+        The generator used to draw the indices.
+
+    Returns
+    -------
+    idx : ndarray (size,)
+        The sampled indices, grouped by trajectory.
+    """
+    random_state = check_random_state(random_state)
+    lengths = np.asarray(lengths, dtype=int)
+    ends = np.cumsum(lengths)
+    if weights is None:
+        upper = ends.astype(float)
+    else:
+        cum = _cumulative_weights(weights)
+        if cum.shape[0] != ends[-1]:
+            raise ValueError('weights must have one entry per frame')
+        upper = np.where(ends > 0, cum[np.maximum(ends - 1, 0)], 0.)
+    lower = np.concatenate([[0.], upper[:-1]])
+    mass = upper - lower
+
+    quota = size * mass / upper[-1]
+    counts = np.floor(quota).astype(int)
+    remainder = size - counts.sum()
+    if remainder:
+        counts[np.argsort(counts - quota, kind='mergesort')[:remainder]] += 1
+
+    traj = np.repeat(np.arange(lengths.shape[0]), counts)
+    u = lower[traj] + random_state.rand(size) * mass[traj]
+    if weights is None:
+        return np.floor(u).astype(int)
+    return _invert(cum, u)
+
+
+def sample_indices(n, size, weights=None, method='random', lengths=None,
+                   random_state=None):
+    """
+    Draw ``size`` of ``n`` indices with replacement.
+
+    Parameters
+    ----------
+    n : int
+        Number of indices to draw from.
+    size : int
+        Number of indices to draw.
+    weights : array-like or StateWeights (n,), optional
+        Non-negative weight of each index. Defaults to uniform weights.
+    method : {'random' | 'stratified' | 'trajectory'}, optional
+        'random' draws independent indices, 'stratified' uses systematic
+        resampling, and 'trajectory' allocates samples to each trajectory
+        in proportion to its weight (see ``trajectory_choice``).
+    lengths : array-like of int, optional
+        Trajectory lengths. Required when ``method='trajectory'``.
+    random_state : integer or numpy.RandomState, optional
+        The generator used to draw the indices.
+
+    Returns
+    -------
+    idx : ndarray (size,)
+        The sampled indices.
+    """
+    random_state = check_random_state(random_state)
+    if weights is not None and np.shape(weights)[0] != n:
+        raise ValueError('weights must have one entry per sample')
+
+    if method == 'random':
+        if weights is None:
+            return random_state.randint(0, n, size)
+        return weighted_choice(weights, size, random_state)
+    elif method == 'stratified':
+        if weights is None:
+            return (((np.arange(size) + random_state.rand()) * n)
+                    // size).astype(int)
+        return stratified_choice(weights, size, random_state)
+    elif method == 'trajectory':
+        if lengths is None:
+            raise ValueError("method='trajectory' requires lengths")
+        if np.sum(lengths) != n:
+            raise ValueError('lengths must add up to the number of samples')
+        return trajectory_choice(lengths, size, weights, random_state)
+    raise ValueError("method must be 'random', 'stratified' or 'trajectory'")
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+import numpy as np
+
+from ..cache import SurfaceCache, array_fingerprint
+
+rs = np.random.RandomState(42)
+data = rs.rand(10000, 3)
+
+
+def test_array_fingerprint():
+    other = data.copy()
+    other[-1, 0] += 1.
+
+    assert array_fingerprint(data) == array_fingerprint(data.copy())
+    assert array_fingerprint(data) != array_fingerprint(other)
+    assert array_fingerprint(data, 1) == array_fingerprint(other, 1)
+    assert array_fingerprint([data, data]) != array_fingerprint(data)
+
+
+def test_surface_cache():
+    cachedir = tempfile.mkdtemp()
+    cache = SurfaceCache(maxsize=2, cachedir=cachedir)
+    for key in 'abc':
+        cache.set(key, [np.arange(3), np.ones((2, 2))])
+
+    assert len(cache) == 2
+    assert 'a' in cache
+    assert os.path.exists(os.path.join(cachedir, 'a.npz'))
+    np.testing.assert_array_equal(cache.get('a')[1], np.ones((2, 2)))
+    assert cache.get('d') is None
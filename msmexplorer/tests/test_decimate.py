@@ -0,0 +1,40 @@
+import numpy as np
+from matplotlib import pyplot as pp
+
+from ..decimate import m4_indices, lttb_indices, DecimatedLine
+
+rs = np.random.RandomState(42)
+y = np.cumsum(rs.randn(100000))
+
+
+def test_m4_indices():
+    idx = m4_indices(y, 100)
+    edges = np.linspace(0, y.shape[0], 101).astype(int)
+
+    assert idx.shape[0] <= 400
+    assert np.all(np.diff(idx) > 0)
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        bucket = idx[(idx >= lo) & (idx < hi)]
+        assert y[lo:hi].min() == y[bucket].min()
+        assert y[lo:hi].max() == y[bucket].max()
+        assert lo in bucket and hi - 1 in bucket
+
+
+def test_lttb_indices():
+    idx = lttb_indices(y, 200, start=100, stop=50100)
+
+    assert idx.shape[0] == 200
+    assert idx[0] == 100 and idx[-1] == 50099
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_decimated_line():
+    fig, ax = pp.subplots()
+    line, = ax.plot([], [])
+    DecimatedLine(ax, line, y)
+    n_full = line.get_xdata().shape[0]
+    ax.set_xlim(1000, 1100)
+
+    assert n_full < 4 * fig.get_figwidth() * fig.dpi
+    np.testing.assert_array_equal(line.get_xdata(), np.arange(999, 1102))
+    pp.close(fig)
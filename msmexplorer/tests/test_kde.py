@@ -0,0 +1,118 @@
+import numpy as np
+from scipy.stats import gaussian_kde
+
+from ..kde import (circular_histogram, circular_kde, direct_bivariate_kde,
+                   fft_kde, fft_kde_bootstrap, fft_univariate_kde,
+                   fft_bivariate_kde, histogram_density, linear_binning)
+
+rs = np.random.RandomState(42)
+data = np.c_[rs.randn(10000), rs.randn(10000)]
+data[:, 1] += 0.5 * data[:, 0]
+
+
+def test_linear_binning():
+    X = np.array([[0.25], [1.], [2.]])
+    counts = linear_binning(X, [0.], [1.], (3,), weights=[4., 1., 2.])
+    np.testing.assert_allclose(counts, [3., 2., 2.])
+
+
+def test_linear_binning_periodic():
+    X = np.array([[2.5], [0.5]])
+    counts = linear_binning(X, [0.], [1.], (3,), periodic=True)
+    np.testing.assert_allclose(counts, [1., 0.5, 0.5])
+
+
+def test_fft_kde_periodic():
+    random = np.random.RandomState(0)
+    angles = np.c_[180. + 20. * random.randn(10000),
+                   40. * random.randn(10000)]
+    grids, density = fft_kde(angles, gridsize=31, periodic=(True, False))
+    shifted, ref = fft_kde(angles + [180., 0.], gridsize=31,
+                           periodic=(True, False))
+
+    np.testing.assert_allclose(grids[0][[0, -1]], [-180., 180.])
+    np.testing.assert_allclose(density[0], density[-1])
+    # A half turn moves the density by half the grid
+    np.testing.assert_allclose(ref[:-1], np.roll(density[:-1], 15, axis=0),
+                               rtol=1e-6, atol=1e-12)
+
+    grids, density = fft_kde(angles, gridsize=31, periodic=True)
+    step = (grids[0][1] - grids[0][0]) * (grids[1][1] - grids[1][0])
+    np.testing.assert_allclose(density[:-1, :-1].sum() * step, 1., rtol=1e-2)
+
+
+def test_histogram_density():
+    weights = rs.rand(data.shape[0])
+    centers, density = histogram_density(data, bins=20, weights=weights)
+    counts, edges = np.histogramdd(data, bins=20, weights=weights,
+                                   density=True)
+
+    np.testing.assert_allclose(centers[0], (edges[0][1:] + edges[0][:-1]) / 2)
+    np.testing.assert_allclose(density, counts)
+
+
+def test_histogram_density_quantile():
+    centers, density = histogram_density(data[:, 0], bins=10,
+                                         edges='quantile', smooth=1.)
+    widths = np.diff(centers[0])
+
+    assert density.shape == (10,)
+    assert widths[0] > widths[4]
+
+
+def test_fft_univariate_kde():
+    grid, y = fft_univariate_kde(data[:, 0], 'scott', 30, 3,
+                                 (-np.inf, np.inf))
+    ref = gaussian_kde(data[:, 0])(grid)
+    np.testing.assert_allclose(y, ref, atol=1e-3 * ref.max())
+
+
+def test_fft_bivariate_kde():
+    xx, yy, z = fft_bivariate_kde(data[:, 0], data[:, 1], 'scott', 30, 3,
+                                  [(-np.inf, np.inf), (-1., 1.)])
+    ref = gaussian_kde(data.T)([xx.ravel(), yy.ravel()]).reshape(xx.shape)
+    assert yy.min() == -1. and yy.max() == 1.
+    np.testing.assert_allclose(z, ref, atol=1e-2 * ref.max())
+
+
+def test_fft_kde_bootstrap():
+    grids, density, replicates = fft_kde_bootstrap(
+        data, [2500, 2500, 5000], n_bootstrap=20, gridsize=20,
+        random_state=42)
+    ref_grids, ref = fft_kde(data, gridsize=20)
+
+    assert replicates.shape == (20, 20, 20)
+    np.testing.assert_allclose(grids[0], ref_grids[0])
+    np.testing.assert_allclose(density, ref, rtol=1e-2, atol=1e-3 * ref.max())
+
+
+def test_direct_bivariate_kde():
+    weights = rs.rand(data.shape[0])
+    xx, yy, z = direct_bivariate_kde(data[:, 0], data[:, 1], 'scott', 20, 3,
+                                     [(-np.inf, np.inf), (-1., 1.)],
+                                     weights=weights, n_jobs=2)
+    ref = gaussian_kde(data.T, weights=weights)([xx.ravel(), yy.ravel()])
+    np.testing.assert_allclose(z, ref.reshape(xx.shape), rtol=1e-10)
+
+
+def test_circular_histogram():
+    edges, counts = circular_histogram([-190., 170., 0., 359.], bins=4)
+    np.testing.assert_allclose(edges, [-180., -90., 0., 90., 180.])
+    np.testing.assert_allclose(counts, [0., 1., 1., 2.])
+
+    angles = 360 * rs.rand(100, 3)
+    _, counts = circular_histogram(angles, bins=8, origin=0., block_size=10)
+    for i in range(3):
+        ref, _ = np.histogram(angles[:, i], bins=8, range=(0, 360))
+        np.testing.assert_allclose(counts[i], ref)
+
+
+def test_circular_kde():
+    angles = 180. + 20. * rs.randn(10000)
+    grid, density = circular_kde(angles, gridsize=360)
+
+    assert grid.shape == density.shape == (360,)
+    np.testing.assert_allclose(density.sum() * (grid[1] - grid[0]), 1.)
+    # The density peaks at +-180 and is continuous across the wrap
+    assert density.argmax() in (0, 359)
+    np.testing.assert_allclose(density[0], density[-1], rtol=0.05)
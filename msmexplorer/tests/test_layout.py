@@ -0,0 +1,61 @@
+import numpy as np
+from numpy.testing import assert_allclose, assert_raises
+
+from ..layout import spring_layout, spectral_layout
+
+# A 20 x 20 lattice
+i, j = np.meshgrid(np.arange(20), np.arange(20), indexing='ij')
+node = 20 * i + j
+row = np.r_[node[:-1].ravel(), node[:, :-1].ravel()]
+col = np.r_[node[1:].ravel(), node[:, 1:].ravel()]
+
+
+def test_spring_layout():
+    pos = spring_layout(row, col)
+
+    assert pos.shape == (400, 2)
+    assert np.abs(pos).max() <= 1 + 1e-12
+    assert_allclose(pos, spring_layout(row, col))
+    # Neighbours end up much closer than random pairs of nodes
+    edge = np.sqrt(((pos[row] - pos[col]) ** 2).sum(1)).mean()
+    rs = np.random.RandomState(0)
+    a, b = rs.randint(400, size=(2, 1000))
+    assert edge < 0.2 * np.sqrt(((pos[a] - pos[b]) ** 2).sum(1)).mean()
+    # The corners of the lattice are spread apart
+    corners = pos[[0, 19, 380, 399]]
+    assert np.sqrt(((corners[0] - corners[3]) ** 2).sum()) > 1
+    assert np.sqrt(((corners[1] - corners[2]) ** 2).sum()) > 1
+
+
+def test_spring_layout_options():
+    pos = spring_layout(row, col, n_nodes=402, random_state=0,
+                        multilevel=False, iterations=10)
+
+    assert pos.shape == (402, 2)
+    assert_allclose(pos, spring_layout(row, col, n_nodes=402,
+                                       random_state=0, multilevel=False,
+                                       iterations=10))
+    assert not np.allclose(pos, spring_layout(row, col, n_nodes=402,
+                                              random_state=1,
+                                              multilevel=False,
+                                              iterations=10))
+    assert_raises(ValueError, spring_layout, row, col, pos=np.zeros((3, 2)))
+    assert spring_layout([], [], n_nodes=1).shape == (1, 2)
+
+
+def test_spectral_layout():
+    # Two metastable pairs of states
+    tmat = np.array([[.89, .1, .01, 0.],
+                     [.1, .89, 0., .01],
+                     [.01, 0., .79, .2],
+                     [0., .01, .2, .79]])
+    values, vectors = np.linalg.eig(tmat.T)
+    vectors = vectors[:, np.argsort(-values)]
+    pos = spectral_layout(vectors)
+
+    assert pos.shape == (4, 2)
+    assert np.abs(pos).max() == 1
+    # The pairs are separated along the slowest process
+    assert np.sign(pos[0, 0]) == np.sign(pos[1, 0])
+    assert np.sign(pos[0, 0]) != np.sign(pos[2, 0])
+    assert_allclose(spectral_layout(vectors[:, :2])[:, 1], 0)
@@ -1,8 +1,14 @@
+import os
+import tempfile
+
 import numpy as np
+from matplotlib import pyplot as pp
+from matplotlib.animation import FuncAnimation, FFMpegWriter
 from matplotlib.axes import SubplotBase
 from seaborn.apionly import FacetGrid
 
-from ..plots import plot_chord, plot_stackdist, plot_trace, plot_trace2d, plot_angle
+from ..plots import (plot_chord, plot_stackdist, plot_trace, plot_trace2d,
+                     animate_trace2d, plot_angle, plot_angles)
 from . import PlotTestCase
 
 rs = np.random.RandomState(42)
@@ -47,10 +53,86 @@ class TestTimeSeriesPlot(PlotTestCase):
         assert isinstance(ax1, SubplotBase)
         assert isinstance(ax2, SubplotBase)
 
+    def test_plot_trace2d_hue(self):
+        ax1 = plot_trace2d([ts2, ts2[:100]], hue='time', stride=3)
+        ax2 = plot_trace2d([ts2, ts2[:100]], hue=[ts2[:, 0], ts2[:100, 1]],
+                           cbar=False)
+
+        assert ax1.collections[-1].get_array().max() <= ts2.shape[0]
+        assert ax2.collections[-1].get_array().max() <= 1
+
+    def test_animate_trace2d(self):
+        fd, fn = tempfile.mkstemp(suffix='.gif')
+        os.close(fd)
+        try:
+            anim = animate_trace2d([ts2[:100], ts2[100:150]],
+                                   ax=pp.figure().gca(), tail=10, step=25,
+                                   filename=fn, writer='pillow', dpi=20)
+            assert os.path.getsize(fn) > 0
+        finally:
+            os.remove(fn)
+
+        assert isinstance(anim, FuncAnimation)
+
+    def test_animate_trace2d_pipe(self):
+        class Pipe(object):
+            frames = 0
+            size = 0
+
+            def write(self, buf):
+                self.frames += 1
+                self.size += len(memoryview(buf).cast('B'))
+
+        class PipeWriter(FFMpegWriter):
+            def _run(self):
+                self._proc = type('Proc', (), {'stdin': Pipe()})()
+
+            def finish(self):
+                pass
+
+        writer = PipeWriter(fps=10)
+        animate_trace2d([ts2[:100], ts2[100:150]],
+                        ax=pp.figure(figsize=(4, 3)).gca(), step=25,
+                        filename='unused.mp4', writer=writer, dpi=20)
+
+        pipe = writer._proc.stdin
+        assert pipe.frames == 4
+        assert pipe.size == 4 * 80 * 60 * 4
+
+    def test_plot_trace2d_aggregate(self):
+        ax1 = plot_trace2d(ts2, render='aggregate', reduction='count')
+        ax2 = plot_trace2d([ts2, ts2], render='aggregate', reduction='last',
+                           resolution=(50, 40))
+
+        assert isinstance(ax1, SubplotBase)
+        assert ax2.images[-1].get_array().shape == (40, 50)
+
+    def test_plot_trace2d_aggregate_nan(self):
+        traj = ts2[:1000].copy()
+        traj[::10, 0] = np.nan
+        traj[5] = np.inf
+        ax = plot_trace2d(traj, render='aggregate', reduction='mean')
+        image = ax.images[-1]
+
+        finite = traj[np.isfinite(traj).all(axis=1)]
+        assert np.isfinite(image.get_extent()).all()
+        assert np.allclose(image.get_extent()[:2],
+                           [finite[:, 0].min(), finite[:, 0].max()])
+        assert np.nanmax(image.get_array()) <= traj.shape[0]
+
+
 class TestAnglePlot(PlotTestCase):
     """Test the function(s) that visualize angle distributions"""
 
     def test_plot_angle(self):
         f, (left_ax, right_ax) = plot_angle(ts)
         assert isinstance(left_ax, SubplotBase)
-        assert isinstance(right_ax, SubplotBase)
\ No newline at end of file
+        assert isinstance(right_ax, SubplotBase)
+
+    def test_plot_angles(self):
+        angles = 360 * rs.rand(1000, 5) - 180
+        f, axes = plot_angles([angles[:400], angles[400:]], ncols=2,
+                              labels=list('abcde'))
+        assert axes.shape == (5, 2)
+        assert axes[4, 1].get_title() == 'e'
+        assert len(f.axes) == 10
@@ -1,8 +1,10 @@
 import numpy as np
+from scipy import sparse
 from msmbuilder.msm import MarkovStateModel, BayesianMarkovStateModel
 from matplotlib.axes import SubplotBase
 from seaborn.apionly import JointGrid
 
+from ..cache import SurfaceCache
 from ..plots import (plot_pop_resids, plot_msm_network, plot_timescales,
                      plot_implied_timescales)
 from . import PlotTestCase
@@ -28,6 +30,21 @@ class TestMSMPlot(PlotTestCase):
 
         assert isinstance(ax, SubplotBase)
 
+    def test_plot_msm_network_sparse(self):
+        ax = plot_msm_network(sparse.csr_matrix(msm.transmat_), top_k=2,
+                              threshold=0.01, with_labels=False)
+
+        assert isinstance(ax, SubplotBase)
+        assert len(ax.collections[0].get_segments()) <= 2 * msm.n_states_
+
+    def test_plot_msm_network_layout(self):
+        cache = SurfaceCache()
+        for layout in ['spectral', 'spring', 'spectral']:
+            ax = plot_msm_network(msm, layout=layout, cache=cache)
+
+        assert isinstance(ax, SubplotBase)
+        assert len(cache) == 2
+
     def test_plot_timescales_msm(self):
         ax = plot_timescales(msm, n_timescales=3, xlabel='x', ylabel='y')
 
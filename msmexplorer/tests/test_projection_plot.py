@@ -1,8 +1,18 @@
+import os
+import pickle
+import tempfile
+import warnings
+
 import numpy as np
+from numpy.testing import assert_raises
 from matplotlib.figure import Figure
 from matplotlib.axes import SubplotBase
 
-from ..plots import plot_histogram, plot_free_energy, plot_decomp_grid
+from ..plots import (plot_histogram, plot_free_energy, plot_decomp_grid,
+                     plot_free_energy_surface, plot_free_energy_grid,
+                     compute_free_energy,
+                     FreeEnergySurface, FreeEnergyAccumulator)
+from ..cache import SurfaceCache
 from . import PlotTestCase
 
 n = 100000
@@ -18,6 +28,33 @@ class TestProjectionPlot(PlotTestCase):
 
         assert isinstance(fig, Figure)
 
+    def test_plot_histogram_weighted(self):
+        fig = plot_histogram([data[:n // 2], data[n // 2:]],
+                             weights=np.ones(n), quantiles=(0.5,),
+                             show_titles=True, n_jobs=2, block_size=1000)
+
+        assert isinstance(fig, Figure)
+
+    def test_plot_histogram_overplot(self):
+        fig = plot_histogram(data[:n // 2], color='k')
+        n_axes = len(fig.axes)
+        fig = plot_histogram(data[n // 2:], color='r', fig=fig)
+
+        assert len(fig.axes) == n_axes
+        assert len(fig.axes[0].lines) == 2
+
+    def test_plot_histogram_corner_kwargs(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            fig = plot_histogram(data, bins=[10, 10], plot_datapoints=False,
+                                 hist_bin_factor=2)
+
+        assert isinstance(fig, Figure)
+        assert len(caught) == 2
+        assert_raises(ValueError, plot_histogram, data, bins=[10, 20])
+        assert_raises(ValueError, plot_histogram, data, range=[.9, .9])
+        assert_raises(TypeError, plot_histogram, data, no_such_option=1)
+
     def test_plot_free_energy_1d(self):
         ax = plot_free_energy(data, n_samples=10000, pi=np.array(n*[.5]),
                               xlabel='x', ylabel='y')
@@ -31,6 +68,128 @@ class TestProjectionPlot(PlotTestCase):
 
         assert isinstance(ax, SubplotBase)
 
+    def test_plot_free_energy_sampling(self):
+        pi = np.ones(n)
+        ax = plot_free_energy([data, data], obs=(0, 1), n_samples=1000,
+                              pi=np.r_[pi, pi], sampling='trajectory')
+
+        assert isinstance(ax, SubplotBase)
+        np.testing.assert_array_equal(pi, np.ones(n))
+
+    def test_plot_free_energy_cache(self):
+        cache = SurfaceCache()
+        _, surface = plot_free_energy(data, obs=(0, 1), n_samples=1000,
+                                      random_state=42, cache=cache,
+                                      return_data=True)
+        _, cached = plot_free_energy(data, obs=(0, 1), n_samples=1000,
+                                     random_state=42, cache=cache,
+                                     cmap='magma', return_data=True)
+
+        assert len(cache) == 1
+        np.testing.assert_array_equal(surface[2], cached[2])
+
+    def test_plot_free_energy_fft(self):
+        ax = plot_free_energy(data, obs=(0, 1), pi=np.array(n*[.5]),
+                              method='fft')
+
+        assert isinstance(ax, SubplotBase)
+
+    def test_plot_free_energy_periodic(self):
+        angles = 360 * data - 180
+        angles[:, 0] += 720
+        _, (X, Y, Z) = plot_free_energy(angles, obs=(0, 1),
+                                        periodic=(True, True),
+                                        return_data=True)
+
+        np.testing.assert_allclose([X.min(), X.max()], [-180., 180.])
+        np.testing.assert_allclose(Z[0], Z[-1])
+        np.testing.assert_allclose(Z[:, 0], Z[:, -1])
+
+    def test_plot_free_energy_direct(self):
+        ax = plot_free_energy(data[:10000], obs=(0, 1), method='direct',
+                              n_jobs=2)
+
+        assert isinstance(ax, SubplotBase)
+
+    def test_plot_free_energy_histogram(self):
+        ax = plot_free_energy(data, obs=(0, 1), method='histogram',
+                              histogram_kwargs=dict(edges='quantile',
+                                                    smooth=1.))
+
+        assert isinstance(ax, SubplotBase)
+
+    def test_plot_free_energy_bootstrap(self):
+        ax, (X, Z) = plot_free_energy([data, data], obs=0, n_bootstrap=10,
+                                      random_state=42, return_data=True)
+        surface = compute_free_energy([data, data], obs=(0, 1),
+                                      n_bootstrap=10, n_jobs=2)
+        ax = plot_free_energy_surface(surface)
+
+        assert surface.errors.shape == surface.values.shape
+        assert np.all(surface.interval[0] <= surface.interval[1])
+        assert isinstance(ax, SubplotBase)
+
+    def test_plot_free_energy_memmap(self):
+        fn = os.path.join(tempfile.mkdtemp(), 'data.npy')
+        np.save(fn, data)
+        mmap = np.load(fn, mmap_mode='r')
+        ax = plot_free_energy([mmap, mmap], obs=(0, 1), n_samples=1000)
+
+        assert isinstance(ax, SubplotBase)
+
+    def test_plot_free_energy_surface(self):
+        surface = compute_free_energy(data, obs=(0, 1), n_samples=1000)
+        surface = pickle.loads(pickle.dumps(surface))
+        ax = plot_free_energy_surface(surface, cbar=True)
+
+        assert isinstance(surface, FreeEnergySurface)
+        assert surface.values.shape == (30, 30)
+        assert isinstance(ax, SubplotBase)
+
+    def test_plot_free_energy_grid(self):
+        data3 = np.c_[data, data[:, 0] + data[:, 1]]
+        fig, axes = plot_free_energy_grid(data3, n_samples=1000, n_jobs=2,
+                                          method='fft', labels='xyz')
+
+        assert isinstance(fig, Figure)
+        assert axes.shape == (3, 3)
+        assert not axes[0, 2].get_visible()
+
+    def test_plot_free_energy_grid_multiprocessing(self):
+        fig, axes = plot_free_energy_grid(data, obs_pairs=[(0, 1)],
+                                          n_jobs=2, method='fft',
+                                          backend='multiprocessing')
+
+        assert isinstance(fig, Figure)
+
+    def test_plot_free_energy_msm(self):
+        from msmbuilder.msm import MarkovStateModel
+
+        assignments = [np.repeat([0, 1], n // 2)]
+        msm = MarkovStateModel(verbose=False).fit(assignments)
+        ax = plot_free_energy([data], obs=(0, 1), msm=msm,
+                              assignments=assignments, method='fft')
+
+        assert isinstance(ax, SubplotBase)
+
+    def test_compute_free_energy_msm(self):
+        from msmbuilder.msm import MarkovStateModel
+
+        # Most frames are in state 0, but the model favors state 1
+        local = np.random.RandomState(0)
+        assignments = [np.repeat([0, 1], [7000, 3000])]
+        x = (np.where(assignments[0] == 0, .25, .75) +
+             .05 * local.randn(10000))[:, None]
+        msm = MarkovStateModel(verbose=False).fit(
+            [(local.rand(1000) < .9).astype(int)])
+        for method in ['scipy', 'fft']:
+            plain = compute_free_energy([x], method=method)
+            weighted = compute_free_energy([x], method=method, msm=msm,
+                                           assignments=assignments)
+
+            assert plain.grid[0][np.nanargmin(plain.values)] < .5
+            assert weighted.grid[0][np.nanargmin(weighted.values)] > .5
+
     def test_plot_decomp_grid(self):
         from msmbuilder.decomposition import tICA
 
@@ -38,3 +197,37 @@ class TestProjectionPlot(PlotTestCase):
         ax = plot_decomp_grid(tica, xlim=(0., 1.), ylim=(0., 1.))
 
         assert isinstance(ax, SubplotBase)
+
+
+class TestFreeEnergyAccumulator(PlotTestCase):
+    """Test the streaming free energy accumulator."""
+
+    def test_accumulator_1d(self):
+        acc = FreeEnergyAccumulator((0., 1.), obs=0)
+        for chunk in np.array_split(data, 4):
+            acc.partial_fit(chunk)
+        ax = acc.plot(xlabel='x')
+
+        assert isinstance(ax, SubplotBase)
+
+    def test_accumulator_2d(self):
+        acc = FreeEnergyAccumulator([(0., 1.), (0., 1.)], obs=(0, 1))
+        for chunk in np.array_split(data, 4):
+            acc.partial_fit(chunk, weights=np.ones(chunk.shape[0]))
+        X, Y, Z = acc.compute().to_list()
+        ax = acc.plot(cbar=True)
+
+        assert X.shape == Y.shape == Z.shape
+        assert isinstance(ax, SubplotBase)
+
+    def test_accumulator_update(self):
+        acc = FreeEnergyAccumulator([(0., 1.), (0., 1.)], obs=(0, 1))
+        acc.partial_fit(data[:1000])
+        ax = acc.plot(cbar=True)
+        n_artists = len(ax.collections)
+        n_axes = len(ax.figure.axes)
+        acc.update(data[1000:])
+
+        assert acc.moments.sum_w == n
+        assert len(ax.collections) == n_artists
+        assert len(ax.figure.axes) == n_axes
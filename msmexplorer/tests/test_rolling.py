@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import as_strided
+
+from ..rolling import rolling_mean, rolling_std, rolling_median
+
+rs = np.random.RandomState(42)
+x = 100. + np.cumsum(rs.randn(10000))
+
+
+def windows(x, window):
+    return as_strided(x, shape=(x.shape[0] - window + 1, window),
+                      strides=x.strides * 2)
+
+
+def test_rolling_mean():
+    for window in [1, 4, 25]:
+        out = rolling_mean(x, window, block_size=777)
+
+        assert np.isnan(out[:window - 1]).all()
+        np.testing.assert_allclose(out[window - 1:],
+                                   windows(x, window).mean(axis=1))
+
+
+def test_rolling_std():
+    for window in [2, 25]:
+        out = rolling_std(x, window, block_size=777)
+
+        assert np.isnan(out[:window - 1]).all()
+        np.testing.assert_allclose(out[window - 1:],
+                                   windows(x, window).std(axis=1, ddof=1),
+                                   rtol=1e-6, atol=1e-6)
+
+
+def test_rolling_median():
+    for window in [1, 4, 25]:
+        out = rolling_median(x[:, None], window, block_size=777)
+
+        assert np.isnan(out[:window - 1]).all()
+        np.testing.assert_allclose(out[window - 1:],
+                                   np.median(windows(x, window), axis=1))
+
+
+def test_rolling_nan():
+    # Like pandas, windows that contain a NaN are NaN
+    y = x[:50].copy()
+    y[20] = np.nan
+    for window in [2, 5, 6]:
+        expected = pd.Series(y).rolling(window)
+        np.testing.assert_allclose(rolling_mean(y, window, block_size=7),
+                                   expected.mean())
+        np.testing.assert_allclose(rolling_std(y, window, block_size=7),
+                                   expected.std(), rtol=1e-6)
+        np.testing.assert_allclose(rolling_median(y, window, block_size=7),
+                                   expected.median())
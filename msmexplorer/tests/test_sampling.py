@@ -0,0 +1,51 @@
+import numpy as np
+
+from ..sampling import (weighted_choice, stratified_choice,
+                        trajectory_choice, sample_indices)
+from ..utils import StateWeights
+
+weights = np.array([0., 1., 3., 0., 4.])
+
+
+def test_weighted_choice():
+    original = weights.copy()
+    idx = weighted_choice(weights, 80000, random_state=42)
+    freq = np.bincount(idx, minlength=5) / 80000.
+
+    np.testing.assert_allclose(freq, weights / weights.sum(), atol=0.01)
+    np.testing.assert_array_equal(weights, original)
+
+
+def test_stratified_choice():
+    idx = stratified_choice(weights, 8, random_state=42)
+
+    np.testing.assert_array_equal(np.bincount(idx, minlength=5),
+                                  [0, 1, 3, 0, 4])
+
+
+def test_trajectory_choice():
+    lengths = [2, 0, 3]
+    idx = trajectory_choice(lengths, 8, weights=weights, random_state=42)
+
+    assert (idx < 2).sum() == 1
+    assert (idx >= 2).sum() == 7
+    assert not np.any(weights[idx] == 0)
+
+
+def test_sample_indices():
+    idx = sample_indices(10, 1000, method='stratified', random_state=42)
+    np.testing.assert_array_equal(np.bincount(idx), 10 * [100])
+
+    idx = sample_indices(10, 6, method='trajectory', lengths=[4, 6],
+                         random_state=42)
+    assert (idx < 4).sum() == 2 and idx.max() < 10
+
+
+def test_sample_indices_state_weights():
+    lazy = StateWeights(np.array([0, 1, 2, 0, 3]), [0., 1., 3., 4.])
+    for method in ['random', 'stratified', 'trajectory']:
+        idx = sample_indices(5, 100, weights=lazy, method=method,
+                             lengths=[2, 3], random_state=42)
+        ref = sample_indices(5, 100, weights=weights, method=method,
+                             lengths=[2, 3], random_state=42)
+        np.testing.assert_array_equal(idx, ref)
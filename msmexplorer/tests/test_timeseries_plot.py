@@ -1,7 +1,8 @@
 import numpy as np
+from matplotlib import pyplot as pp
 from matplotlib.axes import SubplotBase
 
-from ..plots import plot_trace
+from ..plots import plot_trace, plot_traces
 from . import PlotTestCase
 
 rs = np.random.RandomState(42)
@@ -16,3 +17,37 @@ class TestTimeSeriesPlot(PlotTestCase):
 
         assert isinstance(ax, SubplotBase)
         assert isinstance(side_ax, SubplotBase)
+
+    def test_plot_trace_downsample(self):
+        ax, side_ax = plot_trace(data, window=10, ax=pp.gca(),
+                                 downsample='m4')
+
+        assert ax.lines[-1].get_xdata().shape[0] < data.shape[0]
+
+    def test_plot_trace_statistic(self):
+        ax, side_ax = plot_trace(data, window=10, statistic='std')
+
+        np.testing.assert_allclose(ax.lines[-1].get_ydata()[9],
+                                   data[:10].std(ddof=1))
+
+    def test_plot_trace_nan(self):
+        gaps = data[:1000].copy()
+        gaps[100] = np.nan
+        ax, side_ax = plot_trace(gaps, window=10)
+        assert len(side_ax.lines) == 1
+
+        # No finite values, or too few to estimate a density
+        for window, statistic in [(1, 'std'), (2000, 'mean')]:
+            ax, side_ax = plot_trace(gaps, window=window,
+                                     statistic=statistic)
+            assert len(side_ax.lines) == 0
+
+    def test_plot_traces(self):
+        traces = [data[:1000], data[1000:1500], data[1500:3000]]
+        fig, (ax, side_ax) = plot_traces(traces, window=10)
+        fig, axes = plot_traces(traces, window=10, layout='grid', ncols=2,
+                                labels=['a', 'b', 'c'])
+
+        assert len(ax.collections) == 1
+        assert axes.shape == (2, 2)
+        assert not axes[1, 1].get_visible()
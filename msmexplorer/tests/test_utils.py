@@ -1,7 +1,15 @@
+import os
+import tempfile
+
+import numpy as np
+from scipy import sparse
 from matplotlib.colors import Colormap
 
 from ..palettes import msme_rgb
-from ..utils import extract_palette, make_colormap, msme_colors
+from ..utils import (extract_palette, make_colormap, msme_colors,
+                     ConcatenatedArray, iter_blocks, take_columns,
+                     StateWeights, wrap_angle, constrain_angle, wrap_angles,
+                     constrain_angles, left_eigenvectors)
 
 
 def test_extract_palette():
@@ -28,3 +36,87 @@ def test_msme_colors():
 
     assert plot_foo() == msme_rgb['beryl']
     assert msme_colors(plot_bar)() == msme_rgb['beryl']
+
+
+def test_concatenated_array():
+    arrays = [np.arange(12.).reshape(4, 3), np.arange(12., 18.).reshape(2, 3)]
+    full = np.concatenate(arrays)
+    cat = ConcatenatedArray(arrays)
+
+    assert cat.shape == (6, 3)
+    np.testing.assert_array_equal(cat[2:5], full[2:5])
+    np.testing.assert_array_equal(cat[1:6, [0, 2]], full[1:6][:, [0, 2]])
+    np.testing.assert_array_equal(cat[[5, 0, 3]], full[[5, 0, 3]])
+
+
+def test_take_columns():
+    fn = os.path.join(tempfile.mkdtemp(), 'data.npy')
+    data = np.random.RandomState(42).rand(1000, 5)
+    np.save(fn, data)
+    mmap = np.load(fn, mmap_mode='r')
+    rows = [999, 3, 500]
+
+    np.testing.assert_array_equal(take_columns(mmap, (1, 3), block_size=7),
+                                  data[:, [1, 3]])
+    np.testing.assert_array_equal(take_columns(mmap, 2, rows=rows),
+                                  data[rows][:, [2]])
+    np.testing.assert_array_equal(take_columns([mmap, mmap], 0),
+                                  np.r_[data, data][:, [0]])
+    blocks = list(iter_blocks(mmap, columns=(0, 4), block_size=300))
+    assert len(blocks) == 4
+    np.testing.assert_array_equal(np.concatenate(blocks), data[:, [0, 4]])
+
+
+def test_state_weights():
+    assignments = [np.array([0, 1, -1]), np.array([2, 1, 3, 0])]
+    weights = StateWeights(assignments, [1., 2., 3.])
+    dense = np.array([1., 2., 0., 3., 2., 0., 1.])
+
+    assert len(weights) == 7
+    np.testing.assert_array_equal(weights[:], dense)
+    np.testing.assert_array_equal(weights[[6, 0, 3]], dense[[6, 0, 3]])
+    np.testing.assert_allclose(weights.cumsum_at([0, 4, 6]),
+                               np.cumsum(dense)[[0, 4, 6]])
+    np.testing.assert_array_equal(weights.searchsorted([0.5, 3., 8.5]),
+                                  np.searchsorted(np.cumsum(dense),
+                                                  [0.5, 3., 8.5], 'right'))
+
+
+def test_wrap_angles():
+    x = np.linspace(-720, 720, 1001, dtype=np.float32).reshape(7, 143)
+    out = wrap_angles(x.copy(), block_size=100)
+
+    assert out.dtype == np.float32
+    assert np.all((out >= -180) & (out < 180))
+    np.testing.assert_allclose(np.cos(np.deg2rad(out)),
+                               np.cos(np.deg2rad(x)), atol=1e-5)
+    wrap_angles(x, out=x)
+    np.testing.assert_array_equal(x, out)
+    assert wrap_angle(190) == -170
+
+
+def test_constrain_angles():
+    x = np.array([-370., -10., 0., 359., 725.])
+
+    np.testing.assert_array_equal(constrain_angles(x), [350, 350, 0, 359, 5])
+    assert constrain_angle(-10) == 350
+
+
+def test_left_eigenvectors():
+    # Reversible random walk on a ring, whose populations are known
+    n = 600
+    rs = np.random.RandomState(0)
+    w = rs.rand(n)
+    i = np.arange(n)
+    C = sparse.coo_matrix((np.r_[w, w], (np.r_[i, (i + 1) % n],
+                                          np.r_[(i + 1) % n, i])),
+                          shape=(n, n)).tocsr()
+    counts = np.asarray(C.sum(axis=1)).ravel()
+    T = sparse.diags(1 / counts).dot(C)
+
+    values, vectors = left_eigenvectors(T, 2)
+    np.testing.assert_allclose(values[0], 1.)
+    np.testing.assert_allclose(vectors[:, 0], counts / counts.sum())
+
+    dense_values, _ = left_eigenvectors(T[:20, :20].toarray(), 2)
+    assert dense_values.shape == (2,)
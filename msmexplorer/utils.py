@@ -1,13 +1,28 @@
 import re
 import inspect
 import functools
+import multiprocessing
 import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import eigs
 from matplotlib.colors import LinearSegmentedColormap
 
 from .palettes import all_colors
 
 
-__all__ = ['extract_palette', 'make_colormap', 'msme_colors']
+__all__ = ['extract_palette', 'make_colormap', 'msme_colors',
+           'ConcatenatedArray', 'iter_blocks', 'take_columns',
+           'effective_n_jobs', 'StateWeights', 'msm_frame_weights',
+           'wrap_angles', 'constrain_angles', 'left_eigenvectors']
+
+# Upper bound in bytes on the blocks read by ``iter_blocks``.
+BLOCK_BYTES = 2 ** 26
+
+# Transition matrices with more states are diagonalized by ARPACK.
+DENSE_EIG_STATES = 500
+
+# Sparse transition matrices are shifted and inverted around one plus this.
+EIG_SHIFT = 1e-8
 
 
 def extract_palette(color_palette):
@@ -134,17 +149,476 @@ def hex2rgb(color):
     return tuple(int(h[i:i+2], 16)/255. for i in (0, 2, 4))
 
 
+def effective_n_jobs(n_jobs):
+    """
+    Number of workers to use for an ``n_jobs`` argument.
+
+    ``None`` means 1, and negative values count back from the number of CPUs
+    (``-1`` uses all of them), as in scikit-learn.
+    """
+    if n_jobs is None:
+        return 1
+    if n_jobs == 0:
+        raise ValueError('n_jobs must not be 0')
+    if n_jobs < 0:
+        return max(1, multiprocessing.cpu_count() + 1 + n_jobs)
+    return int(n_jobs)
+
+
+def _periodic(x, shift, out, block_size):
+    """Compute ``(x + shift) % 360 - shift`` block by block into out."""
+    x = np.asanyarray(x)
+    if out is None:
+        out = np.empty(x.shape, np.result_type(x.dtype, np.float32))
+    elif out.shape != x.shape:
+        raise ValueError('out must have the shape of x')
+    if x.ndim == 0:
+        out[()] = (x + shift) % 360 - shift
+        return out
+    if block_size is None:
+        block_size = max(1, BLOCK_BYTES // out.dtype.itemsize)
+
+    x_flat = x.reshape(-1)
+    out_flat = out.reshape(-1)
+    for start in range(0, x_flat.shape[0], block_size):
+        block = out_flat[start:start + block_size]
+        if shift:
+            np.add(x_flat[start:start + block_size], shift, out=block)
+            np.mod(block, 360, out=block)
+            block -= shift
+        else:
+            np.mod(x_flat[start:start + block_size], 360, out=block)
+    return out
+
+
+def wrap_angles(x, out=None, block_size=None):
+    """
+    Wrap angles in degrees between -180 and 180 degrees.
+
+    The angles are processed in blocks with NumPy ufuncs, so pass
+    ``out=x`` to wrap a (memory-mapped) float32 or float64 array in place
+    without any full-size temporaries.
+
+    Parameters
+    ----------
+    x : array-like
+        Angles in degrees.
+    out : ndarray, optional
+        Array with the shape of x in which to store the result. It may be x
+        itself.
+    block_size : int, optional
+        Number of angles processed at a time.
+
+    Returns
+    -------
+    out : ndarray
+        The wrapped angles, as floats.
+    """
+    return _periodic(x, 180, out, block_size)
+
+
+def constrain_angles(x, out=None, block_size=None):
+    """
+    Constrain angles in degrees between 0 and 360 degrees.
+
+    See ``wrap_angles``, which takes the same arguments.
+    """
+    return _periodic(x, 0, out, block_size)
+
+
 def wrap_angle(x):
     """Wraps an angle in degrees between -180 and 180 degrees"""
-    x = (x + 180) % 360
-    if x < 0:
-        x += 360
-    return x - 180
+    return wrap_angles(x)[()]
 
 
 def constrain_angle(x):
     """Constrains an angle in degrees between 0 and 360 degrees"""
-    x = x % 360
-    if x < 0:
-        x += 360
-    return x
+    return constrain_angles(x)[()]
+
+
+class ConcatenatedArray(object):
+    """
+    Lazy row-wise concatenation of 2-D arrays.
+
+    Useful for treating a list of per-trajectory arrays, which may be
+    memory-mapped (e.g. ``np.load(fn, mmap_mode='r')``), as a single
+    dataset without copying it into memory. Indexing rows returns a regular
+    ndarray containing only those rows.
+
+    Parameters
+    ----------
+    arrays : list of array-like (nsamples_i, nfeatures)
+        The arrays to concatenate. They must have the same number of columns.
+    """
+
+    ndim = 2
+
+    def __init__(self, arrays):
+        arrays = list(arrays)
+        if not arrays:
+            raise ValueError('arrays must not be empty')
+        if any(np.ndim(a) != 2 for a in arrays):
+            raise ValueError('arrays must be 2-D')
+        n_features = set(a.shape[1] for a in arrays)
+        if len(n_features) != 1:
+            raise ValueError('arrays must have the same number of columns')
+
+        self.arrays = arrays
+        self.lengths = np.array([a.shape[0] for a in arrays])
+        self.offsets = np.concatenate([[0], np.cumsum(self.lengths)])
+        self.shape = (int(self.offsets[-1]), n_features.pop())
+        self.dtype = np.result_type(*[a.dtype for a in arrays])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        columns = slice(None)
+        if isinstance(key, tuple):
+            key, columns = key
+        if isinstance(columns, tuple):
+            columns = list(columns)
+        n_columns = np.arange(self.shape[1])[columns].size
+
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.shape[0])
+            if step != 1:
+                return self[np.arange(start, stop, step), columns]
+            first = np.searchsorted(self.offsets, start, side='right') - 1
+            last = np.searchsorted(self.offsets, stop, side='left')
+            parts = []
+            for i in range(first, max(first, last)):
+                a = max(start - self.offsets[i], 0)
+                b = min(stop, self.offsets[i + 1]) - self.offsets[i]
+                parts.append(np.asarray(self.arrays[i][a:b, columns]))
+            if not parts:
+                return np.empty((0, n_columns), self.dtype)
+            return np.concatenate(parts)
+
+        rows = np.asarray(key)
+        if rows.ndim == 0:
+            return self[int(rows):int(rows) + 1, columns][0]
+        rows = np.where(rows < 0, rows + self.shape[0], rows)
+        which = np.searchsorted(self.offsets, rows, side='right') - 1
+        out = np.empty((rows.shape[0], n_columns), self.dtype)
+        # Group the rows by array with one sort instead of a mask per array
+        order = np.argsort(which, kind='mergesort')
+        bounds = np.searchsorted(which[order], np.arange(len(self.arrays) + 1))
+        for i in np.flatnonzero(np.diff(bounds)):
+            idx = order[bounds[i]:bounds[i + 1]]
+            out[idx] = self.arrays[i][rows[idx] - self.offsets[i]][:, columns]
+        return out
+
+
+class StateWeights(object):
+    """
+    Lazy per-frame weights given by the weight of the state of each frame.
+
+    Indexing frames returns a regular ndarray of their weights, looked up
+    from the state assignments, so that weights for very long (or
+    memory-mapped) trajectories are never all held in memory. Frames
+    assigned to a negative state (e.g. -1 for unassigned) or to a state
+    without a weight have zero weight.
+
+    Parameters
+    ----------
+    assignments : array-like of int (nsamples,), or list thereof
+        State of each frame, for each trajectory.
+    state_weights : array-like (nstates,)
+        Weight of a frame in each state.
+    """
+
+    ndim = 1
+
+    def __init__(self, assignments, state_weights):
+        if not isinstance(assignments, list):
+            assignments = [assignments]
+        if any(np.ndim(a) != 1 for a in assignments):
+            raise ValueError('assignments must be 1-D')
+        self.assignments = ConcatenatedArray([np.reshape(a, (-1, 1))
+                                              for a in assignments])
+        self.state_weights = np.asarray(state_weights, dtype=float)
+        self.shape = (self.assignments.shape[0],)
+        self.dtype = self.state_weights.dtype
+        # Unknown states are looked up in a trailing zero
+        self._table = np.append(self.state_weights, 0.)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _lookup(self, states):
+        states = np.asarray(states).ravel()
+        n_states = self.state_weights.shape[0]
+        return self._table[np.where((states >= 0) & (states < n_states),
+                                    states, n_states)]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._lookup(self.assignments[key, 0])
+        if np.ndim(key) == 0:
+            return self._lookup(self.assignments[int(key), [0]])[0]
+        return self._lookup(self.assignments[np.asarray(key), [0]])
+
+    def _blocks(self):
+        block_size = BLOCK_BYTES // 8
+        for start in range(0, self.shape[0], block_size):
+            yield start, self[start:start + block_size]
+
+    def sum(self):
+        """Total weight of all frames."""
+        return sum(w.sum() for _, w in self._blocks())
+
+    def cumsum_at(self, index):
+        """
+        Cumulative weight of the frames up to (and including) each index.
+
+        Parameters
+        ----------
+        index : array-like of int
+            Frame indices.
+
+        Returns
+        -------
+        cum : ndarray
+            Cumulative weight at each index.
+        """
+        index = np.asarray(index)
+        out = np.empty(index.shape)
+        offset = 0.
+        for start, w in self._blocks():
+            cum = np.cumsum(w) + offset
+            mask = (index >= start) & (index < start + w.shape[0])
+            out[mask] = cum[index[mask] - start]
+            offset = cum[-1]
+        return out
+
+    def searchsorted(self, u):
+        """
+        Frames at which the cumulative weight first exceeds each value,
+        like ``np.searchsorted(np.cumsum(weights), u, side='right')``.
+
+        Parameters
+        ----------
+        u : array-like
+            Values of the cumulative weight.
+
+        Returns
+        -------
+        index : ndarray of int
+            Frame indices, or ``len(self)`` for values beyond the total.
+        """
+        u = np.asarray(u, dtype=float)
+        order = np.argsort(u, kind='mergesort')
+        sorted_u = u[order]
+        out = np.full(u.shape, self.shape[0], dtype=int)
+        offset, first = 0., 0
+        for start, w in self._blocks():
+            cum = np.cumsum(w) + offset
+            last = np.searchsorted(sorted_u, cum[-1], side='left')
+            out[order[first:last]] = start + np.searchsorted(
+                cum, sorted_u[first:last], side='right')
+            offset, first = cum[-1], last
+        return out
+
+
+def msm_frame_weights(msm, assignments):
+    """
+    Equilibrium weight of each frame from a Markov state model.
+
+    Each state's stationary population is split evenly between the frames
+    assigned to it, and frames of states that are not part of the model
+    get zero weight. Only per-state arrays are computed.
+
+    Parameters
+    ----------
+    msm : msmbuilder.msm.MarkovStateModel
+        A fit model, with ``populations_`` and ``mapping_`` attributes.
+    assignments : array-like of int (nsamples,), or list thereof
+        State of each frame, as labeled in the data the model was fit on.
+
+    Returns
+    -------
+    weights : StateWeights
+        Lazy per-frame weights, summing to one.
+    """
+    if not isinstance(assignments, list):
+        assignments = [assignments]
+
+    counts = np.zeros(0, dtype=int)
+    block_size = BLOCK_BYTES // 8
+    for a in assignments:
+        for start in range(0, a.shape[0], block_size):
+            labels = np.asarray(a[start:start + block_size])
+            block_counts = np.bincount(labels[labels >= 0])
+            if block_counts.shape[0] > counts.shape[0]:
+                block_counts[:counts.shape[0]] += counts
+                counts = block_counts
+            else:
+                counts[:block_counts.shape[0]] += block_counts
+
+    populations = np.zeros(counts.shape[0])
+    for label, state in msm.mapping_.items():
+        if label < counts.shape[0]:
+            populations[label] = msm.populations_[state]
+    if not populations.sum() > 0:
+        raise ValueError('No frames are assigned to states of the model')
+    populations /= populations.sum()
+
+    state_weights = np.zeros(counts.shape[0])
+    np.divide(populations, counts, out=state_weights, where=counts > 0)
+    return StateWeights(assignments, state_weights)
+
+
+def left_eigenvectors(tmat, n_vectors=1):
+    """
+    Dominant left eigenvectors of a transition matrix.
+
+    Small matrices are diagonalized densely. Larger ones, which may be
+    ``scipy.sparse`` matrices, use ARPACK, which only needs products with
+    the matrix. Sparse matrices are shifted and inverted around one, so the
+    nearly degenerate eigenvalues of metastable models converge quickly.
+
+    Parameters
+    ----------
+    tmat : array-like or scipy.sparse matrix (nstates, nstates)
+        Row-stochastic transition matrix.
+    n_vectors : int, optional (default: 1)
+        Number of eigenvectors to compute.
+
+    Returns
+    -------
+    eigenvalues : ndarray (n_vectors,)
+        The largest eigenvalues, in decreasing order.
+    vectors : ndarray (nstates, n_vectors)
+        The corresponding left eigenvectors, with their largest component
+        positive. The first one is the stationary distribution, normalized
+        to sum to one.
+    """
+    n_states = tmat.shape[0]
+    if n_vectors > n_states:
+        raise ValueError('n_vectors must not exceed the number of states')
+    if n_states > DENSE_EIG_STATES:
+        if not sparse.issparse(tmat):
+            # Products with a sparse copy are cheaper for typical MSMs
+            tmat = np.asarray(tmat)
+            if np.count_nonzero(tmat) < tmat.size // 4:
+                tmat = sparse.csr_matrix(tmat)
+        # ARPACK cannot find all (or all but one) eigenvectors
+        # A fixed starting vector makes the results repeatable
+        k = min(n_vectors + 1, n_states - 2)
+        v0 = np.ones(n_states)
+        if sparse.issparse(tmat):
+            values, vectors = eigs(sparse.csc_matrix(tmat.T, dtype=float),
+                                   k=k, sigma=1 + EIG_SHIFT, v0=v0)
+        else:
+            values, vectors = eigs(tmat.T.astype(float), k=k, which='LR',
+                                   v0=v0)
+    else:
+        if sparse.issparse(tmat):
+            tmat = tmat.toarray()
+        values, vectors = np.linalg.eig(np.asarray(tmat, dtype=float).T)
+    order = np.argsort(-values.real)[:n_vectors]
+    values, vectors = values[order].real, vectors[:, order].real
+    # The largest component of each eigenvector is positive
+    largest = np.abs(vectors).argmax(axis=0)
+    vectors *= np.sign(vectors[largest, np.arange(vectors.shape[1])])
+    vectors[:, 0] /= vectors[:, 0].sum()
+    return values, vectors
+
+
+def iter_blocks(data, columns=None, block_size=None):
+    """
+    Iterate over an array in blocks of rows.
+
+    Parameters
+    ----------
+    data : ndarray, memmap, ConcatenatedArray or list of 2-D arrays
+        The samples.
+    columns : int or sequence of int, optional
+        Columns to read. Defaults to all columns.
+    block_size : int, optional
+        Number of rows per block. By default, blocks hold no more than
+        ``BLOCK_BYTES`` of the full rows.
+
+    Yields
+    ------
+    block : ndarray (block_size, ncolumns)
+        In-memory copy of the requested columns of the next rows.
+    """
+    if isinstance(data, list):
+        data = ConcatenatedArray(data)
+    if columns is None:
+        columns = slice(None)
+    elif isinstance(columns, int):
+        columns = [columns]
+    else:
+        columns = list(columns)
+    if block_size is None:
+        row_bytes = np.dtype(data.dtype).itemsize * max(1, np.prod(
+            data.shape[1:], dtype=int))
+        block_size = max(1, BLOCK_BYTES // row_bytes)
+
+    for start in range(0, data.shape[0], block_size):
+        yield np.asarray(data[start:start + block_size, columns])
+
+
+def take_columns(data, columns=None, rows=None, block_size=None):
+    """
+    Gather columns (and optionally rows) of an array into memory.
+
+    In-memory arrays are indexed directly. Memory-mapped arrays, lists of
+    arrays and ``ConcatenatedArray`` objects are read in blocks, so that only
+    the requested values are ever held in memory.
+
+    Parameters
+    ----------
+    data : ndarray, memmap, ConcatenatedArray or list of 2-D arrays
+        The samples.
+    columns : int or sequence of int, optional
+        Columns to gather. Defaults to all columns.
+    rows : array-like of int, optional
+        Rows to gather. Defaults to all rows.
+    block_size : int, optional
+        Number of rows read at a time.
+
+    Returns
+    -------
+    out : ndarray (nrows, ncolumns)
+        The requested values.
+    """
+    if isinstance(data, list):
+        data = ConcatenatedArray(data)
+    if columns is None:
+        columns = list(range(data.shape[1]))
+    elif isinstance(columns, int):
+        columns = [columns]
+    else:
+        columns = list(columns)
+
+    in_memory = (isinstance(data, np.ndarray) and
+                 not isinstance(data, np.memmap))
+
+    if rows is None:
+        if in_memory:
+            return data[:, columns]
+        out = np.empty((data.shape[0], len(columns)), data.dtype)
+        start = 0
+        for block in iter_blocks(data, columns, block_size):
+            out[start:start + block.shape[0]] = block
+            start += block.shape[0]
+        return out
+
+    rows = np.asarray(rows)
+    if in_memory:
+        return data[rows][:, columns]
+
+    # Read rows in order for locality, then restore the requested order
+    order = np.argsort(rows, kind='mergesort')
+    out = np.empty((rows.shape[0], len(columns)), data.dtype)
+    if block_size is None:
+        block_size = max(1, BLOCK_BYTES // (data.dtype.itemsize *
+                                            data.shape[1]))
+    for start in range(0, rows.shape[0], block_size):
+        idx = order[start:start + block_size]
+        out[idx] = np.asarray(data[rows[idx]])[:, columns]
+    return out
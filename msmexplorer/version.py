@@ -0,0 +1,7 @@
+
+# This file is generated in setup.py at build time.
+version = '1.2.0dev0'
+short_version = '1.2.0dev0'
+full_version = '1.2.0dev0+7ee54cf6df68ef86df7c5aced118d1c6cadc6f3d'
+git_revision = '7ee54cf6df68ef86df7c5aced118d1c6cadc6f3d'
+release = False